@@ -0,0 +1,336 @@
+# ALERTAS DA RED QUEEN: INCIDENTES COM HISTERESE E REGISTRO DURÁVEL
+# Leituras anômalas consecutivas viram um único incidente: ele abre quando a
+# probabilidade passa do limiar de decisão e só fecha depois de COOLDOWN_READINGS
+# leituras seguidas abaixo do limiar de liberação (mais baixo), então um
+# incidente sustentado não gera um alerta por leitura. Os incidentes fechados,
+# com o fator principal da explicação, são gravados em lote em um SQLite
+# embutido, indexado por horário, instalação e fator, para o painel consultar
+# o histórico sem reprocessar os dados brutos.
+#
+#   python alerting.py   (incidentes do dataset de treino, gravação em lote e consultas)
+
+import atexit                            # Grava o que estiver pendente ao encerrar o processo
+import sqlite3                           # Registro embutido dos incidentes
+import threading                         # Um único registro compartilhado pelas sessões do painel
+import time                              # Horário de abertura e fechamento dos incidentes
+import numpy as np                       # Estado vetorizado entre fluxos
+import pandas as pd                      # Resultados das consultas
+
+from batch_scoring import DECISION_THRESHOLD
+
+# PARÂMETROS DOS ALERTAS
+RELEASE_RATIO = 0.6                      # Liberação = 0.6 x limiar de decisão; abaixo dela a leitura é calma
+COOLDOWN_READINGS = 10                   # Leituras calmas seguidas para encerrar o incidente
+ALERT_DB = "alertas.db"                  # Arquivo do registro de incidentes
+FLUSH_ROWS = 256                         # Incidentes pendentes que disparam a gravação em lote
+FLUSH_SECONDS = 5.0                      # Tempo máximo (s) que um incidente espera para ser gravado
+
+INCIDENT_COLUMNS = ['instalacao', 'origem', 'motor', 'aberto_em', 'fechado_em', 'leitura_inicio', 'leitura_fim',
+                    'leituras', 'alertas', 'pico_confianca', 'leitura_pico', 'fator_principal']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidentes (
+    id INTEGER PRIMARY KEY,
+    instalacao TEXT NOT NULL,
+    origem TEXT,
+    motor TEXT,
+    aberto_em REAL NOT NULL,
+    fechado_em REAL,
+    leitura_inicio INTEGER,
+    leitura_fim INTEGER,
+    leituras INTEGER,
+    alertas INTEGER,
+    pico_confianca REAL,
+    leitura_pico INTEGER,
+    fator_principal TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_incidentes_aberto ON incidentes (aberto_em);
+CREATE INDEX IF NOT EXISTS idx_incidentes_instalacao ON incidentes (instalacao, aberto_em);
+CREATE INDEX IF NOT EXISTS idx_incidentes_fator ON incidentes (fator_principal, aberto_em);
+"""
+
+
+# DETECÇÃO DE INCIDENTES EM FLUXO
+class IncidentTracker:
+    """
+    Incidentes de vários fluxos (um por instalação/sala) que avançam juntos,
+    uma leitura de cada por update. O estado é um vetor por campo, então o
+    custo por tick é de operações vetorizadas; só os fluxos que abrem ou
+    fecham um incidente passam por Python.
+    """
+
+    def __init__(self, facilities=(), threshold=DECISION_THRESHOLD, release=None, cooldown=COOLDOWN_READINGS):
+        self.threshold = threshold
+        self.release = release                         # None: acompanha o limiar (RELEASE_RATIO)
+        self.cooldown = cooldown
+        self.facilities = []
+        self.aberto = np.zeros(0, dtype=bool)
+        self.calmas = np.zeros(0, dtype=np.int64)      # Leituras calmas seguidas no incidente aberto
+        self.leituras = np.zeros(0, dtype=np.int64)    # Leituras desde a abertura (inclui as calmas)
+        self.alertas = np.zeros(0, dtype=np.int64)     # Leituras acima do limiar de decisão
+        self.inicio = np.zeros(0, dtype=np.int64)
+        self.fim = np.zeros(0, dtype=np.int64)         # Última leitura não calma
+        self.pico = np.zeros(0)
+        self.leitura_pico = np.zeros(0, dtype=np.int64)
+        self.aberto_em = np.zeros(0)
+        self.entradas = []                             # Entrada do modelo no pico (para explicar o incidente)
+        self.opened = np.zeros(0, dtype=bool)          # Fluxos que abriram um incidente no último update
+        for nome in facilities:
+            self.add_stream(nome)
+
+    def add_stream(self, nome):
+        self.facilities.append(nome)
+        for campo, valor in (('aberto', False), ('calmas', 0), ('leituras', 0), ('alertas', 0), ('inicio', 0),
+                             ('fim', 0), ('pico', 0.0), ('leitura_pico', 0), ('aberto_em', 0.0), ('opened', False)):
+            setattr(self, campo, np.append(getattr(self, campo), valor).astype(getattr(self, campo).dtype))
+        self.entradas.append(None)
+        return self
+
+    def update(self, proba, indices, inputs=None, now=None):
+        """
+        Uma leitura por fluxo: probabilidades, índices das leituras e, opcionalmente,
+        a entrada do modelo de cada fluxo (guardada no pico). Retorna os incidentes fechados.
+        """
+        now = time.time() if now is None else now
+        proba = np.asarray(proba, dtype=np.float64)
+        indices = np.asarray(indices, dtype=np.int64)
+        alerta = proba > self.threshold
+        calma = proba < release_threshold(self.threshold, self.release)
+
+        # Abertura: fluxo sem incidente com uma leitura acima do limiar de decisão
+        self.opened = alerta & ~self.aberto
+        if self.opened.any():
+            self.aberto |= self.opened
+            self.calmas[self.opened] = 0
+            self.leituras[self.opened] = 0
+            self.alertas[self.opened] = 0
+            self.inicio[self.opened] = indices[self.opened]
+            self.pico[self.opened] = -1.0
+            self.aberto_em[self.opened] = now
+
+        # Incidentes abertos: leituras não calmas zeram a contagem de calmas e estendem o fim
+        ativo = self.aberto & ~calma
+        self.leituras[self.aberto] += 1
+        self.alertas += alerta & self.aberto
+        self.calmas[self.aberto & calma] += 1
+        self.calmas[ativo] = 0
+        self.fim[ativo] = indices[ativo]
+        novo_pico = self.aberto & (proba > self.pico)
+        self.pico[novo_pico] = proba[novo_pico]
+        self.leitura_pico[novo_pico] = indices[novo_pico]
+        if inputs is not None:
+            for i in np.flatnonzero(novo_pico):
+                self.entradas[i] = np.array(inputs[i])
+
+        # Fechamento: COOLDOWN_READINGS leituras calmas seguidas (as calmas não entram no incidente)
+        fechar = self.aberto & (self.calmas >= self.cooldown)
+        return self._close(np.flatnonzero(fechar), now)
+
+    def feed(self, proba, indices, inputs=None, now=None):
+        """Leituras sucessivas de um único fluxo (o rastreador deve ter um só fluxo). Retorna os fechados."""
+        fechados, abriu = [], False
+        for j in range(len(proba)):
+            fechados += self.update(proba[j:j + 1], indices[j:j + 1],
+                                    None if inputs is None else inputs[j:j + 1], now)
+            abriu |= bool(self.opened[0])
+        self.opened = np.array([abriu])
+        return fechados
+
+    def close_all(self, now=None):
+        """Encerra todos os incidentes abertos (ex.: ao trocar de dataset ou parar o monitoramento)."""
+        return self._close(np.flatnonzero(self.aberto), time.time() if now is None else now)
+
+    def _close(self, fluxos, now):
+        fechados = [self._incident(i, now) for i in fluxos]
+        self.aberto[fluxos] = False
+        for i in fluxos:
+            self.entradas[i] = None
+        return fechados
+
+    def _incident(self, i, fechado_em=None):
+        return {
+            'instalacao': self.facilities[i],
+            'aberto_em': float(self.aberto_em[i]),
+            'fechado_em': fechado_em,
+            'leitura_inicio': int(self.inicio[i]),
+            'leitura_fim': int(self.fim[i]),
+            'leituras': int(self.leituras[i] - self.calmas[i]),
+            'alertas': int(self.alertas[i]),
+            'pico_confianca': float(self.pico[i]) * 100,
+            'leitura_pico': int(self.leitura_pico[i]),
+            'entrada': self.entradas[i],
+        }
+
+    def open_incident(self, i=0):
+        """Incidente em andamento no fluxo i (ou None)."""
+        return self._incident(i) if self.aberto[i] else None
+
+
+def release_threshold(threshold, release=None):
+    """Limiar de liberação: o informado ou uma fração fixa do limiar de decisão (segue a calibração)."""
+    return threshold * RELEASE_RATIO if release is None else release
+
+
+def find_incidents(proba, threshold=DECISION_THRESHOLD, release=None, cooldown=COOLDOWN_READINGS):
+    """
+    Mesmos incidentes do IncidentTracker, em uma sequência inteira já pontuada
+    (vetorizado). Retorna um DataFrame com início, fim, leituras, alertas, pico
+    (em %) e leitura do pico, em posições da sequência; um incidente ainda
+    aberto no fim da sequência termina na última leitura não calma.
+    """
+    proba = np.asarray(proba, dtype=np.float64)
+    n = len(proba)
+    posicoes = np.arange(n)
+    calma = proba < release_threshold(threshold, release)
+    # Tamanho da sequência de calmas que termina em cada leitura; o incidente fecha quando chega ao cooldown
+    ultima_nao_calma = np.maximum.accumulate(np.where(calma, -1, posicoes)) if n else posicoes
+    fecha = (posicoes - ultima_nao_calma) == cooldown
+    segmento = np.cumsum(fecha) - fecha
+
+    # Em cada segmento entre fechamentos, o incidente vai do primeiro alerta à última leitura não calma
+    alertas = np.flatnonzero(proba > threshold)
+    segmentos, primeiro = np.unique(segmento[alertas], return_index=True)
+    inicio = alertas[primeiro]
+    nao_calmas = np.flatnonzero(~calma)
+    fim = nao_calmas[np.searchsorted(segmento[nao_calmas], segmentos, side='right') - 1]
+
+    leitura_pico = np.array([a + int(np.argmax(proba[a:b + 1])) for a, b in zip(inicio, fim)], dtype=np.int64)
+    n_alertas = np.diff(np.searchsorted(alertas, np.column_stack([inicio, fim + 1])), axis=1).ravel()
+    return pd.DataFrame({
+        'leitura_inicio': inicio,
+        'leitura_fim': fim,
+        'leituras': fim - inicio + 1,
+        'alertas': n_alertas,
+        'pico_confianca': proba[leitura_pico] * 100 if len(leitura_pico) else np.zeros(0),
+        'leitura_pico': leitura_pico,
+    })
+
+
+# REGISTRO DURÁVEL
+class AlertStore:
+    """
+    Registro de incidentes em SQLite (modo WAL). add() só acumula; a gravação
+    acontece em lote (uma transação) a cada FLUSH_ROWS incidentes ou
+    FLUSH_SECONDS, e sempre antes de uma consulta. Seguro entre threads.
+    """
+
+    def __init__(self, path=ALERT_DB, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._pendentes = []
+        self._ultima_gravacao = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        atexit.register(self.flush)
+
+    def add(self, incidentes, origem=None, motor=None):
+        """Acumula incidentes fechados (dicts do IncidentTracker/find_incidents, com 'fator_principal')."""
+        with self._lock:
+            for inc in incidentes:
+                registro = {'origem': origem, 'motor': motor, 'fator_principal': None, 'fechado_em': None, **inc}
+                self._pendentes.append(tuple(registro[c] for c in INCIDENT_COLUMNS))
+            cheio = len(self._pendentes) >= self.flush_rows
+            vencido = time.monotonic() - self._ultima_gravacao >= self.flush_seconds
+        if self._pendentes and (cheio or vencido):
+            self.flush()
+
+    def flush(self):
+        """Grava os incidentes pendentes em uma única transação."""
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, []
+            self._ultima_gravacao = time.monotonic()
+            if pendentes:
+                with self._conn:
+                    self._conn.executemany(
+                        f"INSERT INTO incidentes ({', '.join(INCIDENT_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(INCIDENT_COLUMNS))})", pendentes)
+        return len(pendentes)
+
+    def _where(self, instalacao, fator, desde, ate):
+        filtros, parametros = [], []
+        for condicao, valor in (("instalacao = ?", instalacao), ("fator_principal = ?", fator),
+                                ("aberto_em >= ?", desde), ("aberto_em < ?", ate)):
+            if valor is not None:
+                filtros.append(condicao)
+                parametros.append(valor)
+        return (" WHERE " + " AND ".join(filtros) if filtros else ""), parametros
+
+    def _read(self, sql, parametros):
+        self.flush()
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=parametros)
+
+    def query(self, instalacao=None, fator=None, desde=None, ate=None, limit=500):
+        """Incidentes mais recentes primeiro, filtrados pelos campos indexados."""
+        where, parametros = self._where(instalacao, fator, desde, ate)
+        tabela = self._read(f"SELECT * FROM incidentes{where} ORDER BY aberto_em DESC LIMIT ?",
+                            parametros + [limit])
+        for coluna in ('aberto_em', 'fechado_em'):
+            tabela[coluna] = pd.to_datetime(tabela[coluna], unit='s')
+        return tabela
+
+    def count_by(self, coluna, instalacao=None, fator=None, desde=None, ate=None):
+        """Número de incidentes por 'fator_principal' ou 'instalacao' (resolvido pelos índices)."""
+        if coluna not in ('fator_principal', 'instalacao'):
+            raise ValueError(f"Agrupamento não indexado: {coluna}")
+        where, parametros = self._where(instalacao, fator, desde, ate)
+        return self._read(f"SELECT {coluna}, COUNT(*) AS incidentes FROM incidentes{where} "
+                          f"GROUP BY {coluna} ORDER BY incidentes DESC", parametros)
+
+    def distinct(self, coluna):
+        """Valores distintos de uma coluna indexada (para os filtros do painel)."""
+        return self.count_by(coluna)[coluna].dropna().tolist()
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+        self._conn.close()
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    import os
+    import tempfile
+    from dataset_io import read_dataset
+    from model_store import load_serving_artifact
+    from batch_scoring import score_dataframe, decision_threshold
+    parser = argparse.ArgumentParser(description="Incidentes com histerese e registro em SQLite.")
+    parser.add_argument("--data", default="Red_Queen_Synthetic_Dataset.csv")
+    parser.add_argument("--cooldown", type=int, default=COOLDOWN_READINGS)
+    parser.add_argument("--repeticoes", type=int, default=200, help="Cópias dos incidentes gravadas no teste de carga")
+    args = parser.parse_args()
+
+    model, _ = load_serving_artifact(compiled=True)
+    proba = score_dataframe(model, read_dataset(args.data))['Confidence'].to_numpy() / 100
+    limiar = decision_threshold(model)
+    incidentes = find_incidents(proba, limiar, cooldown=args.cooldown)
+    print(f"{int((proba > limiar).sum()):,} leituras em alerta -> {len(incidentes):,} incidentes")
+
+    # O rastreador em fluxo deve encontrar exatamente os mesmos incidentes
+    rastreador = IncidentTracker(["teste"], limiar, cooldown=args.cooldown)
+    fechados = rastreador.feed(proba, np.arange(len(proba))) + rastreador.close_all()
+    iguais = [(f['leitura_inicio'], f['leitura_fim'], f['leitura_pico']) for f in fechados] == \
+        list(zip(incidentes['leitura_inicio'], incidentes['leitura_fim'], incidentes['leitura_pico']))
+    print(f"Rastreador em fluxo igual ao vetorizado: {iguais}")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        store = AlertStore(os.path.join(pasta, "alertas.db"))
+        registros = incidentes.assign(aberto_em=time.time(), fator_principal='T_Virus_Level').to_dict('records')
+        inicio = time.perf_counter()
+        for r in range(args.repeticoes):
+            store.add([{**reg, 'instalacao': f"Sala {r % 50:03d}"} for reg in registros])
+        store.flush()
+        gravacao = time.perf_counter() - inicio
+        total = args.repeticoes * len(registros)
+        inicio = time.perf_counter()
+        por_sala = store.query(instalacao="Sala 007", limit=100)
+        consulta = time.perf_counter() - inicio
+        print(f"Gravação em lote: {total:,} incidentes em {gravacao * 1000:.0f} ms; "
+              f"consulta por instalação: {len(por_sala)} linhas em {consulta * 1000:.1f} ms")
+        print(store.count_by('fator_principal').to_string(index=False))
+        store.close()
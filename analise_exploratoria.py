@@ -1,79 +1,340 @@
-# Importação das bibliotecas necessárias
-import pandas as pd               # Manipulação e análise de dados (para carregar o CSV)
-import matplotlib.pyplot as plt   # Visualização de gráficos (para criar histogramas)
-import numpy as np                # Operações numéricas (para calcular os 'bins' dos histogramas)
+# ANÁLISE EXPLORATÓRIA DOS DADOS DA RED QUEEN
+# Uma única passada em blocos pelo arquivo (CSV, Parquet ou Arrow, inclusive
+# maiores que a memória) calcula, de forma vetorizada, as estatísticas, os
+# histogramas e os quantis de todas as colunas. As figuras são desenhadas em
+# paralelo (pool de processos, backend não interativo Agg) e o resultado é um
+# relatório HTML autocontido, com os PNGs ao lado. O resumo de cada arquivo
+# fica em cache (caminho + tamanho + data de modificação): rodar de novo no
+# mesmo arquivo não relê os dados.
+#
+#   python analise_exploratoria.py                                   (relatório em relatorio_eda/)
+#   python analise_exploratoria.py dados.parquet --saida rel --processos 4
+#   python analise_exploratoria.py --mostrar                         (janelas interativas, como antes)
 
-# Tenta carregar o dataset a partir do caminho especificado
-try:
-    df = pd.read_csv("Red_Queen_Synthetic_Dataset.csv", encoding='utf-8')
-except FileNotFoundError:
-    # Mensagem de erro se o arquivo não for encontrado
-    print("Erro: O arquivo 'Red_Queen_Synthetic_Dataset.csv' não foi encontrado.")
-    print("Verifique se o caminho do arquivo está correto ou coloque o arquivo na mesma pasta do script.")
-    exit()  # Encerra a execução do script
+import base64                            # PNGs embutidos no HTML
+import concurrent.futures                # Figuras desenhadas em paralelo
+import hashlib                           # Chave do cache por arquivo
+import html                              # Escapa textos no relatório
+import json                              # Resumos em cache
+import os                                # Caminhos, tamanho e data dos arquivos
+import time                              # Data do relatório e tempos de cada etapa
+import numpy as np                       # Histogramas e quantis vetorizados
 
-# Lista de colunas numéricas contínuas
-colunas_numericas = ['T_Virus_Level', 'Room_Temperature', 'Humidity', 'Gas_Leak_Level', 'Proximity_To_Core']
+from dataset_io import iter_chunks, CHUNK_ROWS
 
-print("Gerando histogramas para colunas numéricas contínuas...")
+# PARÂMETROS DA ANÁLISE
+# Colunas numéricas contínuas (histograma) e de valores inteiros (contagem exata de cada valor)
+CONTINUOUS_COLUMNS = ['T_Virus_Level', 'Room_Temperature', 'Humidity', 'Gas_Leak_Level', 'Proximity_To_Core']
+INTEGER_COLUMNS = ['Security_Clearance', 'AI_Override_Attempts', 'Anomaly']
+MAX_BINS = 4096                          # Máximo de intervalos finos por coluna (memória constante por coluna)
+PLOT_BINS = 30                           # Barras dos histogramas das colunas contínuas
+INTEGER_PLOT_BINS = 20                   # Barras para colunas inteiras com muitos valores distintos
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+SUMMARY_VERSION = 2                      # Muda se o cálculo do resumo mudar (invalida o cache)
+CACHE_DIR = ".eda_cache"                 # Resumos por arquivo
+REPORT_DIR = "relatorio_eda"             # Relatório HTML e PNGs
 
-# Para cada coluna da lista acima, cria um histograma
-for nome_coluna in colunas_numericas:
-    plt.figure(figsize=(8, 6))  # Cria uma nova figura de 8x6 polegadas
 
-    # Cria histograma com 30 'bins' (intervalos)
-    plt.hist(df[nome_coluna], bins=30, color='skyblue', edgecolor='black')
+# PASSADA ÚNICA EM BLOCOS
+class SparseHistogram:
+    """
+    Histograma de largura fixa sobre uma grade global (intervalo k = [k·w, (k+1)·w)),
+    guardando só os intervalos ocupados. A largura w é uma potência de 2 que
+    acompanha a amplitude global vista até agora: quando o intervalo cresce (ou
+    há mais de max_bins intervalos), w dobra e os intervalos se fundem sem perder
+    contagens. Os quantis saem com resolução de w.
+    """
 
-    # Define título e rótulos dos eixos
-    plt.title(f'Distribuição de {nome_coluna}')
-    plt.xlabel(nome_coluna)
-    plt.ylabel('Frequência')
+    def __init__(self, max_bins=MAX_BINS):
+        self.max_bins = max_bins
+        self.width = None
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.minimo, self.maximo = np.inf, -np.inf
+        self.constantes = 0              # Leituras vistas enquanto todas são iguais (largura ainda indefinida)
 
-    # Ajusta o layout para que os rótulos não fiquem cortados
-    plt.tight_layout()
+    def update(self, x):
+        if not len(x):
+            return
+        valor_constante = self.minimo    # Valor das leituras constantes de antes, se houver
+        self.minimo = min(self.minimo, float(x.min()))
+        self.maximo = max(self.maximo, float(x.max()))
+        amplitude = self.maximo - self.minimo
+        if amplitude == 0:
+            self.constantes += len(x)
+            return
+        largura = 2.0 ** np.floor(np.log2(amplitude / self.max_bins))
+        if self.width is None:
+            self.width = largura
+            if self.constantes:
+                self._merge(np.array([np.floor(valor_constante / largura)], dtype=np.int64),
+                            np.array([self.constantes], dtype=np.int64))
+                self.constantes = 0
+        elif largura > self.width:
+            # O intervalo cresceu: funde os intervalos finos (floor(k / 2^j) é exato na grade de potências de 2)
+            fator = int(round(largura / self.width))
+            self.width = largura
+            self._merge(self.keys // fator, self.counts, replace=True)
+        self._merge(np.floor(x / self.width).astype(np.int64), np.ones(len(x), dtype=np.int64))
+        while len(self.keys) > self.max_bins:
+            self.width *= 2
+            self._merge(self.keys // 2, self.counts, replace=True)
 
-    # Exibe o gráfico
-    plt.show()
+    def _merge(self, keys, counts, replace=False):
+        if not replace:
+            keys = np.concatenate([self.keys, keys])
+            counts = np.concatenate([self.counts, counts])
+        self.keys, inverso = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverso, weights=counts).astype(np.int64)
 
-print("Histogramas das colunas contínuas gerados com sucesso.\n")
+    def _grid(self):
+        """Intervalos, contagens e largura; se todas as leituras são iguais, um único intervalo."""
+        if self.width is None:
+            return np.array([np.floor(self.minimo)], dtype=np.int64), np.array([self.constantes]), 1.0
+        return self.keys, self.counts, self.width
 
-# Lista de colunas com valores inteiros (variáveis discretas)
-colunas_inteiras = ['Security_Clearance', 'AI_Override_Attempts', 'Anomaly']
+    def quantiles(self, qs, minimo, maximo):
+        """Quantis por interpolação linear dentro do intervalo, limitados a [mínimo, máximo]."""
+        chaves, contagens, largura = self._grid()
+        acumulado = np.cumsum(contagens)
+        alvo = np.asarray(qs) * acumulado[-1]
+        i = np.minimum(np.searchsorted(acumulado, alvo, side='left'), len(acumulado) - 1)
+        antes = np.where(i > 0, acumulado[i - 1], 0)
+        fracao = (alvo - antes) / contagens[i]
+        return np.clip((chaves[i] + fracao) * largura, minimo, maximo)
 
-print("Gerando histogramas para colunas de valores inteiros...")
+    def plot_histogram(self, minimo, maximo, bins=PLOT_BINS):
+        """Histograma de exibição em [mínimo, máximo] (cada intervalo fino conta pelo seu centro)."""
+        chaves, contagens, largura = self._grid()
+        centros = np.clip((chaves + 0.5) * largura, minimo, maximo)
+        return np.histogram(centros, bins=bins, range=(minimo, maximo if maximo > minimo else minimo + 1),
+                            weights=contagens)
 
-# Para cada coluna inteira, cria um histograma com tratamento especial
-for nome_coluna in colunas_inteiras:
-    plt.figure(figsize=(8, 6))  # Cria uma nova figura
 
-    dados_coluna = df[nome_coluna]          # Pega os dados da coluna
-    valores_unicos = dados_coluna.nunique() # Conta quantos valores diferentes existem
+def summarize_dataset(path, chunk_rows=CHUNK_ROWS):
+    """
+    Lê o arquivo uma vez, bloco a bloco, e devolve o resumo (JSON-serializável) de
+    cada coluna: contagem, ausentes, média, desvio, mínimo, máximo, quantis e as
+    contagens do histograma (contínuas) ou de cada valor (inteiras).
+    """
+    colunas = CONTINUOUS_COLUMNS + INTEGER_COLUMNS
+    estado = {c: {'n': 0, 'ausentes': 0, 'soma': 0.0, 'soma_quad': 0.0, 'min': np.inf, 'max': -np.inf}
+              for c in colunas}
+    histogramas = {c: SparseHistogram() for c in CONTINUOUS_COLUMNS}
+    valores = {c: {} for c in INTEGER_COLUMNS}
+    linhas, presentes = 0, set()
 
-    # Se tiver poucos valores únicos, ajusta os 'bins' para que cada barra represente um número inteiro
-    if valores_unicos <= 10:
-        min_val = dados_coluna.min()
-        max_val = dados_coluna.max()
-        bins_config = np.arange(min_val - 0.5, max_val + 1.5, 1)  # Centraliza os inteiros nos bins
+    for bloco in iter_chunks(path, chunk_rows):
+        linhas += len(bloco)
+        for coluna in colunas:
+            if coluna not in bloco.columns:
+                continue
+            presentes.add(coluna)
+            x = bloco[coluna].to_numpy(dtype=np.float64)
+            validos = x[~np.isnan(x)]
+            e = estado[coluna]
+            e['ausentes'] += len(x) - len(validos)
+            if not len(validos):
+                continue
+            e['n'] += len(validos)
+            e['soma'] += float(validos.sum())
+            e['soma_quad'] += float(np.dot(validos, validos))
+            e['min'] = min(e['min'], float(validos.min()))
+            e['max'] = max(e['max'], float(validos.max()))
+            if coluna in histogramas:
+                histogramas[coluna].update(validos)
+            else:
+                unicos, contagens = np.unique(validos.astype(np.int64), return_counts=True)
+                for valor, contagem in zip(unicos.tolist(), contagens.tolist()):
+                    valores[coluna][valor] = valores[coluna].get(valor, 0) + contagem
+
+    resumo = {'arquivo': os.path.abspath(path), 'linhas': linhas, 'colunas': {}}
+    for coluna in colunas:
+        e = estado[coluna]
+        if coluna not in presentes or not e['n']:
+            continue
+        media = e['soma'] / e['n']
+        info = {
+            'tipo': 'continua' if coluna in histogramas else 'inteira',
+            'n': e['n'], 'ausentes': e['ausentes'], 'media': media,
+            'desvio': float(np.sqrt(max(e['soma_quad'] / e['n'] - media * media, 0.0))),
+            'min': e['min'], 'max': e['max'],
+        }
+        if coluna in histogramas:
+            h = histogramas[coluna]
+            info['quantis'] = dict(zip(map(str, QUANTILES), h.quantiles(QUANTILES, e['min'], e['max']).tolist()))
+            contagens, bordas = h.plot_histogram(e['min'], e['max'])
+            info['histograma'] = {'contagens': contagens.tolist(), 'bordas': bordas.tolist()}
+        else:
+            ordem = sorted(valores[coluna])
+            info['valores'] = ordem
+            info['contagens'] = [valores[coluna][v] for v in ordem]
+            acumulado = np.cumsum(info['contagens'])
+            info['quantis'] = {str(q): ordem[int(np.searchsorted(acumulado, q * acumulado[-1]))] for q in QUANTILES}
+        resumo['colunas'][coluna] = info
+    return resumo
+
+
+def cache_key(path):
+    """Chave do resumo em cache: muda se o arquivo (caminho, tamanho ou data) ou o cálculo mudar."""
+    info = os.stat(path)
+    bruto = f"{os.path.abspath(path)}|{info.st_size}|{info.st_mtime_ns}|v{SUMMARY_VERSION}|{MAX_BINS}|{PLOT_BINS}"
+    return hashlib.sha256(bruto.encode()).hexdigest()[:16]
+
+
+def load_summary(path, cache_dir=CACHE_DIR, use_cache=True):
+    """Resumo do arquivo, lido do cache quando o arquivo não mudou. Retorna (resumo, veio_do_cache)."""
+    chave = cache_key(path)
+    arquivo_cache = os.path.join(cache_dir, f"{os.path.basename(path)}.{chave}.json")
+    if use_cache and os.path.exists(arquivo_cache):
+        with open(arquivo_cache, encoding='utf-8') as f:
+            return json.load(f), True
+    resumo = summarize_dataset(path)
+    resumo['chave'] = chave
+    os.makedirs(cache_dir, exist_ok=True)
+    temporario = arquivo_cache + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(resumo, f)
+    os.replace(temporario, arquivo_cache)
+    return resumo, False
+
+
+# FIGURAS
+def plot_column(ax, coluna, info):
+    """Desenha o histograma da coluna a partir do resumo (mesmo estilo das figuras originais)."""
+    if info['tipo'] == 'continua':
+        bordas = np.asarray(info['histograma']['bordas'])
+        ax.hist(bordas[:-1], bins=bordas, weights=info['histograma']['contagens'],
+                color='skyblue', edgecolor='black')
+    else:
+        valores, contagens = np.asarray(info['valores']), np.asarray(info['contagens'])
+        # Poucos valores: uma barra centralizada em cada inteiro; muitos: 20 intervalos fixos
+        if len(valores) <= 10:
+            ax.hist(valores, bins=np.arange(valores.min() - 0.5, valores.max() + 1.5, 1), weights=contagens,
+                    color='lightcoral', edgecolor='black', rwidth=0.8)
+            ax.set_xticks(np.arange(valores.min(), valores.max() + 1, 1))
+        else:
+            ax.hist(valores, bins=INTEGER_PLOT_BINS, weights=contagens, color='lightcoral', edgecolor='black',
+                    rwidth=0.8)
+    ax.set_title(f'Distribuição de {coluna}')
+    ax.set_xlabel(coluna)
+    ax.set_ylabel('Frequência')
+
+
+def _init_worker():
+    # Cada processo desenha sem janela (backend não interativo)
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_figure(coluna, info, destino):
+    """Desenha uma coluna em um PNG (executado nos processos do pool). Retorna o caminho."""
+    _init_worker()
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(8, 6))
+    plot_column(ax, coluna, info)
+    fig.tight_layout()
+    fig.savefig(destino, dpi=100)
+    plt.close(fig)
+    return destino
+
+
+def render_figures(resumo, pasta, processos=None):
+    """
+    Desenha todas as colunas em paralelo. PNGs já gerados para o mesmo resumo
+    (mesma chave no nome) são reaproveitados. Retorna {coluna: caminho do PNG}.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    destinos = {c: os.path.join(pasta, f"{c}.{resumo['chave']}.png") for c in resumo['colunas']}
+    faltando = [c for c, destino in destinos.items() if not os.path.exists(destino)]
+    processos = processos or os.cpu_count() or 1
+    if processos == 1 or len(faltando) <= 1:
+        for c in faltando:
+            render_figure(c, resumo['colunas'][c], destinos[c])
     else:
-        bins_config = 20  # Para colunas com muitos valores únicos, usa 20 bins fixos
+        with concurrent.futures.ProcessPoolExecutor(min(processos, len(faltando)), initializer=_init_worker) as pool:
+            list(pool.map(render_figure, faltando, [resumo['colunas'][c] for c in faltando],
+                          [destinos[c] for c in faltando]))
+    return destinos
+
 
-    # Cria o histograma com a configuração de bins escolhida
-    plt.hist(dados_coluna, bins=bins_config, color='lightcoral', edgecolor='black', rwidth=0.8)
+# RELATÓRIO
+def _stats_table(resumo):
+    cabecalho = ['Coluna', 'Válidos', 'Ausentes', 'Média', 'Desvio', 'Mín.', 'Máx.'] + \
+                [f"p{q * 100:g}" for q in QUANTILES]
+    linhas = []
+    for coluna, info in resumo['colunas'].items():
+        celulas = [coluna, f"{info['n']:,}", f"{info['ausentes']:,}", f"{info['media']:.4g}", f"{info['desvio']:.4g}",
+                   f"{info['min']:.4g}", f"{info['max']:.4g}"] + [f"{info['quantis'][str(q)]:.4g}" for q in QUANTILES]
+        linhas.append("<tr>" + "".join(f"<td>{html.escape(c)}</td>" for c in celulas) + "</tr>")
+    return ("<table><tr>" + "".join(f"<th>{html.escape(c)}</th>" for c in cabecalho) + "</tr>"
+            + "".join(linhas) + "</table>")
 
-    # Títulos e rótulos
-    plt.title(f'Distribuição de {nome_coluna}')
-    plt.xlabel(nome_coluna)
-    plt.ylabel('Frequência')
 
-    # Se os valores forem inteiros e poucos, força os ticks no eixo X a serem inteiros
-    if valores_unicos <= 10:
-        plt.xticks(np.arange(min_val, max_val + 1, 1))
+def write_report(resumo, figuras, pasta):
+    """Grava o relatório HTML autocontido (figuras embutidas em base64). Retorna o caminho."""
+    imagens = []
+    for coluna, caminho in figuras.items():
+        with open(caminho, 'rb') as f:
+            dados = base64.b64encode(f.read()).decode('ascii')
+        imagens.append(f'<figure><img alt="{html.escape(coluna)}" src="data:image/png;base64,{dados}"></figure>')
+    anomalia = resumo['colunas'].get('Anomaly')
+    taxa = f"<p>Taxa de anomalias: {anomalia['media'] * 100:.2f}%</p>" if anomalia else ""
+    pagina = f"""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>Red Queen - Análise Exploratória</title>
+<style>body{{font-family:sans-serif;margin:2em}}table{{border-collapse:collapse}}
+td,th{{border:1px solid #ccc;padding:4px 8px;text-align:right}}figure{{display:inline-block;margin:0}}
+img{{width:480px}}</style></head><body>
+<h1>Red Queen - Análise Exploratória</h1>
+<p>Arquivo: {html.escape(resumo['arquivo'])}<br>Linhas: {resumo['linhas']:,}<br>
+Gerado em: {time.strftime('%Y-%m-%d %H:%M:%S')}</p>{taxa}
+<h2>Estatísticas</h2>{_stats_table(resumo)}
+<h2>Distribuições</h2>{''.join(imagens)}
+</body></html>"""
+    destino = os.path.join(pasta, "relatorio.html")
+    with open(destino, 'w', encoding='utf-8') as f:
+        f.write(pagina)
+    return destino
 
-    # Ajusta o layout
-    plt.tight_layout()
 
-    # Exibe o histograma
-    plt.show()
+def show_figures(resumo):
+    """Modo interativo (comportamento original): uma janela por coluna."""
+    import matplotlib.pyplot as plt
+    for coluna, info in resumo['colunas'].items():
+        fig, ax = plt.subplots(figsize=(8, 6))
+        plot_column(ax, coluna, info)
+        fig.tight_layout()
+        plt.show()
 
-print("Histogramas das colunas de inteiros gerados com sucesso.")
-print("\nAnálise concluída!")
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Análise exploratória (relatório HTML/PNG) de um dataset da Red Queen.")
+    parser.add_argument("arquivo", nargs="?", default="Red_Queen_Synthetic_Dataset.csv")
+    parser.add_argument("--saida", default=REPORT_DIR, help="Pasta do relatório")
+    parser.add_argument("--processos", type=int, default=None, help="Processos para desenhar (padrão: nº de CPUs)")
+    parser.add_argument("--sem-cache", action="store_true", help="Relê o arquivo mesmo com resumo em cache")
+    parser.add_argument("--mostrar", action="store_true", help="Abre as figuras em janelas em vez de gerar o relatório")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.arquivo):
+        # Mensagem de erro se o arquivo não for encontrado
+        print(f"Erro: O arquivo '{args.arquivo}' não foi encontrado.")
+        print("Verifique se o caminho do arquivo está correto ou coloque o arquivo na mesma pasta do script.")
+        raise SystemExit(1)
+
+    inicio = time.perf_counter()
+    resumo, do_cache = load_summary(args.arquivo, use_cache=not args.sem_cache)
+    tempo_resumo = time.perf_counter() - inicio
+    print(f"Resumo de {resumo['linhas']:,} linhas {'lido do cache' if do_cache else 'calculado'} "
+          f"em {tempo_resumo * 1000:.0f} ms")
+
+    if args.mostrar:
+        show_figures(resumo)
+    else:
+        inicio = time.perf_counter()
+        figuras = render_figures(resumo, args.saida, args.processos)
+        relatorio = write_report(resumo, figuras, args.saida)
+        print(f"Figuras e relatório em {(time.perf_counter() - inicio) * 1000:.0f} ms: {relatorio}")
+    print("\nAnálise concluída!")
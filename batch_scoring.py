@@ -0,0 +1,60 @@
+# PONTUAÇÃO EM LOTE (VETORIZADA) DA RED QUEEN
+# Pontua um DataFrame inteiro em blocos, com uma única chamada a predict_proba
+# por bloco, em vez de uma previsão por linha a cada rerun do painel.
+
+import numpy as np                       # Operações vetorizadas
+import pandas as pd                      # Manipulação de dados
+
+from instrumentation import METRICS      # Latência por bloco, linhas pontuadas e alertas
+from temporal_features import prepare_frame  # Features temporais (se o modelo as usa), vetorizadas
+
+# PARÂMETROS DA PONTUAÇÃO
+CHUNK_SIZE = 100_000                     # Linhas por chamada a predict_proba (limita a memória intermediária)
+DECISION_THRESHOLD = 0.5                 # Corte padrão (o de XGBClassifier.predict), se o artefato não tiver um calibrado
+
+
+def decision_threshold(model):
+    """Limiar de decisão do modelo: o calibrado e gravado no artefato (calibration.py) ou o padrão."""
+    return float(getattr(model, 'threshold_decisao', DECISION_THRESHOLD))
+
+
+def score_dataframe(model, df, chunk_size=CHUNK_SIZE, progress=None, threshold=None):
+    """
+    Pontua todas as linhas de df em blocos de chunk_size, com uma única
+    chamada a predict_proba por bloco (a previsão sai da mesma probabilidade).
+    Retorna um DataFrame (mesmo índice de df) com as colunas:
+    - 'Prediction': 1 para anomalia, 0 para seguro
+    - 'Confidence': probabilidade de anomalia em %
+    progress(fração) é chamado após cada bloco, se informado. threshold: padrão, o do modelo.
+    """
+    feature_names = model.get_booster().feature_names
+    # Reordena as features uma única vez e converte para um bloco contíguo float32
+    X = prepare_frame(df, feature_names)[feature_names].to_numpy(dtype=np.float32)
+
+    n_linhas = len(X)
+    proba = np.empty(n_linhas, dtype=np.float32)
+    for inicio in range(0, n_linhas, chunk_size):
+        fim = min(inicio + chunk_size, n_linhas)
+        with METRICS.timed('predict_lote'):
+            proba[inicio:fim] = model.predict_proba(X[inicio:fim])[:, 1]
+        if progress is not None:
+            progress(fim / n_linhas)
+
+    threshold = decision_threshold(model) if threshold is None else threshold
+    prediction = (proba > threshold).astype(np.int8)
+    METRICS.record_scores(n_linhas, int(prediction.sum()))
+    return pd.DataFrame({
+        'Prediction': prediction,
+        'Confidence': proba * 100,
+    }, index=df.index)
+
+
+def summarize_scores(scores):
+    """Resumo da análise em lote: total de linhas, anomalias e taxa de anomalias (%)."""
+    total = len(scores)
+    anomalias = int(scores['Prediction'].sum())
+    return {
+        'total': total,
+        'anomalias': anomalias,
+        'taxa': (anomalias / total * 100) if total else 0.0,
+    }
@@ -0,0 +1,240 @@
+# BENCHMARK DO CAMINHO CRÍTICO DA RED QUEEN
+# Mede separadamente cada etapa da detecção, no dataset incluído no projeto e
+# em datasets gerados (10k/1M/10M linhas), e grava os resultados em JSON com
+# linhas/s e latências p50/p99. O modo de comparação aponta regressões em
+# relação a um baseline salvo.
+#
+#   python benchmark.py --tamanhos 10000,1000000 --saida bench.json
+#   python benchmark.py --tamanhos 10000 --comparar bench_baseline.json
+
+import json                              # Resultados e baseline
+import os                                # Arquivos temporários
+import platform                          # Metadados da máquina
+import sys                               # Código de saída em caso de regressão
+import tempfile                          # Datasets gerados
+import time                              # Cronômetro
+import numpy as np                       # Percentis
+import pandas as pd                      # Histórico legado (pd.concat)
+
+from compiled_model import compile_booster
+from dataset_io import read_dataset
+from drift_monitor import DriftBaseline, DriftMonitor
+from model_store import EXPECTED_COLUMNS, TARGET_COLUMN, enrich_dataset, fit_model
+from ring_buffer import SensorHistory, DEFAULT_WINDOW
+from unsupervised_detector import from_normal_profile
+
+# PARÂMETROS DO BENCHMARK
+BUNDLED_DATASET = "Red_Queen_Synthetic_Dataset.csv"
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+SINGLE_ROW_CALLS = 200                   # Chamadas de uma linha para os percentis de latência
+TICKS = 2_000                            # Ticks simulados do painel
+LEGACY_TICKS = 500                       # Ticks do histórico legado (pd.concat é O(n²))
+REGRESSION_TOLERANCE = 0.20              # Piora relativa tolerada antes de apontar regressão
+
+
+def measure(fn, repeats=1, rows_per_call=1, warmup=0):
+    """
+    Executa fn 'repeats' vezes e resume as latências (ms) e a vazão (linhas/s).
+    Retorna o dict gravado no JSON de resultados.
+    """
+    for _ in range(warmup):
+        fn()
+    latencias = np.empty(repeats)
+    for i in range(repeats):
+        inicio = time.perf_counter()
+        fn()
+        latencias[i] = time.perf_counter() - inicio
+    total = latencias.sum()
+    return {
+        'repeticoes': repeats,
+        'linhas_por_chamada': rows_per_call,
+        'linhas_por_s': rows_per_call * repeats / total if total > 0 else float('inf'),
+        'p50_ms': float(np.percentile(latencias, 50) * 1000),
+        'p99_ms': float(np.percentile(latencias, 99) * 1000),
+    }
+
+
+def benchmark_dataset(path, quick=False):
+    """Roda todas as etapas em um dataset e retorna {etapa: métricas}."""
+    resultados = {}
+    chamadas = SINGLE_ROW_CALLS // 10 if quick else SINGLE_ROW_CALLS
+
+    # CARGA DO CSV (load_data)
+    df = read_dataset(path)
+    n = len(df)
+    resultados['load_data'] = measure(lambda: read_dataset(path), repeats=1 if n > 100_000 else 5, rows_per_call=n)
+
+    # TREINAMENTO (train_model)
+    df_enriquecido = enrich_dataset(df)
+    modelo = {}
+    def treinar():
+        modelo['m'], _ = fit_model(df_enriquecido)
+    resultados['train_model'] = measure(treinar, repeats=1, rows_per_call=len(df_enriquecido))
+    model = modelo['m']
+
+    # PREVISÃO: UMA LINHA POR VEZ (como o painel fazia) vs. EM LOTE
+    feature_names = model.get_booster().feature_names
+    X = df[feature_names]
+    indices = np.random.default_rng(0).integers(0, n, chamadas)
+    linhas = iter(np.resize(indices, chamadas * 2))
+    resultados['predict_linha'] = measure(lambda: model.predict(X.iloc[[next(linhas)]]), repeats=chamadas, warmup=1)
+    linhas = iter(np.resize(indices, chamadas * 2))
+    resultados['predict_proba_linha'] = measure(lambda: model.predict_proba(X.iloc[[next(linhas)]]),
+                                                repeats=chamadas, warmup=1)
+    resultados['predict_lote'] = measure(lambda: model.predict(X), repeats=1 if n > 100_000 else 5, rows_per_call=n)
+    resultados['predict_proba_lote'] = measure(lambda: model.predict_proba(X), repeats=1 if n > 100_000 else 5,
+                                               rows_per_call=n)
+
+    # MOTOR COMPILADO (NumPy puro, sem DataFrame): uma linha vs. em lote
+    compilado = compile_booster(model)
+    matriz = X.to_numpy(dtype=np.float32)
+    linhas = iter(np.resize(indices, chamadas * 2))
+    resultados['compilado_linha'] = measure(lambda: compilado.predict_proba(matriz[next(linhas)]),
+                                            repeats=chamadas, warmup=1)
+    resultados['compilado_lote'] = measure(lambda: compilado.predict_proba(matriz), repeats=1 if n > 100_000 else 5,
+                                           rows_per_call=n)
+
+    # DETECTOR NÃO SUPERVISIONADO (Mahalanobis em fluxo): pontuar e aprender uma leitura, e em lote
+    detector = from_normal_profile()
+    leituras = df[EXPECTED_COLUMNS].to_numpy(dtype=np.float64)
+    linhas = iter(np.resize(indices, chamadas * 2))
+    resultados['mahalanobis_linha'] = measure(lambda: detector.predict_proba(leituras[next(linhas)]),
+                                              repeats=chamadas, warmup=1)
+    resultados['mahalanobis_lote'] = measure(lambda: detector.predict_proba(leituras),
+                                             repeats=1 if n > 100_000 else 5, rows_per_call=n)
+    linhas = iter(np.resize(indices, chamadas * 2))
+    resultados['mahalanobis_aprendizado'] = measure(lambda: detector.partial_fit(leituras[next(linhas)]),
+                                                    repeats=chamadas, warmup=1)
+
+    # MONITOR DE DERIVA: referência em duas passadas e janela deslizante em micro-lotes de 50 leituras
+    resultados['deriva_referencia'] = measure(lambda: DriftBaseline.from_frame(df), repeats=1 if n > 100_000 else 3,
+                                              rows_per_call=n)
+    monitor = DriftMonitor(DriftBaseline.from_frame(df))
+    lotes = iter([leituras[i:i + 50] for i in np.resize(np.arange(0, max(n - 50, 1), 50), chamadas * 2)])
+    resultados['deriva_micro_lote'] = measure(lambda: monitor.update(next(lotes)), repeats=chamadas, warmup=1,
+                                              rows_per_call=50)
+
+    # EXPLICAÇÃO SHAP (create_explainer + explicação por linha)
+    import shap                          # Importado só aqui: é a etapa mais pesada de carregar
+    explicador = {}
+    def criar_explainer():
+        explicador['e'] = shap.TreeExplainer(model)
+    resultados['create_explainer'] = measure(criar_explainer, repeats=1 if quick else 3)
+    linhas = iter(np.resize(indices, chamadas * 2))
+    resultados['shap_linha'] = measure(lambda: explicador['e'](X.iloc[[next(linhas)]]), repeats=chamadas, warmup=1)
+
+    # TRABALHO POR TICK DO PAINEL: append no histórico + fatias dos gráficos
+    ticks = TICKS // 10 if quick else TICKS
+    valores = df[EXPECTED_COLUMNS].to_numpy(dtype=np.float64)
+    historico = SensorHistory(EXPECTED_COLUMNS, DEFAULT_WINDOW)
+    posicao = iter(range(ticks * 2))
+    def tick_ring_buffer():
+        i = next(posicao) % n
+        historico.append(valores[i], i)
+        for coluna in ('T_Virus_Level', 'Humidity', 'Room_Temperature', 'Gas_Leak_Level'):
+            historico.series(coluna)
+    resultados['tick_historico'] = measure(tick_ring_buffer, repeats=ticks, warmup=1)
+
+    # Referência: histórico legado com pd.concat + tail(100), para comparar com o buffer circular
+    legado = {'h': pd.DataFrame()}
+    posicao_legado = iter(range(LEGACY_TICKS * 2))
+    def tick_legado():
+        i = next(posicao_legado) % n
+        legado['h'] = pd.concat([legado['h'], df.iloc[[i]]])
+        for coluna in ('T_Virus_Level', 'Humidity', 'Room_Temperature', 'Gas_Leak_Level'):
+            legado['h'][coluna].tail(100)
+    resultados['tick_historico_legado'] = measure(tick_legado, repeats=LEGACY_TICKS // 10 if quick else LEGACY_TICKS)
+    return resultados
+
+
+def generate_dataset(linhas, pasta):
+    """Gera um CSV sintético com o gerador do projeto (semente fixa, para resultados comparáveis)."""
+    from gerador_de_dataset import gerar_dataset
+    caminho = os.path.join(pasta, f"bench_{linhas}.csv")
+    gerar_dataset(linhas, nome_arquivo=caminho, semente=42)
+    return caminho
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, quick=False):
+    """Roda o benchmark no dataset incluído e em cada tamanho gerado. Retorna o relatório completo."""
+    import xgboost
+    relatorio = {
+        'meta': {
+            'data': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'xgboost': xgboost.__version__,
+            'nucleos': os.cpu_count(),
+            'maquina': platform.platform(),
+        },
+        'resultados': {},
+    }
+    print(f"[{BUNDLED_DATASET}]")
+    relatorio['resultados']['bundled'] = benchmark_dataset(BUNDLED_DATASET, quick)
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in sizes:
+            print(f"[{linhas:,} linhas geradas]")
+            caminho = generate_dataset(linhas, pasta)
+            relatorio['resultados'][f"gerado_{linhas}"] = benchmark_dataset(caminho, quick)
+            os.remove(caminho)
+    return relatorio
+
+
+def compare(atual, baseline, tolerancia=REGRESSION_TOLERANCE):
+    """
+    Compara dois relatórios. Uma etapa regride se o p50 piorar mais que a
+    tolerância ou se a vazão cair mais que a tolerância. Retorna a lista de regressões.
+    """
+    regressoes = []
+    for dataset, etapas in atual['resultados'].items():
+        for etapa, metricas in etapas.items():
+            base = baseline.get('resultados', {}).get(dataset, {}).get(etapa)
+            if base is None:
+                continue
+            piora_p50 = metricas['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0.0
+            queda_vazao = 1 - metricas['linhas_por_s'] / base['linhas_por_s'] if base['linhas_por_s'] else 0.0
+            if piora_p50 > tolerancia or queda_vazao > tolerancia:
+                regressoes.append({'dataset': dataset, 'etapa': etapa,
+                                   'p50_ms': (base['p50_ms'], metricas['p50_ms']),
+                                   'linhas_por_s': (base['linhas_por_s'], metricas['linhas_por_s'])})
+    return regressoes
+
+
+def print_report(relatorio):
+    for dataset, etapas in relatorio['resultados'].items():
+        print(f"\n{dataset}")
+        print(f"  {'etapa':<24} {'linhas/s':>14} {'p50 (ms)':>12} {'p99 (ms)':>12}")
+        for etapa, m in etapas.items():
+            print(f"  {etapa:<24} {m['linhas_por_s']:>14,.0f} {m['p50_ms']:>12.3f} {m['p99_ms']:>12.3f}")
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark do caminho crítico da Red Queen.")
+    parser.add_argument("--tamanhos", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Tamanhos dos datasets gerados, separados por vírgula (vazio: só o incluído)")
+    parser.add_argument("--saida", default="bench_resultados.json", help="Arquivo JSON de resultados")
+    parser.add_argument("--comparar", default=None, help="JSON de baseline para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=REGRESSION_TOLERANCE,
+                        help="Piora relativa tolerada (0.2 = 20%%)")
+    parser.add_argument("--rapido", action="store_true", help="Menos repetições (para checagens rápidas)")
+    args = parser.parse_args()
+
+    tamanhos = [int(t) for t in args.tamanhos.split(",") if t.strip()]
+    relatorio = run_benchmarks(tamanhos, args.rapido)
+    print_report(relatorio)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2)
+    print(f"\nResultados gravados em '{args.saida}'.")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressoes = compare(relatorio, baseline, args.tolerancia)
+        if regressoes:
+            print(f"\n🚨 {len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}:")
+            for r in regressoes:
+                print(f"  {r['dataset']}/{r['etapa']}: p50 {r['p50_ms'][0]:.3f} -> {r['p50_ms'][1]:.3f} ms, "
+                      f"linhas/s {r['linhas_por_s'][0]:,.0f} -> {r['linhas_por_s'][1]:,.0f}")
+            sys.exit(1)
+        print(f"\n✅ Nenhuma regressão acima de {args.tolerancia:.0%} em relação a '{args.comparar}'.")
@@ -0,0 +1,178 @@
+# CALIBRAÇÃO DO LIMIAR DE DECISÃO DA RED QUEEN
+# Escolhe o ponto de operação do modelo a partir das probabilidades fora do
+# fold (out-of-fold), calculadas uma única vez por artefato e guardadas ao lado
+# dele: a varredura de todos os limiares é uma ordenação + somas acumuladas,
+# sem pontuar o dataset de novo. O limiar pode ser escolhido por recall alvo,
+# por orçamento de alertas ou pelo menor custo (falso negativo x falso
+# positivo), e é gravado nos metadados do artefato; o painel, a pontuação em
+# lote, o serviço e a ingestão ao vivo passam a usá-lo ao carregar o modelo.
+#
+#   python calibration.py --recall 0.99
+#   python calibration.py --orcamento 0.05
+#   python calibration.py --custo-fn 50 --custo-fp 1
+
+import os                                # Arquivo das probabilidades no artefato
+import numpy as np                       # Varredura vetorizada dos limiares
+import pandas as pd                      # Curva de operação
+
+from model_store import MODEL_DIR, artifact_path, compute_data_hash, update_metadata
+
+# PARÂMETROS DA CALIBRAÇÃO
+OOF_FILE = "oof_proba.npz"               # Probabilidades fora do fold, na pasta do artefato
+N_FOLDS = 5                              # Folds usados para as probabilidades fora do fold
+COST_FN = 50.0                           # Custo de uma anomalia não detectada
+COST_FP = 1.0                            # Custo de um alarme falso
+
+
+def load_or_compute_oof(df, model_dir=MODEL_DIR, n_folds=N_FOLDS, temporal_window=None):
+    """
+    Probabilidades fora do fold de df: lidas do artefato correspondente ao hash
+    dos dados ou calculadas (k-fold, model_search.py) e gravadas nele.
+    Retorna (y, proba).
+    """
+    path = artifact_path(compute_data_hash(df, temporal_window), model_dir)
+    arquivo = os.path.join(path, OOF_FILE)
+    try:
+        with np.load(arquivo) as dados:
+            if int(dados['n_folds']) == n_folds and len(dados['y']) == len(df):
+                return dados['y'], dados['proba']
+    except (OSError, KeyError, ValueError):
+        pass  # Ausente, de outro número de folds ou corrompido: recalcula
+
+    from model_search import out_of_fold_probabilities  # Importa xgboost e sklearn só quando precisa
+    y, proba, folds = out_of_fold_probabilities(df, n_folds, temporal_window)
+    os.makedirs(path, exist_ok=True)
+    arquivo_tmp = arquivo + ".tmp"
+    with open(arquivo_tmp, "wb") as f:
+        np.savez(f, y=y, proba=proba, folds=folds, n_folds=n_folds)
+    os.replace(arquivo_tmp, arquivo)
+    return y, proba
+
+
+def threshold_curve(y, proba):
+    """
+    Todos os pontos de operação distintos (um por valor de probabilidade), com
+    o limiar no meio entre valores vizinhos. Para cada limiar, alerta quem tem
+    proba > limiar. Retorna um DataFrame em ordem crescente de limiar.
+    """
+    y = np.asarray(y, dtype=np.int64)
+    proba = np.asarray(proba, dtype=np.float64)
+    if len(proba) == 0:
+        return pd.DataFrame(columns=['limiar', 'alertas', 'vp', 'fp', 'fn', 'recall', 'precisao', 'taxa_alerta'])
+    ordem = np.argsort(-proba, kind='stable')
+    p, rotulos = proba[ordem], y[ordem]
+    # Fim de cada grupo de probabilidades iguais: alertar um elemento do grupo é alertar todos
+    fim = np.flatnonzero(np.r_[p[1:] != p[:-1], True])
+    vp = np.cumsum(rotulos)[fim]
+    fp = np.cumsum(1 - rotulos)[fim]
+    proximo = np.r_[p[fim[:-1] + 1], 0.0]
+    limiar = (p[fim] + proximo) / 2.0
+    positivos = int(y.sum())
+    alertas = vp + fp
+    curva = pd.DataFrame({
+        'limiar': limiar,
+        'alertas': alertas,
+        'vp': vp,
+        'fp': fp,
+        'fn': positivos - vp,
+        'recall': vp / max(positivos, 1),
+        'precisao': vp / alertas,
+        'taxa_alerta': alertas / len(y),
+    })
+    return curva.iloc[::-1].reset_index(drop=True)
+
+
+def choose_threshold(curva, target_recall=None, alert_budget=None, cost_fn=COST_FN, cost_fp=COST_FP):
+    """
+    Ponto de operação da curva:
+    - target_recall: o maior limiar (menos alertas) com recall >= alvo
+    - alert_budget: o menor limiar (mais recall) com taxa de alerta <= orçamento
+    - os dois: o maior limiar que cumpre o recall dentro do orçamento
+    - nenhum: o menor custo cost_fn x FN + cost_fp x FP
+    Retorna a linha escolhida (Series, com a coluna 'custo'); ValueError se nenhum limiar cumpre as metas.
+    """
+    curva = curva.assign(custo=cost_fn * curva['fn'] + cost_fp * curva['fp'])
+    validos = np.ones(len(curva), dtype=bool)
+    if target_recall is not None:
+        validos &= curva['recall'].to_numpy() >= target_recall
+    if alert_budget is not None:
+        validos &= curva['taxa_alerta'].to_numpy() <= alert_budget
+    candidatos = curva[validos]
+    if candidatos.empty:
+        raise ValueError("Nenhum limiar atinge o recall alvo dentro do orçamento de alertas.")
+    if target_recall is not None:
+        return candidatos.iloc[-1]
+    if alert_budget is not None:
+        return candidatos.iloc[0]
+    # Empate no custo: o maior limiar (menos alertas)
+    return candidatos.iloc[len(candidatos) - 1 - int(np.argmin(candidatos['custo'].to_numpy()[::-1]))]
+
+
+def save_threshold(path, ponto, criterio, n_folds=N_FOLDS):
+    """Grava o limiar escolhido (e como foi escolhido) nos metadados do artefato em path."""
+    return update_metadata(path, {
+        'decision_threshold': float(ponto['limiar']),
+        'calibration': {
+            'criterio': criterio,
+            'folds': n_folds,
+            'recall': float(ponto['recall']),
+            'precisao': float(ponto['precisao']),
+            'taxa_alerta': float(ponto['taxa_alerta']),
+        },
+    })
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    import time
+    from dataset_io import read_dataset
+    from batch_scoring import DECISION_THRESHOLD
+    from model_store import enrich_dataset, load_or_train
+    parser = argparse.ArgumentParser(description="Calibra o limiar de decisão do modelo Red Queen.")
+    parser.add_argument("--data", default="Red_Queen_Synthetic_Dataset.csv", help="CSV de treino")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="Pasta dos artefatos")
+    parser.add_argument("--janela-temporal", type=int, default=0,
+                        help="Janela das features temporais do modelo (0: só as leituras)")
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--recall", type=float, default=None, help="Recall mínimo (ex.: 0.99)")
+    parser.add_argument("--orcamento", type=float, default=None, help="Fração máxima de leituras em alerta")
+    parser.add_argument("--custo-fn", type=float, default=COST_FN, help="Custo de uma anomalia perdida")
+    parser.add_argument("--custo-fp", type=float, default=COST_FP, help="Custo de um alarme falso")
+    parser.add_argument("--nao-gravar", action="store_true", help="Só mostra o limiar, sem gravar no artefato")
+    args = parser.parse_args()
+
+    janela = args.janela_temporal or None
+    df = enrich_dataset(read_dataset(args.data))
+    _, meta = load_or_train(df, args.model_dir, compiled=True, temporal_window=janela)
+    path = artifact_path(meta['data_hash'], args.model_dir)
+
+    inicio = time.perf_counter()
+    y, proba = load_or_compute_oof(df, args.model_dir, args.folds, janela)
+    print(f"Probabilidades fora do fold: {time.perf_counter() - inicio:.2f}s ({len(y):,} leituras)")
+    inicio = time.perf_counter()
+    curva = threshold_curve(y, proba)
+    print(f"Varredura de {len(curva):,} limiares: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    if args.recall is not None or args.orcamento is not None:
+        criterio = {'recall': args.recall, 'orcamento': args.orcamento}
+    else:
+        criterio = {'custo_fn': args.custo_fn, 'custo_fp': args.custo_fp}
+    try:
+        ponto = choose_threshold(curva, args.recall, args.orcamento, args.custo_fn, args.custo_fp)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    # Ponto de operação do limiar padrão, para comparação (mesmos alertas de proba > DECISION_THRESHOLD);
+    # acima da maior probabilidade nenhum ponto da curva corresponde a ele
+    atuais = curva[curva['alertas'] <= int((proba > DECISION_THRESHOLD).sum())]
+    atual = atuais.iloc[0] if not atuais.empty else None
+    for nome, limiar, linha in (("limiar padrão", DECISION_THRESHOLD, atual),
+                                ("limiar calibrado", ponto['limiar'], ponto)):
+        if linha is None:
+            print(f"{nome:<17} {limiar:.4f}  n/a (nenhuma leitura acima do limiar)")
+            continue
+        print(f"{nome:<17} {limiar:.4f}  recall {linha['recall']:6.1%}  precisão {linha['precisao']:6.1%}  "
+              f"alertas {linha['taxa_alerta']:6.2%}  FN {int(linha['fn']):,}  FP {int(linha['fp']):,}")
+    if not args.nao_gravar:
+        save_threshold(path, ponto, criterio, args.folds)
+        print(f"Limiar gravado em {path}")
@@ -0,0 +1,186 @@
+# MOTOR DE INFERÊNCIA COMPILADO DA RED QUEEN
+# Exporta o booster treinado para vetores planos (feature, limiar, filhos,
+# direção padrão e valor de folha de cada nó) e avalia todas as árvores com
+# NumPy puro, sem DataFrame, sem reordenar colunas a cada chamada e sem
+# importar xgboost, shap ou sklearn. As probabilidades são as mesmas do
+# booster (mesma comparação em float32 e mesma margem base).
+#
+#   python compiled_model.py modelos/<hash>/model.ubj            (confere contra o booster, sem gravar)
+#   python compiled_model.py modelos/<hash>/model.ubj --salvar   (regrava o model_compiled.npz do artefato)
+
+import json                              # Dump JSON do booster
+import math                              # Margem base (logit do base_score)
+import numpy as np                       # Vetores dos nós e avaliação em lote
+
+# PARÂMETROS DO MOTOR
+COMPILED_FORMAT = 1                      # Versão do formato do arquivo .npz
+SUPPORTED_OBJECTIVES = ('binary:logistic', 'reg:logistic')
+BLOCK_ROWS = 1024                        # Linhas por bloco na avaliação (intermediários cabem no cache)
+FLOAT32_MAX = np.finfo(np.float32).max   # +inf é limitado a isto: fica à direita de todo limiar, mas não das folhas
+
+
+class CompiledModel:
+    """
+    Floresta de árvores em vetores planos. Os filhos de cada nó são adjacentes
+    (direito = esquerdo + 1), então descer um nível é left[nó] + (x >= limiar).
+    As folhas apontam para si mesmas com limiar +inf, e max_depth iterações
+    levam qualquer linha até a sua folha, em todas as árvores ao mesmo tempo.
+    Expõe a mesma interface usada pelo projeto no XGBClassifier
+    (predict_proba, predict e get_booster().feature_names).
+    """
+
+    def __init__(self, feature, threshold, left, default_left, value, roots, max_depth,
+                 base_margin, feature_names, threshold_decisao=0.5):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.base_margin = float(base_margin)
+        self.feature_names = list(feature_names)
+        self.threshold_decisao = threshold_decisao
+
+    def get_booster(self):
+        """Compatibilidade com o XGBClassifier (o projeto lê get_booster().feature_names)."""
+        return self
+
+    def _matrix(self, X):
+        # DataFrames são reordenados pelos nomes; matrizes já devem estar na ordem das features
+        if hasattr(X, 'columns'):
+            X = X[self.feature_names].to_numpy(dtype=np.float32)
+        return np.ascontiguousarray(X, dtype=np.float32).reshape(-1, len(self.feature_names))
+
+    def _margin_block(self, X):
+        n, n_features = X.shape
+        # +inf passaria do limiar +inf das folhas e desceria para um nó errado; NaN segue NaN
+        valores = np.minimum(X.ravel(), FLOAT32_MAX)
+        base = (np.arange(n, dtype=np.int32) * n_features)[:, None]
+        ausentes = np.isnan(valores).any()
+        nos = np.broadcast_to(self.roots, (n, len(self.roots)))
+        for _ in range(self.max_depth):
+            x = valores.take(base + self.feature.take(nos))
+            direita = x >= self.threshold.take(nos)
+            if ausentes:
+                # Mesma regra do XGBoost: valor ausente segue a direção padrão do nó
+                direita = np.where(np.isnan(x), ~self.default_left.take(nos), direita)
+            nos = self.left.take(nos) + direita
+        return self.value.take(nos).sum(axis=1, dtype=np.float32)
+
+    def predict_margin(self, X):
+        """Soma das folhas + margem base (log-odds) de cada linha."""
+        X = self._matrix(X)
+        margem = np.empty(len(X), dtype=np.float32)
+        for inicio in range(0, len(X), BLOCK_ROWS):
+            margem[inicio:inicio + BLOCK_ROWS] = self._margin_block(X[inicio:inicio + BLOCK_ROWS])
+        return margem + np.float32(self.base_margin)
+
+    def predict_proba(self, X):
+        """Probabilidades (n x 2), como no XGBClassifier."""
+        proba = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - proba, proba])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > self.threshold_decisao).astype(np.int8)
+
+    # PERSISTÊNCIA
+    def save(self, path):
+        """Grava os vetores em um .npz (o arquivo deve terminar em .npz)."""
+        np.savez(path, formato=COMPILED_FORMAT, feature=self.feature, threshold=self.threshold,
+                 left=self.left, default_left=self.default_left, value=self.value, roots=self.roots,
+                 max_depth=self.max_depth, base_margin=self.base_margin,
+                 feature_names=np.array(self.feature_names))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as dados:
+            if int(dados['formato']) != COMPILED_FORMAT:
+                raise ValueError(f"Formato de modelo compilado incompatível em {path}: {int(dados['formato'])}")
+            return cls(dados['feature'], dados['threshold'], dados['left'], dados['default_left'],
+                       dados['value'], dados['roots'], int(dados['max_depth']), float(dados['base_margin']),
+                       [str(n) for n in dados['feature_names']])
+
+
+def compile_booster(model):
+    """Converte um XGBClassifier ou xgboost.Booster em CompiledModel (a partir do dump JSON)."""
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    learner = json.loads(booster.save_raw('json'))['learner']
+
+    objetivo = learner['objective']['name']
+    if objetivo not in SUPPORTED_OBJECTIVES:
+        raise ValueError(f"Objetivo não suportado pelo motor compilado: {objetivo}")
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+    base_margin = math.log(base_score / (1.0 - base_score))
+
+    feature, threshold, left, default_left, value, roots = [], [], [], [], [], []
+    max_depth = 0
+    for arvore in learner['gradient_booster']['model']['trees']:
+        if any(arvore['split_type']):
+            raise ValueError("Divisões categóricas não são suportadas pelo motor compilado.")
+        esq, dir_ = arvore['left_children'], arvore['right_children']
+        roots.append(len(feature))
+
+        # Renumera a árvore em largura, para que os dois filhos de cada nó fiquem lado a lado
+        ordem, nivel, profundidade = [], [0], -1
+        while nivel:
+            ordem.extend(nivel)
+            profundidade += 1
+            nivel = [filho for no in nivel if esq[no] != -1 for filho in (esq[no], dir_[no])]
+        max_depth = max(max_depth, profundidade)
+        novo_id = {no: roots[-1] + i for i, no in enumerate(ordem)}
+        for no in ordem:
+            if esq[no] == -1:
+                # Folha: aponta para si mesma e nunca desce (limiar +inf, ausente vai à "esquerda")
+                feature.append(0)
+                threshold.append(np.inf)
+                left.append(novo_id[no])
+                default_left.append(True)
+                value.append(arvore['split_conditions'][no])
+            else:
+                feature.append(arvore['split_indices'][no])
+                threshold.append(arvore['split_conditions'][no])
+                left.append(novo_id[esq[no]])
+                default_left.append(bool(arvore['default_left'][no]))
+                value.append(0.0)
+
+    return CompiledModel(np.asarray(feature, dtype=np.int32), np.asarray(threshold, dtype=np.float32),
+                         np.asarray(left, dtype=np.int32), np.asarray(default_left, dtype=bool),
+                         np.asarray(value, dtype=np.float32), np.asarray(roots, dtype=np.int32),
+                         max_depth, base_margin, booster.feature_names)
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    import time
+    import xgboost as xgb                # Só para exportar e conferir
+    parser = argparse.ArgumentParser(description="Compila o booster para o motor NumPy e confere as probabilidades.")
+    parser.add_argument("modelo", help="Arquivo do booster (ex.: modelos/<hash>/model.ubj)")
+    parser.add_argument("--saida", default=None, help="Grava o modelo compilado neste arquivo .npz")
+    parser.add_argument("--salvar", action="store_true",
+                        help="Grava o modelo compilado ao lado do booster (substitui o do artefato)")
+    args = parser.parse_args()
+
+    booster = xgb.Booster()
+    booster.load_model(args.modelo)
+    compilado = compile_booster(booster)
+    # Só a conferência não altera nada: o artefato pode estar servindo
+    saida = args.saida or (args.modelo.rsplit(".", 1)[0] + "_compiled.npz" if args.salvar else None)
+    if saida:
+        compilado.save(saida)
+
+    X = np.random.default_rng(0).normal(50, 30, (10_000, len(compilado.feature_names))).astype(np.float32)
+    esperado = booster.predict(xgb.DMatrix(X, feature_names=compilado.feature_names))
+    diferenca = np.abs(compilado.predict_proba(X)[:, 1] - esperado).max()
+    # Valores infinitos e ausentes (o DMatrix recusa inf; inplace_predict os avalia como o XGBoost em produção)
+    X_extremos = X[:1000].copy()
+    X_extremos[::3, 0], X_extremos[1::5, -1], X_extremos[2::7, 1] = np.inf, -np.inf, np.nan
+    diferenca_extremos = np.abs(compilado.predict_proba(X_extremos)[:, 1] - booster.inplace_predict(X_extremos)).max()
+    inicio = time.perf_counter()
+    for linha in X[:1000]:
+        compilado.predict_proba(linha)
+    destino = f"gravado em '{saida}'" if saida else "não gravado (use --salvar ou --saida)"
+    print(f"Modelo compilado {destino} ({len(compilado.feature)} nós, profundidade {compilado.max_depth}).")
+    print(f"Diferença máxima para o booster: {diferenca:.2e} ({diferenca_extremos:.2e} com ±inf/NaN); "
+          f"latência por linha: {(time.perf_counter() - inicio) * 1000:.1f} µs")
@@ -0,0 +1,133 @@
+# LEITURA TIPADA DE DATASETS (CSV, PARQUET E ARROW)
+# Carrega apenas as colunas necessárias com um esquema explícito: sensores em
+# float32 e colunas categóricas/contagens em int8. Parquet e Arrow (IPC/Feather)
+# são lidos com memory-map sempre que possível.
+#
+#   python dataset_io.py Red_Queen_Synthetic_Dataset.csv Red_Queen_Synthetic_Dataset.parquet
+
+import os                                # Extensão dos arquivos
+import numpy as np                       # Tipos das colunas
+import pandas as pd                      # Manipulação de dados
+import pyarrow as pa                     # Leitura/escrita colunar
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from model_store import EXPECTED_COLUMNS, TARGET_COLUMN
+
+# ESQUEMA DAS COLUNAS
+# As features são convertidas para float32 pelo próprio XGBoost, então não há perda de precisão no modelo
+SCHEMA = {
+    'T_Virus_Level':        np.float32,
+    'Room_Temperature':     np.float32,
+    'Humidity':             np.float32,
+    'Gas_Leak_Level':       np.float32,
+    'Security_Clearance':   np.int8,
+    'AI_Override_Attempts': np.int8,
+    'Proximity_To_Core':    np.float32,
+    'Anomaly':              np.int8,
+}
+DATASET_COLUMNS = EXPECTED_COLUMNS + [TARGET_COLUMN]
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+CONVERT_BLOCK_SIZE = 64 * 1024 * 1024    # Bytes de CSV lidos por bloco na conversão
+CHUNK_ROWS = 1_000_000                   # Linhas por bloco na leitura em blocos (iter_chunks)
+
+
+def _file_name(source):
+    """Nome do arquivo (caminho ou objeto com .name, como o upload do Streamlit)."""
+    return str(getattr(source, 'name', source)).lower()
+
+
+def apply_schema(df):
+    """Converte as colunas conhecidas do DataFrame para os tipos do esquema."""
+    return df.astype({col: tipo for col, tipo in SCHEMA.items() if col in df.columns})
+
+
+def read_dataset(source, columns=DATASET_COLUMNS):
+    """
+    Lê um dataset CSV, Parquet ou Arrow (IPC/Feather) com o esquema tipado.
+    Apenas as colunas de 'columns' presentes no arquivo são lidas (o alvo,
+    por exemplo, pode faltar em dados novos). 'source' pode ser um caminho
+    ou um arquivo aberto (ex.: upload do Streamlit).
+    """
+    nome = _file_name(source)
+    desejadas = list(columns)
+
+    if nome.endswith('.parquet'):
+        presentes = pq.read_schema(source).names
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        tabela = pq.read_table(source, columns=[c for c in desejadas if c in presentes], memory_map=True)
+        return apply_schema(tabela.to_pandas())
+
+    if nome.endswith(ARROW_EXTENSIONS):
+        arquivo = pa.memory_map(source, 'r') if isinstance(source, (str, os.PathLike)) else source
+        tabela = pa.ipc.open_file(arquivo).read_all()
+        tabela = tabela.select([c for c in desejadas if c in tabela.column_names])
+        return apply_schema(tabela.to_pandas())
+
+    # CSV: o parser já converte para os tipos finais, sem passar por float64/int64
+    return pd.read_csv(source, encoding='utf-8', usecols=lambda col: col in desejadas,
+                       dtype={col: tipo for col, tipo in SCHEMA.items() if col in desejadas})
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS, columns=DATASET_COLUMNS):
+    """
+    Lê o dataset em blocos de até chunk_rows linhas, já com o esquema tipado,
+    sem carregar o arquivo inteiro em memória (CSV, Parquet ou Arrow).
+    """
+    nome = _file_name(path)
+    desejadas = list(columns)
+
+    if nome.endswith('.parquet'):
+        arquivo = pq.ParquetFile(path, memory_map=True)
+        presentes = [c for c in desejadas if c in arquivo.schema_arrow.names]
+        for lote in arquivo.iter_batches(batch_size=chunk_rows, columns=presentes):
+            yield apply_schema(lote.to_pandas())
+    elif nome.endswith(ARROW_EXTENSIONS):
+        leitor = pa.ipc.open_file(pa.memory_map(path, 'r'))
+        for i in range(leitor.num_record_batches):
+            lote = leitor.get_batch(i)
+            lote = lote.select([c for c in desejadas if c in lote.schema.names])
+            for inicio in range(0, lote.num_rows, chunk_rows):
+                yield apply_schema(lote.slice(inicio, chunk_rows).to_pandas())
+    else:
+        yield from pd.read_csv(path, encoding='utf-8', usecols=lambda col: col in desejadas,
+                               dtype={col: tipo for col, tipo in SCHEMA.items() if col in desejadas},
+                               chunksize=chunk_rows)
+
+
+def convert_csv_to_parquet(csv_path, parquet_path, block_size=CONVERT_BLOCK_SIZE):
+    """
+    Converte um CSV (de qualquer tamanho) para Parquet tipado, lendo em blocos
+    com o leitor em streaming do Arrow. Retorna o número de linhas gravadas.
+    """
+    # Apenas as colunas do esquema presentes no cabeçalho são convertidas
+    with open(csv_path, encoding='utf-8') as f:
+        cabecalho = f.readline().strip().split(',')
+    colunas = [col for col in DATASET_COLUMNS if col in cabecalho]
+    tipos = {col: pa.from_numpy_dtype(SCHEMA[col]) for col in colunas}
+    leitor = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types=tipos, include_columns=colunas),
+    )
+    linhas = 0
+    with pq.ParquetWriter(parquet_path, leitor.schema) as escritor:
+        for lote in leitor:
+            escritor.write_batch(lote)
+            linhas += lote.num_rows
+    return linhas
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO (conversão CSV -> Parquet)
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Converte um dataset CSV da Red Queen para Parquet tipado.")
+    parser.add_argument("entrada", help="Arquivo CSV de origem")
+    parser.add_argument("saida", nargs="?", help="Arquivo Parquet de destino (padrão: mesmo nome, .parquet)")
+    args = parser.parse_args()
+
+    saida = args.saida or os.path.splitext(args.entrada)[0] + ".parquet"
+    total = convert_csv_to_parquet(args.entrada, saida)
+    print(f"{total} linhas convertidas: '{args.entrada}' -> '{saida}' "
+          f"({os.path.getsize(args.entrada) / 1e6:.1f} MB -> {os.path.getsize(saida) / 1e6:.1f} MB)")
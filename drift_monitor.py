@@ -0,0 +1,336 @@
+# MONITOR DE DERIVA DOS SENSORES DA RED QUEEN
+# Compara a distribuição de cada sensor nas leituras ao vivo com a do dataset
+# de treino sem guardar leituras brutas: cada lado é um histograma de bins
+# fixos por sensor. Os limites dos bins são os quantis do treino (bins de
+# frequência igual), obtidos em duas passadas em blocos com memória constante.
+# A janela ao vivo é deslizante por blocos (um histograma por bloco, somados
+# incrementalmente), e o PSI e o KS de cada sensor são recalculados só quando
+# um bloco fecha, a partir das contagens. Quando algum sensor passa do limite,
+# o monitor registra uma solicitação de retreino (uma vez por episódio, com
+# histerese, como os incidentes de alerting.py). Com --retreinar, a solicitação
+# é atendida: o modelo que está servindo é continuado com dados rotulados
+# recentes e o artefato novo é promovido, e o painel recarrega o modelo.
+#
+#   python drift_monitor.py --deslocamento Room_Temperature=3   (replay com sensor recalibrado)
+#   python drift_monitor.py --data novos_rotulados.csv --retreinar
+
+import json                              # Solicitação de retreino
+import os                                # Gravação atômica da solicitação
+import time                              # Horário da solicitação
+import numpy as np                       # Histogramas vetorizados
+import pandas as pd                      # Relatório por sensor
+
+from model_store import EXPECTED_COLUMNS, MODEL_DIR
+
+# PARÂMETROS DO MONITOR
+N_BINS = 10                              # Bins por sensor (decis do treino)
+FINE_BINS = 4096                         # Resolução do histograma fino usado para achar os quantis do treino
+WINDOW_READINGS = 1000                   # Leituras na janela ao vivo
+WINDOW_BLOCKS = 10                       # Blocos da janela (ela desliza um bloco por vez)
+MIN_READINGS = 300                       # Leituras na janela antes de pontuar a deriva
+PSI_FLOOR = 1e-4                         # Proporção mínima por bin (evita log(0) no PSI)
+PSI_WARN = 0.1                           # PSI de atenção (faixa usual: < 0.1 estável)
+PSI_ALERT = 0.25                         # PSI de deriva (faixa usual: > 0.25 mudança significativa)
+KS_WARN = 0.1                            # KS (nos limites dos bins) de atenção
+KS_ALERT = 0.15                          # KS de deriva
+RETRAIN_REQUEST = "retreino_pendente.json"  # Solicitação de retreino, na pasta dos artefatos
+
+DRIFT_STATUS = ('estável', 'atenção', 'deriva')
+
+
+def _matrix(X, columns):
+    if hasattr(X, 'columns'):
+        X = X[columns].to_numpy(dtype=np.float64)
+    return np.asarray(X, dtype=np.float64).reshape(-1, len(columns))
+
+
+class DriftBaseline:
+    """
+    Histograma de referência (treino) de cada sensor: limites internos dos
+    bins (sensores x N_BINS-1, nos quantis do treino) e proporções por bin.
+    """
+
+    def __init__(self, edges, counts, columns=EXPECTED_COLUMNS):
+        self.columns = list(columns)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.n = int(self.counts[0].sum())
+        self.proportions = self.counts / max(self.n, 1)
+
+    @classmethod
+    def from_chunks(cls, chunks, columns=EXPECTED_COLUMNS, n_bins=N_BINS, fine_bins=FINE_BINS):
+        """
+        Constrói a referência a partir de uma função que devolve um iterador de
+        blocos (DataFrames ou matrizes), em duas passadas: mínimo e máximo, e
+        depois um histograma fino de onde saem os quantis. Memória constante.
+        """
+        d = len(columns)
+        minimo, maximo = np.full(d, np.inf), np.full(d, -np.inf)
+        for bloco in chunks():
+            X = _matrix(bloco, columns)
+            minimo = np.fmin(minimo, np.nanmin(X, axis=0))
+            maximo = np.fmax(maximo, np.nanmax(X, axis=0))
+        largura = np.where(maximo > minimo, (maximo - minimo) / fine_bins, 1.0)
+
+        fino = np.zeros(d * fine_bins, dtype=np.int64)
+        deslocamento = np.arange(d) * fine_bins
+        for bloco in chunks():
+            X = _matrix(bloco, columns)
+            X = X[~np.isnan(X).any(axis=1)]
+            idx = np.clip(((X - minimo) / largura).astype(np.int64), 0, fine_bins - 1)
+            fino += np.bincount((idx + deslocamento).ravel(), minlength=d * fine_bins)
+        fino = fino.reshape(d, fine_bins)
+
+        # Limite k: fim do primeiro bin fino em que a contagem acumulada chega a k/n_bins do total
+        acumulado = np.cumsum(fino, axis=1)
+        alvos = acumulado[:, -1:] * (np.arange(1, n_bins) / n_bins)
+        corte = np.array([np.searchsorted(acumulado[f], alvos[f]) for f in range(d)])
+        edges = minimo[:, None] + (corte + 1) * largura[:, None]
+        # Contagens por bin grosso: somas dos bins finos entre os cortes
+        limites = np.column_stack([np.zeros(d, dtype=np.int64), acumulado[np.arange(d)[:, None], corte],
+                                   acumulado[:, -1]])
+        return cls(edges, np.diff(limites, axis=1), columns)
+
+    @classmethod
+    def from_frame(cls, df, columns=EXPECTED_COLUMNS, n_bins=N_BINS):
+        return cls.from_chunks(lambda: iter([df]), columns, n_bins)
+
+    @classmethod
+    def from_file(cls, path, columns=EXPECTED_COLUMNS, n_bins=N_BINS):
+        from dataset_io import iter_chunks  # Arquivos maiores que a memória: lidos em blocos
+        return cls.from_chunks(lambda: iter_chunks(path, columns=columns), columns, n_bins)
+
+    def histogram(self, X):
+        """Contagens por bin (sensores x N_BINS) das leituras em X; leituras com NaN são ignoradas."""
+        X = _matrix(X, self.columns)
+        X = X[~np.isnan(X).any(axis=1)]
+        n_bins = self.edges.shape[1] + 1
+        idx = np.column_stack([np.searchsorted(self.edges[f], X[:, f], side='right')
+                               for f in range(len(self.columns))]) if len(X) else np.zeros((0, len(self.columns)), int)
+        deslocamento = np.arange(len(self.columns)) * n_bins
+        contagem = np.bincount((idx + deslocamento).ravel(), minlength=len(self.columns) * n_bins)
+        return contagem.reshape(len(self.columns), n_bins)
+
+
+def psi(base, live, floor=PSI_FLOOR):
+    """Population Stability Index por linha (sensor), de duas matrizes de proporções."""
+    p = np.maximum(base, floor)
+    q = np.maximum(live, floor)
+    return ((q - p) * np.log(q / p)).sum(axis=1)
+
+
+def ks(base, live):
+    """Maior diferença entre as distribuições acumuladas, nos limites dos bins, por sensor."""
+    return np.abs(np.cumsum(base, axis=1) - np.cumsum(live, axis=1)).max(axis=1)
+
+
+class SlidingHistogram:
+    """
+    Histograma das últimas 'window' leituras em blocos de window/blocks: cada
+    bloco tem as suas contagens, e a soma da janela é atualizada ao somar a
+    leitura nova e ao descartar o bloco mais antigo. Memória: blocks x sensores x N_BINS.
+    """
+
+    def __init__(self, baseline, window=WINDOW_READINGS, blocks=WINDOW_BLOCKS):
+        self.baseline = baseline
+        self.block_size = max(window // blocks, 1)
+        self._blocos = np.zeros((blocks,) + baseline.counts.shape, dtype=np.int64)
+        self._atual = 0
+        self._n_bloco = 0
+        self.counts = np.zeros(baseline.counts.shape, dtype=np.int64)
+
+    @property
+    def n(self):
+        return int(self.counts[0].sum())
+
+    def update(self, X):
+        """Acrescenta leituras à janela. Retorna quantos blocos fecharam."""
+        X = _matrix(X, self.baseline.columns)
+        fechados = 0
+        while len(X):
+            parte, X = X[:self.block_size - self._n_bloco], X[self.block_size - self._n_bloco:]
+            contagem = self.baseline.histogram(parte)
+            self._blocos[self._atual] += contagem
+            self.counts += contagem
+            self._n_bloco += len(parte)
+            if self._n_bloco == self.block_size:
+                # Bloco cheio: o próximo bloco (o mais antigo) sai da janela e é reaproveitado
+                self._atual = (self._atual + 1) % len(self._blocos)
+                self.counts -= self._blocos[self._atual]
+                self._blocos[self._atual] = 0
+                self._n_bloco = 0
+                fechados += 1
+        return fechados
+
+    def clear(self):
+        self._blocos[:] = 0
+        self.counts[:] = 0
+        self._atual = self._n_bloco = 0
+
+
+class DriftMonitor:
+    """
+    Deriva de cada sensor entre o treino (baseline) e a janela ao vivo. Os
+    escores são recalculados a cada bloco fechado. on_drift(relatorio) é
+    chamado quando algum sensor entra em deriva, e só volta a ser chamado
+    depois que todos os sensores voltarem a ficar estáveis.
+    """
+
+    def __init__(self, baseline, window=WINDOW_READINGS, blocks=WINDOW_BLOCKS, min_readings=MIN_READINGS,
+                 on_drift=None):
+        self.baseline = baseline
+        self.window = SlidingHistogram(baseline, window, blocks)
+        self.min_readings = min_readings
+        self.on_drift = on_drift
+        self.readings = 0                              # Leituras vistas desde o início (não só na janela)
+        self.psi = np.zeros(len(baseline.columns))
+        self.ks = np.zeros(len(baseline.columns))
+        self.status = np.zeros(len(baseline.columns), dtype=np.int8)  # Índice em DRIFT_STATUS
+        self.triggers = 0
+        self._armado = True                            # Pode disparar (todos estáveis desde o último disparo)
+
+    def update(self, X):
+        """Acrescenta leituras. Retorna True se esta chamada disparou on_drift."""
+        X = _matrix(X, self.baseline.columns)
+        self.readings += len(X)
+        if not self.window.update(X) or self.window.n < self.min_readings:
+            return False
+        self.evaluate()
+        if self._armado and (self.status == 2).any():
+            self._armado = False
+            self.triggers += 1
+            if self.on_drift is not None:
+                self.on_drift(self.report())
+            return True
+        if not self.status.any():
+            self._armado = True
+        return False
+
+    def evaluate(self):
+        """PSI, KS e situação de cada sensor a partir das contagens da janela (O(sensores x bins))."""
+        ao_vivo = self.window.counts / max(self.window.n, 1)
+        self.psi = psi(self.baseline.proportions, ao_vivo)
+        self.ks = ks(self.baseline.proportions, ao_vivo)
+        self.status = np.where((self.psi > PSI_ALERT) | (self.ks > KS_ALERT), 2,
+                               np.where((self.psi > PSI_WARN) | (self.ks > KS_WARN), 1, 0)).astype(np.int8)
+
+    @property
+    def drifted(self):
+        return bool((self.status == 2).any())
+
+    def report(self):
+        """Uma linha por sensor: PSI, KS e situação (da última avaliação)."""
+        return pd.DataFrame({
+            'Sensor': self.baseline.columns,
+            'PSI': self.psi,
+            'KS': self.ks,
+            'Situação': [DRIFT_STATUS[s] for s in self.status],
+        })
+
+    def distributions(self, column):
+        """Proporções por bin do treino e da janela para um sensor (para o gráfico)."""
+        f = self.baseline.columns.index(column)
+        bordas = self.baseline.edges[f]
+        rotulos = [f"< {bordas[0]:.3g}"] + [f"{a:.3g} – {b:.3g}" for a, b in zip(bordas[:-1], bordas[1:])] \
+            + [f"≥ {bordas[-1]:.3g}"]
+        return pd.DataFrame({'Treino': self.baseline.proportions[f],
+                             'Janela': self.window.counts[f] / max(self.window.n, 1)}, index=rotulos)
+
+    def reset(self):
+        self.window.clear()
+        self.readings = self.triggers = 0
+        self.psi[:] = self.ks[:] = 0.0
+        self.status[:] = 0
+        self._armado = True
+
+
+# SOLICITAÇÃO DE RETREINO
+def request_retraining(relatorio, origem, model_dir=MODEL_DIR):
+    """
+    Registra (gravação atômica) que a deriva passou do limite: os sensores em
+    deriva e os escores. O retreino em si roda fora do painel
+    (python drift_monitor.py --retreinar ou incremental_training.py continuar
+    --promover), e o painel recarrega o artefato promovido.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    derivados = relatorio[relatorio['Situação'] == 'deriva']
+    pedido = {
+        'solicitado_em': time.time(),
+        'origem': origem,
+        'sensores': derivados['Sensor'].tolist(),
+        'psi': dict(zip(relatorio['Sensor'], relatorio['PSI'].round(4).tolist())),
+        'ks': dict(zip(relatorio['Sensor'], relatorio['KS'].round(4).tolist())),
+    }
+    arquivo = os.path.join(model_dir, RETRAIN_REQUEST)
+    with open(arquivo + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(pedido, f, indent=2, ensure_ascii=False)
+    os.replace(arquivo + ".tmp", arquivo)
+    return pedido
+
+
+def pending_retraining(model_dir=MODEL_DIR):
+    """Solicitação de retreino pendente (dict) ou None."""
+    try:
+        with open(os.path.join(model_dir, RETRAIN_REQUEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def clear_retraining(model_dir=MODEL_DIR):
+    try:
+        os.remove(os.path.join(model_dir, RETRAIN_REQUEST))
+    except FileNotFoundError:
+        pass
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    from dataset_io import read_dataset
+    parser = argparse.ArgumentParser(description="Monitor de deriva dos sensores (replay de um dataset).")
+    parser.add_argument("--baseline", default="Red_Queen_Synthetic_Dataset.csv", help="Dataset de treino (referência)")
+    parser.add_argument("--data", default="Red_Queen_Synthetic_Dataset.csv", help="Leituras reproduzidas como ao vivo")
+    parser.add_argument("--deslocamento", action="append", default=[], metavar="SENSOR=VALOR",
+                        help="Soma VALOR ao sensor na segunda metade do replay (ex.: sensor recalibrado)")
+    parser.add_argument("--lote", type=int, default=50, help="Leituras por micro-lote no replay")
+    parser.add_argument("--retreinar", action="store_true",
+                        help="Se houver deriva (ou retreino pendente), continua o modelo em uso com "
+                             "--data (rotulado) e promove o artefato novo")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    baseline = DriftBaseline.from_file(args.baseline)
+    print(f"Referência: {baseline.n:,} leituras em {time.perf_counter() - inicio:.2f}s "
+          f"({baseline.edges.nbytes + baseline.counts.nbytes:,} bytes)")
+
+    X = read_dataset(args.data)[EXPECTED_COLUMNS].to_numpy(dtype=np.float64)
+    metade = len(X) // 2
+    for item in args.deslocamento:
+        sensor, valor = item.split("=")
+        X[metade:, EXPECTED_COLUMNS.index(sensor)] += float(valor)
+
+    disparos = []
+    monitor = DriftMonitor(baseline, on_drift=lambda relatorio: disparos.append(monitor.readings))
+    inicio = time.perf_counter()
+    for i in range(0, len(X), args.lote):
+        monitor.update(X[i:i + args.lote])
+    decorrido = time.perf_counter() - inicio
+    print(f"Replay: {len(X):,} leituras, {decorrido / len(X) * 1e6:.2f} µs/leitura; janela com "
+          f"{monitor.window._blocos.nbytes + monitor.window.counts.nbytes:,} bytes")
+    if args.deslocamento:
+        print(f"Deslocamento a partir da leitura {metade:,}")
+    print(f"Deriva detectada nas leituras: {disparos or 'nenhuma'}")
+    print(monitor.report().to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    if args.retreinar and (disparos or pending_retraining() is not None):
+        from incremental_training import train_out_of_core, CONTINUE_ROUNDS
+        from model_store import load_serving_artifact, promote_artifact
+        if disparos:
+            request_retraining(monitor.report(), args.data)
+        modelo_base, metadados_base = load_serving_artifact()
+        caminho = train_out_of_core(args.data, num_rounds=CONTINUE_ROUNDS, base_model=modelo_base,
+                                    base_metadata=metadados_base)
+        promote_artifact(os.path.basename(caminho))
+        clear_retraining()
+        print(f"Retreinado e promovido: {caminho}")
@@ -1,20 +1,23 @@
 # IMPORTAÇÃO DAS BIBLIOTECAS NECESSÁRIAS
-import pandas as pd                        # Para leitura e manipulação de dados
 import xgboost as xgb                      # Para usar o classificador XGBoost
 import seaborn as sns                     # Para visualização de gráficos avançados (como heatmaps)
 import matplotlib.pyplot as plt           # Para criação de gráficos
+import pandas as pd                       # Tabela dos pontos de operação
 from sklearn.model_selection import train_test_split    # Para dividir os dados em treino e teste
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score  # Para avaliação do modelo
+from dataset_io import read_dataset       # Leitura tipada (CSV/Parquet/Arrow), só das colunas usadas
+from model_store import enrich_dataset    # Mesma anomalia silenciosa reforçada usada pelo painel
+from batch_scoring import DECISION_THRESHOLD  # Corte padrão (o calibrado vem de calibration.py)
 
 # DEFINIÇÃO DA FUNÇÃO PRINCIPAL
-def evaluate_red_queen_model():
+def evaluate_red_queen_model(limiar=DECISION_THRESHOLD):
 
     print("Iniciando o protocolo de avaliação do modelo Red Queen...")
 
     # CARGA E PREPARAÇÃO DOS DADOS
     print("\n[PASSO 1/5] Carregando e preparando o dataset...")
     try:
-        df_original = pd.read_csv("Red_Queen_Synthetic_Dataset.csv")
+        df_original = read_dataset("Red_Queen_Synthetic_Dataset.csv")
     except FileNotFoundError:
         # Se o arquivo não for encontrado, exibe erro e encerra
         print("\nERRO: Arquivo 'Red_Queen_Synthetic_Dataset.csv' não encontrado.")
@@ -22,24 +25,9 @@ def evaluate_red_queen_model():
         return
 
     # INSERÇÃO DE CASOS DE ANOMALIA SILENCIOSA
-    # Cria um pequeno DataFrame com um padrão de anomalia sutil (apenas T_Virus_Level elevado)
-    novas_anomalias = {
-        'T_Virus_Level': [95.0],
-        'Room_Temperature': [21.5],
-        'Humidity': [48.0],
-        'Gas_Leak_Level': [0.0],
-        'Security_Clearance': [2],
-        'AI_Override_Attempts': [0],
-        'Proximity_To_Core': [20.0],
-        'Anomaly': [1]
-    }
-
-    # Cria 10 cópias da mesma anomalia para reforçar esse padrão no treinamento
-    df_novas_anomalias = pd.DataFrame(novas_anomalias)
-    df_novas_anomalias_reforcado = pd.concat([df_novas_anomalias] * 10, ignore_index=True)
-
-    # Une os dados originais com os novos dados reforçados
-    df_enriquecido = pd.concat([df_original, df_novas_anomalias_reforcado], ignore_index=True)
+    # Une aos dados originais 10 cópias de uma anomalia sutil (apenas T_Virus_Level elevado)
+    # para reforçar esse padrão no treinamento
+    df_enriquecido = enrich_dataset(df_original)
     print(f"Dataset carregado e enriquecido. Total de {len(df_enriquecido)} registros.")
 
     # DIVISÃO EM TREINO E TESTE
@@ -78,8 +66,9 @@ def evaluate_red_queen_model():
 
     # PREVISÕES NO CONJUNTO DE TESTE
     print("\n[PASSO 4/5] Realizando previsões no conjunto de teste (dados não vistos)...")
-    y_pred = model.predict(X_test)                          # Predição das classes
     y_pred_proba = model.predict_proba(X_test)[:, 1]        # Probabilidade da classe positiva (Anomaly)
+    y_pred = (y_pred_proba > limiar).astype(int)            # Predição das classes (da mesma probabilidade)
+    print(f"Limiar de decisão: {limiar:.4f}")
 
     # AVALIAÇÃO E EXIBIÇÃO DOS RESULTADOS
     print("\n[PASSO 5/5] Exibindo as métricas de performance do modelo:")
@@ -122,5 +111,64 @@ def evaluate_red_queen_model():
 
     print("\nProtocolo de avaliação concluído.")
 
+# MODO DE VALIDAÇÃO CRUZADA E BUSCA DE HIPERPARÂMETROS
+def evaluate_with_cross_validation(folds, processos):
+
+    print("Iniciando a validação cruzada e a busca de hiperparâmetros do modelo Red Queen...")
+    from model_search import cross_validate_search, RESULTS_FILE  # Só carregado neste modo
+
+    _, resumo, melhores_params = cross_validate_search(n_folds=folds, processos=processos)
+
+    # Exibe o ranking das configurações (média entre os folds)
+    print("\n" + "=" * 40)
+    print("   RANKING DAS CONFIGURAÇÕES (AUC MÉDIA)")
+    print("=" * 40)
+    print(resumo.head(10).to_string(index=False))
+    print("=" * 40)
+    print(f"Melhor configuração: {melhores_params}")
+    print(f"Métricas por fold gravadas em '{RESULTS_FILE}'.")
+
+    print("\nProtocolo de avaliação concluído.")
+
+# MODO DAS PROBABILIDADES FORA DO FOLD (BASE DA CALIBRAÇÃO DO LIMIAR)
+def evaluate_out_of_fold(folds, janela):
+
+    print("Calculando as probabilidades fora do fold do modelo Red Queen...")
+    from calibration import load_or_compute_oof, threshold_curve, choose_threshold  # Só carregado neste modo
+
+    df_enriquecido = enrich_dataset(read_dataset("Red_Queen_Synthetic_Dataset.csv"))
+    y, proba = load_or_compute_oof(df_enriquecido, n_folds=folds, temporal_window=janela)
+    curva = threshold_curve(y, proba)
+    print(f"AUC-ROC fora do fold: {roc_auc_score(y, proba):.4f}")
+
+    # Alguns pontos de operação da curva (recall alvo -> maior limiar que o atinge)
+    print("\n" + "=" * 40)
+    print("   PONTOS DE OPERAÇÃO (FORA DO FOLD)")
+    print("=" * 40)
+    pontos = [choose_threshold(curva, recall) for recall in (0.9, 0.95, 0.99, 1.0)]
+    colunas = ['limiar', 'recall', 'precisao', 'taxa_alerta', 'fn', 'fp']
+    print(pd.DataFrame(pontos)[colunas].astype({'fn': int, 'fp': int}).to_string(index=False))
+    print("=" * 40)
+    print("Para gravar um limiar no artefato: python calibration.py --recall 0.99")
+
+    print("\nProtocolo de avaliação concluído.")
+
 # EXECUÇÃO DA FUNÇÃO
-evaluate_red_queen_model()
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Avaliação do modelo Red Queen.")
+    parser.add_argument("--cv", action="store_true", help="Validação cruzada estratificada + busca de hiperparâmetros")
+    parser.add_argument("--folds", type=int, default=5, help="Número de folds da validação cruzada")
+    parser.add_argument("--processos", type=int, default=None, help="Processos do pool (padrão: núcleos da máquina)")
+    parser.add_argument("--oof", action="store_true",
+                        help="Probabilidades fora do fold (guardadas no artefato) e pontos de operação")
+    parser.add_argument("--janela-temporal", type=int, default=0, help="Janela das features temporais (modo --oof)")
+    parser.add_argument("--limiar", type=float, default=DECISION_THRESHOLD, help="Limiar de decisão da avaliação")
+    args = parser.parse_args()
+
+    if args.cv:
+        evaluate_with_cross_validation(args.folds, args.processos)
+    elif args.oof:
+        evaluate_out_of_fold(args.folds, args.janela_temporal or None)
+    else:
+        evaluate_red_queen_model(args.limiar)
@@ -0,0 +1,122 @@
+# EXPLICAÇÕES (CAUSA RAIZ) COM CACHE PARA A RED QUEEN
+# Calcula as contribuições de cada sensor para um alerta, em lote, e guarda o
+# resultado em um cache LRU indexado pelos valores das features, para que um
+# rerun com a mesma linha não recalcule nada.
+#
+# Modos de atribuição:
+# - 'shap':       shap.TreeExplainer (mesmos valores exibidos no waterfall do SHAP)
+# - 'contribs':   pred_contribs do próprio booster (TreeSHAP exato em C++, sem importar o shap)
+# - 'aproximado': pred_contribs com approx_contribs (Saabas), o mais barato para taxas altas de alerta
+
+import collections                       # OrderedDict para o LRU
+import threading                         # O cache é compartilhado entre sessões do painel
+import numpy as np                       # Operações vetorizadas
+import pandas as pd                      # Tabela do gráfico de cascata
+
+from instrumentation import METRICS      # Latência das explicações e acertos do cache
+
+# PARÂMETROS DO CACHE
+CACHE_SIZE = 4096                        # Explicações mantidas em memória
+EXPLAIN_MODES = ('shap', 'contribs', 'aproximado')
+
+
+class ExplanationCache:
+    """Cache LRU de explicações, indexado pelo modo e pelos valores das features da linha."""
+
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self._itens = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(mode, row_values):
+        return mode, np.asarray(row_values, dtype=np.float64).tobytes()
+
+    def get(self, key):
+        with self._lock:
+            valor = self._itens.get(key)
+            if valor is None:
+                self.misses += 1
+                return None
+            self._itens.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def put(self, key, valor):
+        with self._lock:
+            self._itens[key] = valor
+            self._itens.move_to_end(key)
+            while len(self._itens) > self.max_size:
+                self._itens.popitem(last=False)  # Remove a menos usada recentemente
+
+    def __len__(self):
+        return len(self._itens)
+
+
+def compute_contributions(model, X, mode='contribs', explainer=None):
+    """
+    Calcula as contribuições (em log-odds) de todas as linhas de X em uma única chamada.
+    Retorna (contribuições n x features, valores base n).
+    """
+    if mode == 'shap':
+        valores = explainer(X)
+        return np.asarray(valores.values), np.broadcast_to(valores.base_values, (len(X),))
+
+    import xgboost as xgb                # Só o booster é necessário nos modos rápidos
+    matriz = xgb.DMatrix(X)
+    contribs = model.get_booster().predict(matriz, pred_contribs=True, approx_contribs=(mode == 'aproximado'))
+    return contribs[:, :-1], contribs[:, -1]  # A última coluna é o viés (valor base)
+
+
+def explain_rows(model, X, cache, mode='contribs', explainer=None):
+    """
+    Retorna a explicação de cada linha de X (DataFrame na ordem das features do
+    modelo), calculando as que faltam no cache com uma única chamada vetorizada.
+    Cada explicação é um dict com 'features', 'values', 'contributions' e 'base_value'.
+    """
+    valores = X.to_numpy(dtype=np.float64)
+    chaves = [cache.key(mode, linha) for linha in valores]
+    resultado = [cache.get(chave) for chave in chaves]
+
+    faltantes = [i for i, r in enumerate(resultado) if r is None]
+    METRICS.inc('explicacoes_cache_hit', len(resultado) - len(faltantes))
+    if faltantes:
+        METRICS.inc('explicacoes_calculadas', len(faltantes))
+        with METRICS.timed(f'explicacao_{mode}'):
+            contribs, bases = compute_contributions(model, X.iloc[faltantes], mode, explainer)
+        features = list(X.columns)
+        for j, i in enumerate(faltantes):
+            explicacao = {
+                'features': features,
+                'values': valores[i],
+                'contributions': np.asarray(contribs[j], dtype=np.float64),
+                'base_value': float(bases[j]),
+            }
+            cache.put(chaves[i], explicacao)
+            resultado[i] = explicacao
+    return resultado
+
+
+def top_factor(explicacao):
+    """Sensor com a maior contribuição positiva (o principal fator do alerta)."""
+    return explicacao['features'][int(np.argmax(explicacao['contributions']))]
+
+
+def waterfall_frame(explicacao):
+    """
+    Tabela do gráfico de cascata: uma barra por sensor, da maior para a menor
+    contribuição absoluta, começando no valor base e terminando em f(x).
+    """
+    ordem = np.argsort(-np.abs(explicacao['contributions']))
+    contribs = explicacao['contributions'][ordem]
+    fim = explicacao['base_value'] + np.cumsum(contribs)
+    inicio = fim - contribs
+    return pd.DataFrame({
+        'Sensor': [f"{explicacao['features'][i]} = {explicacao['values'][i]:.4g}" for i in ordem],
+        'Contribuição': contribs,
+        'Início': inicio,
+        'Fim': fim,
+        'Direção': np.where(contribs >= 0, 'Aumenta o risco', 'Reduz o risco'),
+    })
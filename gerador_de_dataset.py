@@ -1,9 +1,17 @@
-import pandas as pd         # Manipulação e análise de dados (para carregar o CSV)
-import numpy as np          # Operações numéricas (para calcular os 'bins' dos histogramas)
+import argparse             # Parâmetros via linha de comando
+import pandas as pd         # Manipulação e análise de dados (para montar os blocos)
+import numpy as np          # Operações numéricas (geração vetorizada dos dados)
+import pyarrow as pa        # Escrita em blocos, sem manter o dataset inteiro em memória
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from dataset_io import apply_schema  # Esquema tipado das colunas
 
 # PARÂMETROS DA GERAÇÃO
 NUM_AMOSTRAS = 50
 PCT_ANOMALIAS = 0.20
+TAMANHO_BLOCO = 1_000_000   # Linhas geradas e gravadas por vez (limita o uso de memória)
+NOME_ARQUIVO = 'Red_Queen_Dataset_Realista_v3.csv'
 
 # DEFINIÇÃO DA "NORMALIDADE"
 NORMAL_TEMP_MEDIA = 21.5
@@ -11,8 +19,8 @@ NORMAL_TEMP_STD = 1.5
 NORMAL_HUM_MEDIA = 48.0
 NORMAL_HUM_STD = 5.0
 
-def gerar_dados_normais(n_amostras):
-    """Gera um DataFrame com dados de operação normal."""
+def gerar_dados_normais(n_amostras, rng):
+    """Gera um dicionário de colunas (arrays) com dados de operação normal."""
 
     # MUDANÇA NA GERAÇÃO DE PROXIMIDADE
     # 90% dos dados estarão na faixa "dia a dia" (10m a 40m)
@@ -22,84 +30,148 @@ def gerar_dados_normais(n_amostras):
     n_perto_nucleo = n_amostras - n_dia_a_dia
 
     # Geração dos dados de proximidade: principal faixa usa distribuição normal
-    prox_dia_a_dia = np.random.normal(22, 5, n_dia_a_dia)
-    prox_perto_nucleo = np.random.uniform(0, 10, n_perto_nucleo)
+    prox_dia_a_dia = rng.normal(22, 5, n_dia_a_dia)
+    prox_perto_nucleo = rng.uniform(0, 10, n_perto_nucleo)
 
     # Junta os dois tipos de distância
-    prox_completa = np.concatenate([prox_dia_a_dia, prox_perto_nucleo])
-    np.random.shuffle(prox_completa)
+    prox_completa = rng.permutation(np.concatenate([prox_dia_a_dia, prox_perto_nucleo]))
     prox_completa[prox_completa < 0] = 0
 
     # Geração de todas as demais variáveis em operação normal
-    data = {
-        'T_Virus_Level': np.random.uniform(0, 8, n_amostras).round(4),
-        'Room_Temperature': np.random.normal(NORMAL_TEMP_MEDIA, NORMAL_TEMP_STD, n_amostras).round(4),
-        'Humidity': np.random.normal(NORMAL_HUM_MEDIA, NORMAL_HUM_STD, n_amostras).round(4),
-        'Gas_Leak_Level': np.random.uniform(0, 0.2, n_amostras).round(4),
-        'Security_Clearance': np.random.randint(1, 5, n_amostras),
-        'AI_Override_Attempts': np.random.randint(0, 2, n_amostras),
+    return {
+        'T_Virus_Level': rng.uniform(0, 8, n_amostras).round(4),
+        'Room_Temperature': rng.normal(NORMAL_TEMP_MEDIA, NORMAL_TEMP_STD, n_amostras).round(4),
+        'Humidity': rng.normal(NORMAL_HUM_MEDIA, NORMAL_HUM_STD, n_amostras).round(4),
+        'Gas_Leak_Level': rng.uniform(0, 0.2, n_amostras).round(4),
+        'Security_Clearance': rng.integers(1, 5, n_amostras),
+        'AI_Override_Attempts': rng.integers(0, 2, n_amostras),
         'Proximity_To_Core': prox_completa.round(4),  # Usando a nova proximidade realista
         'Anomaly': np.zeros(n_amostras, dtype=int)
     }
-    return pd.DataFrame(data)
 
 
 # DEFINIÇÃO DAS "RECEITAS DAS CRISES"
-def criar_anomalia_caotica():
-    """Gera uma anomalia caótica, que ocorre perto do núcleo."""
+def criar_anomalias_caoticas(n, rng):
+    """Gera n anomalias caóticas, que ocorrem perto do núcleo."""
     return {
-        'T_Virus_Level': np.random.uniform(85, 100),        # Níveis extremamente altos
-        'Room_Temperature': np.random.uniform(45, 60),      # Superaquecimento
-        'Humidity': np.random.uniform(90, 100),             # Umidade quase saturada
-        'Gas_Leak_Level': np.random.uniform(3, 5),          # Vazamento intenso de gás
-        'AI_Override_Attempts': np.random.randint(5, 15),   # Muitas tentativas de controle
-        'Proximity_To_Core': np.random.uniform(0, 10)       # Próximo ao núcleo
+        'T_Virus_Level': rng.uniform(85, 100, n),        # Níveis extremamente altos
+        'Room_Temperature': rng.uniform(45, 60, n),      # Superaquecimento
+        'Humidity': rng.uniform(90, 100, n),             # Umidade quase saturada
+        'Gas_Leak_Level': rng.uniform(3, 5, n),          # Vazamento intenso de gás
+        'AI_Override_Attempts': rng.integers(5, 15, n),  # Muitas tentativas de controle
+        'Proximity_To_Core': rng.uniform(0, 10, n)       # Próximo ao núcleo
     }
 
 
-def criar_anomalia_silenciosa_t_virus():
-    """Gera uma anomalia de T-Virus, que ocorre perto do núcleo."""
+def criar_anomalias_silenciosas_t_virus(n, rng):
+    """Gera n anomalias de T-Virus, que ocorrem perto do núcleo."""
     return {
-        'T_Virus_Level': np.random.uniform(13, 100),   # Foco apenas no T-Virus
-        'Proximity_To_Core': np.random.uniform(0, 15)  # Também acontece perto do núcleo
+        'T_Virus_Level': rng.uniform(13, 100, n),   # Foco apenas no T-Virus
+        'Proximity_To_Core': rng.uniform(0, 15, n)  # Também acontece perto do núcleo
     }
 
 
-# GERAR A BASE DE DADOS "NORMAL"
-print("Gerando base de dados com operações normais e realistas...")
-df = gerar_dados_normais(NUM_AMOSTRAS)
-
-# INJETAR O CAOS (ADICIONAR AS ANOMALIAS)
-num_anomalias = int(NUM_AMOSTRAS * PCT_ANOMALIAS) # Quantidade de anomalias a serem inseridas
-print(f"Gerando e injetando {num_anomalias} anomalias em locais de risco...")
-
-# Escolhe aleatoriamente os índices das linhas onde as anomalias serão inseridas
-indices_anomalia = np.random.choice(df.index, num_anomalias, replace=False)
-
-# Itera pelos índices sorteados e aplica anomalias caóticas ou silenciosas
-for i in indices_anomalia:
-    if np.random.rand() > 0.4:
-        anomalia = criar_anomalia_caotica()# 60% de chance de ser caótica
-    else:
-        anomalia = criar_anomalia_silenciosa_t_virus() # 40% de chance de ser silenciosa de T-Virus
-
-    # Aplica os valores da anomalia nas colunas correspondentes
-    for chave, valor in anomalia.items():
-        df.loc[i, chave] = valor
-
-    # Marca a linha como anomalia (1)
-    df.loc[i, 'Anomaly'] = 1
-
-# MISTURAR E SALVAR
-print("Misturando o dataset final...")
-df_final = df.sample(frac=1).reset_index(drop=True) # Embaralha as linhas para não ficar previsível
-
-# Salva em arquivo CSV
-nome_arquivo = 'Red_Queen_Dataset_Realista_v3.csv'
-df_final.to_csv(nome_arquivo, index=False)  # Mantendo o padrão de vírgula
-
-# Resumo no terminal
-print(f"\nDataset '{nome_arquivo}' gerado com sucesso!")
-print(f"Total de linhas: {len(df_final)}")
-print("Distribuição de anomalias:")
-print(df_final['Anomaly'].value_counts())
\ No newline at end of file
+def injetar_anomalias(dados, pct_anomalias, rng):
+    """Sorteia as linhas anômalas e aplica as receitas de crise de forma vetorizada (sem laço por linha)."""
+    n_amostras = len(dados['Anomaly'])
+    num_anomalias = int(n_amostras * pct_anomalias)  # Quantidade de anomalias a serem inseridas
+
+    # Escolhe aleatoriamente os índices das linhas onde as anomalias serão inseridas
+    indices_anomalia = rng.choice(n_amostras, num_anomalias, replace=False)
+
+    # 60% de chance de ser caótica, 40% de chance de ser silenciosa de T-Virus
+    caotica = rng.random(num_anomalias) > 0.4
+    for indices, receita in ((indices_anomalia[caotica], criar_anomalias_caoticas),
+                             (indices_anomalia[~caotica], criar_anomalias_silenciosas_t_virus)):
+        for chave, valores in receita(len(indices), rng).items():
+            dados[chave][indices] = valores
+
+    # Marca as linhas como anomalia (1)
+    dados['Anomaly'][indices_anomalia] = 1
+    return dados
+
+
+def gerar_bloco(args):
+    """Gera um bloco completo (normais + anomalias, embaralhado) a partir da sua própria semente."""
+    n_amostras, pct_anomalias, semente = args
+    rng = np.random.default_rng(semente)
+    dados = injetar_anomalias(gerar_dados_normais(n_amostras, rng), pct_anomalias, rng)
+    # Embaralha as linhas para não ficar previsível
+    ordem = rng.permutation(n_amostras)
+    return pd.DataFrame({chave: valores[ordem] for chave, valores in dados.items()})
+
+
+def gerar_dataset(num_amostras=NUM_AMOSTRAS, pct_anomalias=PCT_ANOMALIAS, nome_arquivo=NOME_ARQUIVO,
+                  tamanho_bloco=TAMANHO_BLOCO, semente=None, processos=1, formato=None):
+    """
+    Gera o dataset em blocos e grava cada bloco assim que fica pronto (CSV ou Parquet, via Arrow),
+    mantendo no máximo 'processos' blocos em memória. Cada bloco recebe uma semente
+    derivada de 'semente', então o resultado é o mesmo com qualquer número de processos.
+    Retorna a contagem de linhas por classe.
+    """
+    formato = formato or ('parquet' if nome_arquivo.endswith('.parquet') else 'csv')
+    tamanhos = [min(tamanho_bloco, num_amostras - inicio) for inicio in range(0, num_amostras, tamanho_bloco)]
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+    tarefas = [(n, pct_anomalias, s) for n, s in zip(tamanhos, sementes)]
+
+    contagem = pd.Series(0, index=[0, 1], name='count')
+    escritor = None
+    arquivo_csv = None
+    pool = None
+    if processos > 1:
+        import multiprocessing   # Geração dos blocos em paralelo
+        pool = multiprocessing.Pool(processos)
+    try:
+        for inicio in range(0, len(tarefas), processos):
+            onda = tarefas[inicio:inicio + processos]
+            blocos = pool.map(gerar_bloco, onda) if pool else [gerar_bloco(t) for t in onda]
+            for bloco in blocos:
+                if formato == 'parquet':
+                    bloco = apply_schema(bloco)  # Parquet já sai com o esquema tipado (float32/int8)
+                tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+                if escritor is None:
+                    if formato == 'parquet':
+                        escritor = pq.ParquetWriter(nome_arquivo, tabela.schema)
+                    else:
+                        # Mantendo o padrão de vírgula, com o cabeçalho sem aspas só no início do arquivo
+                        arquivo_csv = open(nome_arquivo, 'wb')
+                        arquivo_csv.write((",".join(tabela.column_names) + "\n").encode('utf-8'))
+                        escritor = pa_csv.CSVWriter(arquivo_csv, tabela.schema, write_options=pa_csv.WriteOptions(
+                            include_header=False, quoting_style="none"))
+                escritor.write_table(tabela)
+                contagem = contagem.add(bloco['Anomaly'].value_counts(), fill_value=0)
+            print(f"  {min(inicio + processos, len(tarefas))}/{len(tarefas)} blocos gravados")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if escritor is not None:
+            escritor.close()
+        if arquivo_csv is not None:
+            arquivo_csv.close()
+    return contagem.astype(int)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o dataset sintético da Red Queen.")
+    parser.add_argument("--linhas", type=int, default=NUM_AMOSTRAS, help="Total de linhas geradas")
+    parser.add_argument("--pct-anomalias", type=float, default=PCT_ANOMALIAS, help="Fração de anomalias (0 a 1)")
+    parser.add_argument("--saida", default=NOME_ARQUIVO, help="Arquivo de saída (.csv ou .parquet)")
+    parser.add_argument("--formato", choices=["csv", "parquet"], default=None,
+                        help="Formato de saída (padrão: pela extensão do arquivo)")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO, help="Linhas por bloco gravado")
+    parser.add_argument("--semente", type=int, default=None, help="Semente do gerador (reprodutibilidade)")
+    parser.add_argument("--processos", type=int, default=1, help="Processos gerando blocos em paralelo")
+    args = parser.parse_args()
+
+    # GERAR A BASE DE DADOS, INJETAR O CAOS, MISTURAR E SALVAR
+    print("Gerando base de dados com operações normais e realistas...")
+    print(f"Injetando {args.pct_anomalias:.0%} de anomalias em locais de risco, em blocos de {args.bloco:,} linhas...")
+    distribuicao = gerar_dataset(args.linhas, args.pct_anomalias, args.saida, args.bloco,
+                                 args.semente, args.processos, args.formato)
+
+    # Resumo no terminal
+    print(f"\nDataset '{args.saida}' gerado com sucesso!")
+    print(f"Total de linhas: {distribuicao.sum()}")
+    print("Distribuição de anomalias:")
+    print(distribuicao)
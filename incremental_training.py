@@ -0,0 +1,169 @@
+# TREINAMENTO FORA DA MEMÓRIA (OUT-OF-CORE) E INCREMENTAL DA RED QUEEN
+# Para históricos de sensores maiores que a RAM: o dataset é lido em blocos e
+# entregue ao XGBoost por um DataIter, que monta um QuantileDMatrix (dados já
+# quantizados, bem menores que o DataFrame original) ou, com --memoria-externa,
+# um ExtMemQuantileDMatrix com páginas em disco. O scale_pos_weight vem de uma
+# contagem de classes feita em streaming, e o treino pode continuar a partir do
+# booster que está servindo quando chegam novos dados rotulados; com --promover,
+# o artefato novo é promovido e o painel recarrega o modelo sozinho.
+#
+#   python incremental_training.py treinar historico.parquet
+#   python incremental_training.py continuar novos_rotulados.parquet --rodadas 20 --promover
+
+import hashlib                           # Hash dos dados lidos em blocos
+import os                                # Pasta do cache de memória externa
+import tempfile                          # Cache temporário das páginas em disco
+import numpy as np                       # Matriz de cada bloco
+import pandas as pd                      # Hash dos blocos
+import xgboost as xgb                    # DataIter, QuantileDMatrix e treino
+
+from dataset_io import iter_chunks, CHUNK_ROWS
+from temporal_features import FeatureAssembler  # Mesmas features (e ordem) do booster continuado
+from model_store import (ARTIFACT_VERSION, EXPECTED_COLUMNS, MODEL_DIR, TARGET_COLUMN,
+                         artifact_path, load_serving_artifact, promote_artifact, save_artifact)
+
+# PARÂMETROS DO TREINO
+NUM_ROUNDS = 100                         # Mesmo número de árvores do XGBClassifier padrão
+CONTINUE_ROUNDS = 20                     # Árvores adicionadas a cada continuação
+
+
+def training_params(scale_pos_weight):
+    """Parâmetros equivalentes ao XGBClassifier usado pelo painel (histograma, exigido pelo QuantileDMatrix)."""
+    return {
+        'objective': 'binary:logistic',
+        'eval_metric': 'logloss',
+        'scale_pos_weight': scale_pos_weight,
+        'tree_method': 'hist',
+        'seed': 42,
+    }
+
+
+def scan_dataset(path, chunk_rows=CHUNK_ROWS):
+    """
+    Uma passada em blocos pelo dataset: conta as classes (para o scale_pos_weight)
+    e calcula o hash dos dados, sem manter mais de um bloco em memória.
+    Retorna ({0: normais, 1: anomalias}, hash).
+    """
+    contagem = {0: 0, 1: 0}
+    digest = hashlib.sha256()
+    digest.update(f"v{ARTIFACT_VERSION}".encode())
+    for bloco in iter_chunks(path, chunk_rows):
+        contagem[0] += int((bloco[TARGET_COLUMN] == 0).sum())
+        contagem[1] += int((bloco[TARGET_COLUMN] == 1).sum())
+        digest.update(pd.util.hash_pandas_object(bloco, index=False).values.tobytes())
+    return contagem, digest.hexdigest()
+
+
+class ChunkIter(xgb.DataIter):
+    """
+    Entrega o dataset ao XGBoost um bloco por vez, com as colunas de
+    feature_names. Se o modelo usa features temporais, elas são calculadas
+    em fluxo (TemporalState), com o estado passando de um bloco para o outro.
+    """
+
+    def __init__(self, path, chunk_rows=CHUNK_ROWS, cache_prefix=None, feature_names=EXPECTED_COLUMNS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.feature_names = list(feature_names)
+        self._features = FeatureAssembler(self.feature_names)
+        self._blocos = None
+        self._estado = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._blocos is None:
+            self._blocos = iter_chunks(self.path, self.chunk_rows)
+            self._estado = self._features.new_state()
+        try:
+            bloco = next(self._blocos)
+        except StopIteration:
+            return False
+        X = self._features.matrix(bloco[EXPECTED_COLUMNS].to_numpy(dtype=np.float64), self._estado)
+        input_data(data=pd.DataFrame(X, columns=self.feature_names), label=bloco[TARGET_COLUMN])
+        return True
+
+    def reset(self):
+        self._blocos = None
+
+
+def base_features(base_model, base_metadata):
+    """
+    Features do booster a continuar. ValueError se o projeto não sabe montá-las
+    (ex.: colunas desconhecidas) ou se não batem com a janela temporal dos metadados.
+    """
+    nomes = list(base_model.get_booster().feature_names or [])
+    if not nomes:
+        raise ValueError("O artefato base não tem nomes de features; não dá para montar as colunas do treino")
+    try:
+        janela = FeatureAssembler(nomes).window
+    except ValueError:
+        raise ValueError(f"O artefato base usa features que o treino em blocos não sabe montar: {nomes}") from None
+    if (base_metadata or {}).get('temporal_window') != janela:
+        raise ValueError(f"Janela temporal do artefato base ({(base_metadata or {}).get('temporal_window')}) "
+                         f"não corresponde às features do booster ({janela})")
+    return nomes
+
+
+def train_out_of_core(path, chunk_rows=CHUNK_ROWS, external_memory=False, num_rounds=NUM_ROUNDS,
+                      base_model=None, base_metadata=None, model_dir=MODEL_DIR):
+    """
+    Treina (ou continua treinando base_model) lendo o dataset em blocos e grava
+    o artefato. Retorna a pasta do artefato gravado.
+    """
+    contagem, data_hash = scan_dataset(path, chunk_rows)
+    if base_metadata is not None:
+        # Continuação: soma as classes já vistas e encadeia o hash ao do artefato anterior
+        anteriores = base_metadata.get('class_counts', {})
+        contagem = {c: contagem[c] + int(anteriores.get(str(c), 0)) for c in contagem}
+        data_hash = hashlib.sha256((base_metadata['data_hash'] + data_hash).encode()).hexdigest()
+    ratio = contagem[0] / contagem[1] if contagem[1] else 1
+    nomes = base_features(base_model, base_metadata) if base_model is not None else EXPECTED_COLUMNS
+    janela = FeatureAssembler(nomes).window
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if external_memory:
+            iterador = ChunkIter(path, chunk_rows, os.path.join(cache_dir, "red_queen"), nomes)
+            dtrain = xgb.ExtMemQuantileDMatrix(iterador)
+        else:
+            dtrain = xgb.QuantileDMatrix(ChunkIter(path, chunk_rows, feature_names=nomes))
+
+        booster_base = base_model.get_booster() if base_model is not None else None
+        booster = xgb.train(training_params(ratio), dtrain, num_boost_round=num_rounds, xgb_model=booster_base)
+
+    return save_artifact(booster, data_hash, float(ratio), model_dir, extra={
+        'class_counts': contagem,
+        'parent_hash': base_metadata['data_hash'] if base_metadata is not None else None,
+        'num_boosted_rounds': booster.num_boosted_rounds(),
+        **({'temporal_window': janela} if janela else {}),
+    })
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Treino em blocos (fora da memória) do modelo Red Queen.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    for nome, ajuda, rodadas in (("treinar", "Treina do zero a partir do dataset", NUM_ROUNDS),
+                                 ("continuar", "Continua o último artefato com novos dados rotulados", CONTINUE_ROUNDS)):
+        p = sub.add_parser(nome, help=ajuda)
+        p.add_argument("dados", help="Dataset rotulado (CSV, Parquet ou Arrow)")
+        p.add_argument("--bloco", type=int, default=CHUNK_ROWS, help="Linhas lidas por bloco")
+        p.add_argument("--rodadas", type=int, default=rodadas, help="Árvores a treinar")
+        p.add_argument("--memoria-externa", action="store_true", help="Páginas quantizadas em disco (ExtMemQuantileDMatrix)")
+        p.add_argument("--model-dir", default=MODEL_DIR, help="Pasta dos artefatos")
+        p.add_argument("--promover", action="store_true", help="Promove o artefato novo (o painel passa a usá-lo)")
+    args = parser.parse_args()
+
+    modelo_base, metadados_base = (None, None)
+    if args.comando == "continuar":
+        modelo_base, metadados_base = load_serving_artifact(args.model_dir)
+        print(f"Continuando a partir de {artifact_path(metadados_base['data_hash'], args.model_dir)}")
+
+    caminho = train_out_of_core(args.dados, args.bloco, args.memoria_externa, args.rodadas,
+                                modelo_base, metadados_base, args.model_dir)
+    print(f"Artefato gravado em {caminho}")
+    if args.promover:
+        from drift_monitor import clear_retraining  # Solicitação de retreino (se houver) foi atendida
+        promote_artifact(os.path.basename(caminho), args.model_dir)
+        clear_retraining(args.model_dir)
+        print("Artefato promovido: o painel recarrega o modelo na próxima interação")
@@ -0,0 +1,192 @@
+# INSTRUMENTAÇÃO DO CAMINHO CRÍTICO DA RED QUEEN
+# Cronômetros, contadores e histogramas de baixo custo (só perf_counter e um
+# lock) para cada etapa de um tick, expostos em formato texto do Prometheus
+# (endpoint HTTP /metrics) e lidos pelo painel lateral do Streamlit. Inclui
+# um perfilador cProfile opcional para uma única sessão.
+
+import contextlib                        # Cronômetro como gerenciador de contexto
+import cProfile                          # Perfil opcional de uma sessão
+import io                                # Texto do relatório do perfil
+import marshal                           # Arquivo .prof (formato do pstats/snakeviz)
+import pstats                            # Relatório do perfil
+import threading                         # Registro compartilhado entre threads/sessões
+import time                              # Cronômetro
+from bisect import bisect_left           # Bucket do histograma
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRICS_PORT = 9108                      # Porta padrão do endpoint /metrics
+METRICS_HOST = "127.0.0.1"               # Só a máquina local; expor em outras interfaces é opção explícita
+
+
+class Histogram:
+    """Histograma de buckets fixos (cumulativo na exportação, como no Prometheus)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # O último é o +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, valor):
+        self.counts[bisect_left(self.buckets, valor)] += 1
+        self.total += valor
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimativa do quantil pelo limite superior do bucket (suficiente para o painel)."""
+        if not self.count:
+            return None
+        alvo = q * self.count
+        acumulado = 0
+        for limite, n in zip(self.buckets + (float('inf'),), self.counts):
+            acumulado += n
+            if acumulado >= alvo:
+                return limite
+        return float('inf')
+
+
+class MetricsRegistry:
+    """Registro de contadores e histogramas por etapa, seguro para várias threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, nome, valor=1):
+        with self._lock:
+            self.counters[nome] = self.counters.get(nome, 0) + valor
+
+    def observe(self, etapa, segundos):
+        with self._lock:
+            histograma = self.histograms.get(etapa)
+            if histograma is None:
+                histograma = self.histograms[etapa] = Histogram()
+            histograma.observe(segundos)
+
+    @contextlib.contextmanager
+    def timed(self, etapa):
+        """Mede a duração do bloco e a registra no histograma da etapa."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(etapa, time.perf_counter() - inicio)
+
+    def record_scores(self, linhas, alertas):
+        """Conta linhas pontuadas e alertas (a taxa de alerta é a razão entre os dois)."""
+        with self._lock:
+            self.counters['linhas_pontuadas'] = self.counters.get('linhas_pontuadas', 0) + linhas
+            self.counters['alertas'] = self.counters.get('alertas', 0) + alertas
+
+    def alert_rate(self):
+        linhas = self.counters.get('linhas_pontuadas', 0)
+        return self.counters.get('alertas', 0) / linhas if linhas else 0.0
+
+    def summary(self):
+        """Tabela (lista de dicts) por etapa: chamadas, média, p50 e p99 estimados, em ms."""
+        with self._lock:
+            linhas = []
+            for etapa, h in sorted(self.histograms.items()):
+                linhas.append({
+                    'etapa': etapa,
+                    'chamadas': h.count,
+                    'media_ms': h.total / h.count * 1000 if h.count else 0.0,
+                    'p50_ms': h.quantile(0.5) * 1000,
+                    'p99_ms': h.quantile(0.99) * 1000,
+                })
+            return linhas
+
+    def render_prometheus(self, prefixo="red_queen"):
+        """Exporta o registro no formato texto de exposição do Prometheus."""
+        with self._lock:
+            saida = []
+            for nome, valor in sorted(self.counters.items()):
+                saida.append(f"# TYPE {prefixo}_{nome}_total counter")
+                saida.append(f"{prefixo}_{nome}_total {valor}")
+            linhas = self.counters.get('linhas_pontuadas', 0)
+            saida.append(f"# TYPE {prefixo}_taxa_alerta gauge")
+            saida.append(f"{prefixo}_taxa_alerta {self.counters.get('alertas', 0) / linhas if linhas else 0.0}")
+
+            saida.append(f"# TYPE {prefixo}_etapa_segundos histogram")
+            for etapa, h in sorted(self.histograms.items()):
+                acumulado = 0
+                for limite, n in zip(h.buckets + (float('inf'),), h.counts):
+                    acumulado += n
+                    le = "+Inf" if limite == float('inf') else repr(limite)
+                    saida.append(f'{prefixo}_etapa_segundos_bucket{{etapa="{etapa}",le="{le}"}} {acumulado}')
+                saida.append(f'{prefixo}_etapa_segundos_sum{{etapa="{etapa}"}} {h.total}')
+                saida.append(f'{prefixo}_etapa_segundos_count{{etapa="{etapa}"}} {h.count}')
+            return "\n".join(saida) + "\n"
+
+
+# Registro único do processo (compartilhado pelo painel, ingestão e serviço)
+METRICS = MetricsRegistry()
+
+
+# ENDPOINT /metrics
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST, registry=METRICS):
+    """
+    Sobe um servidor HTTP em segundo plano que responde GET /metrics. Retorna o servidor.
+    Por padrão escuta só em 127.0.0.1; host="0.0.0.0" expõe o endpoint em todas as interfaces.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            corpo = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass  # Sem log por requisição (o Prometheus coleta a cada poucos segundos)
+
+    servidor = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+# PERFIL OPCIONAL DE UMA SESSÃO
+class SessionProfiler:
+    """
+    cProfile ligado/desligado por sessão. O resultado pode ser baixado como
+    .prof (abre no snakeviz ou em pstats). Para amostragem externa sem
+    overhead no processo, use 'py-spy record --pid <pid>' no mesmo processo.
+    """
+
+    def __init__(self):
+        self._perfil = cProfile.Profile()
+        self.ativo = False
+
+    def enable(self):
+        try:
+            self._perfil.enable()
+            self.ativo = True
+        except ValueError:
+            self.ativo = False  # Outro perfilador já está ativo neste processo
+
+    def disable(self):
+        if self.ativo:
+            self._perfil.disable()
+            self.ativo = False
+
+    def report(self, top=25):
+        """Texto com as funções de maior tempo acumulado."""
+        texto = io.StringIO()
+        try:
+            pstats.Stats(self._perfil, stream=texto).sort_stats('cumulative').print_stats(top)
+        except TypeError:
+            return "Nenhum dado coletado ainda."
+        return texto.getvalue()
+
+    def dump(self):
+        """Bytes de um arquivo .prof (mesmo formato de cProfile.Profile.dump_stats)."""
+        self._perfil.create_stats()
+        return marshal.dumps(self._perfil.stats)
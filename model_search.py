@@ -0,0 +1,163 @@
+# VALIDAÇÃO CRUZADA E BUSCA DE HIPERPARÂMETROS DA RED QUEEN
+# Roda k-fold estratificado para cada combinação da grade em um pool de
+# processos. As threads do XGBoost de cada processo são limitadas para que
+# processos x threads não ultrapasse os núcleos da máquina. Grava as métricas
+# por fold (AUC, precision, recall e tempo) e emite a melhor configuração como
+# um artefato reutilizável. Também calcula as probabilidades fora do fold
+# (out-of-fold) do modelo do painel, usadas na calibração do limiar.
+#
+#   python evaluate_model.py --cv --folds 5 --processos 4
+#   python evaluate_model.py --oof --folds 5
+
+import itertools                         # Combinações da grade
+import json                              # Parâmetros no arquivo de resultados
+import os                                # Núcleos disponíveis
+import time                              # Tempo de relógio por fold
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np                       # Probabilidades fora do fold
+import pandas as pd                      # Tabela de resultados
+import xgboost as xgb                    # Modelo avaliado
+from sklearn.model_selection import StratifiedKFold
+from sklearn.metrics import precision_score, recall_score, roc_auc_score
+
+from dataset_io import read_dataset
+from model_store import MODEL_DIR, TARGET_COLUMN, compute_data_hash, enrich_dataset, save_artifact
+
+# PARÂMETROS DA BUSCA
+PARAM_GRID = {
+    'max_depth': [3, 6, 9],
+    'n_estimators': [100, 300],
+    'learning_rate': [0.05, 0.1, 0.3],
+    'tree_method': ['hist'],
+}
+N_FOLDS = 5
+RESULTS_FILE = "resultados_cv.csv"
+CV_MODEL_DIR = os.path.join(MODEL_DIR, "cv")    # Artefatos emitidos pela busca (separados do painel)
+
+# Dados de cada processo do pool (carregados uma vez por processo, no initializer)
+_DADOS = {}
+
+
+def load_training_data(path):
+    """Carrega o dataset tipado com a anomalia silenciosa reforçada (o mesmo usado pelo painel)."""
+    df = enrich_dataset(read_dataset(path))
+    return df.drop(TARGET_COLUMN, axis=1), df[TARGET_COLUMN]
+
+
+def _init_worker(path, n_folds):
+    X, y = load_training_data(path)
+    _DADOS['X'], _DADOS['y'] = X, y
+    _DADOS['folds'] = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42).split(X, y))
+
+
+def param_combinations(grid=PARAM_GRID):
+    """Lista de dicts com todas as combinações da grade."""
+    chaves = list(grid)
+    return [dict(zip(chaves, valores)) for valores in itertools.product(*(grid[c] for c in chaves))]
+
+
+def build_model(params, y_train, n_jobs):
+    """XGBClassifier com o mesmo balanceamento do painel (scale_pos_weight) e threads limitadas."""
+    positivos = int((y_train == 1).sum())
+    ratio = (len(y_train) - positivos) / positivos if positivos else 1
+    return xgb.XGBClassifier(scale_pos_weight=ratio, eval_metric='logloss', random_state=42,
+                             n_jobs=n_jobs, **params)
+
+
+def run_fold(config_id, params, fold, n_jobs):
+    """Treina e avalia uma configuração em um fold. Roda dentro de um processo do pool."""
+    X, y = _DADOS['X'], _DADOS['y']
+    treino, teste = _DADOS['folds'][fold]
+
+    inicio = time.perf_counter()
+    model = build_model(params, y.iloc[treino], n_jobs)
+    model.fit(X.iloc[treino], y.iloc[treino])
+    tempo_treino = time.perf_counter() - inicio
+
+    proba = model.predict_proba(X.iloc[teste])[:, 1]
+    pred = (proba > 0.5).astype(int)
+    y_teste = y.iloc[teste]
+    return {
+        'config': config_id,
+        'params': json.dumps(params, sort_keys=True),
+        'fold': fold,
+        'auc': roc_auc_score(y_teste, proba),
+        'precision': precision_score(y_teste, pred, zero_division=0),
+        'recall': recall_score(y_teste, pred, zero_division=0),
+        'tempo_treino_s': tempo_treino,
+        'tempo_total_s': time.perf_counter() - inicio,
+    }
+
+
+def out_of_fold_probabilities(df, n_folds=N_FOLDS, temporal_window=None):
+    """
+    Probabilidade de anomalia de cada linha de df dada por um modelo que não a viu
+    no treino (k-fold estratificado, mesma configuração do painel). Com
+    temporal_window, as features temporais são calculadas na sequência inteira
+    antes da divisão, como no treino. Retorna (y, proba, fold de cada linha).
+    """
+    if temporal_window:
+        from temporal_features import add_temporal_features
+        df = add_temporal_features(df, temporal_window)
+    X, y = df.drop(TARGET_COLUMN, axis=1), df[TARGET_COLUMN]
+    proba = np.empty(len(df), dtype=np.float64)
+    folds = np.empty(len(df), dtype=np.int8)
+    divisao = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42).split(X, y)
+    for fold, (treino, teste) in enumerate(divisao):
+        model = build_model({}, y.iloc[treino], n_jobs=-1)
+        model.fit(X.iloc[treino], y.iloc[treino])
+        proba[teste] = model.predict_proba(X.iloc[teste])[:, 1]
+        folds[teste] = fold
+    return y.to_numpy(dtype=np.int8), proba, folds
+
+
+def cross_validate_search(path="Red_Queen_Synthetic_Dataset.csv", grid=PARAM_GRID, n_folds=N_FOLDS,
+                          processos=None, results_file=RESULTS_FILE, model_dir=CV_MODEL_DIR):
+    """
+    Avalia todas as combinações da grade com k-fold estratificado em paralelo,
+    grava os resultados por fold em results_file e treina a melhor configuração
+    (maior AUC média) em todos os dados, gravando-a como artefato em model_dir.
+    Retorna (tabela por fold, resumo por configuração, parâmetros vencedores).
+    """
+    nucleos = os.cpu_count() or 1
+    processos = processos or nucleos
+    # Orçamento de threads: cada processo usa apenas a sua fatia dos núcleos
+    n_jobs = max(1, nucleos // processos)
+    configuracoes = param_combinations(grid)
+    print(f"{len(configuracoes)} configurações x {n_folds} folds em {processos} processos "
+          f"({n_jobs} thread(s) do XGBoost cada)...")
+
+    resultados = []
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(processos, initializer=_init_worker, initargs=(path, n_folds)) as pool:
+        tarefas = [pool.submit(run_fold, i, params, fold, n_jobs)
+                   for i, params in enumerate(configuracoes) for fold in range(n_folds)]
+        for n, tarefa in enumerate(as_completed(tarefas), 1):
+            resultados.append(tarefa.result())
+            if n % n_folds == 0:
+                print(f"  {n}/{len(tarefas)} folds concluídos")
+    print(f"Busca concluída em {time.perf_counter() - inicio:.1f}s de relógio.")
+
+    tabela = pd.DataFrame(resultados).sort_values(['config', 'fold']).reset_index(drop=True)
+    tabela.to_csv(results_file, index=False)
+
+    resumo = (tabela.groupby(['config', 'params'])
+              .agg(auc_media=('auc', 'mean'), auc_std=('auc', 'std'),
+                   precision_media=('precision', 'mean'), recall_media=('recall', 'mean'),
+                   tempo_treino_medio_s=('tempo_treino_s', 'mean'))
+              .reset_index()
+              .sort_values(['auc_media', 'recall_media', 'precision_media', 'tempo_treino_medio_s'],
+                           ascending=[False, False, False, True]))
+    melhor = resumo.iloc[0]
+    melhores_params = json.loads(melhor['params'])
+
+    # Emite a melhor configuração treinada em todos os dados como artefato reutilizável
+    X, y = load_training_data(path)
+    model = build_model(melhores_params, y, n_jobs=-1)
+    model.fit(X, y)
+    df_treino = X.assign(**{TARGET_COLUMN: y})
+    caminho = save_artifact(model, compute_data_hash(df_treino), float(model.get_params()['scale_pos_weight']),
+                            model_dir, extra={'params': melhores_params, 'cv_auc_media': float(melhor['auc_media']),
+                                              'cv_folds': n_folds})
+    print(f"Melhor configuração salva em {caminho}")
+    return tabela, resumo, melhores_params
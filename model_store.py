@@ -0,0 +1,238 @@
+# ARMAZENAMENTO VERSIONADO DO MODELO RED QUEEN
+# Evita retreinar o XGBoost a cada cold start do painel: o treino grava o booster,
+# a ordem das features, o scale_pos_weight e o hash dos dados em disco, e o
+# carregamento só retreina quando o hash dos dados de treino muda.
+# Cada artefato também traz o modelo compilado (compiled_model.py), que pode ser
+# carregado e usado sem importar xgboost nem sklearn. Um artefato retreinado
+# fora do painel (ex.: após deriva) é promovido por promoted.json, e o painel
+# e os serviços (pontuação HTTP, ingestão) passam a preferi-lo.
+
+import hashlib                           # Hash dos dados de treino
+import json                              # Metadados do artefato
+import os                                # Manipulação de caminhos
+import time                              # Carimbo de data do artefato
+import pandas as pd                      # Manipulação de dados
+from compiled_model import CompiledModel, compile_booster  # Inferência em NumPy puro
+# xgboost e sklearn só são importados ao treinar ou carregar o booster
+
+# PARÂMETROS DO ARMAZENAMENTO
+MODEL_DIR = "modelos"                    # Pasta raiz dos artefatos
+MODEL_FILE = "model.ubj"                 # Booster em formato binário (UBJSON)
+COMPILED_FILE = "model_compiled.npz"     # Árvores em vetores planos (motor compilado)
+METADATA_FILE = "metadata.json"          # Ordem das features, scale_pos_weight, hash...
+ARTIFACT_VERSION = 1                     # Versão do formato do artefato (muda se o treino mudar)
+PROMOTED_FILE = "promoted.json"          # Artefato promovido para o painel (na pasta raiz dos artefatos)
+
+# Colunas esperadas nas leituras dos sensores (na ordem usada no treino)
+EXPECTED_COLUMNS = ['T_Virus_Level', 'Room_Temperature', 'Humidity', 'Gas_Leak_Level',
+                    'Security_Clearance', 'AI_Override_Attempts', 'Proximity_To_Core']
+TARGET_COLUMN = 'Anomaly'
+
+
+# PREPARAÇÃO DOS DADOS
+def enrich_dataset(df_original):
+    """Junta ao dataset a anomalia silenciosa (só T-Virus elevado) replicada 10 vezes."""
+    novas_anomalias = {
+        'T_Virus_Level':      [95.0],  # Apenas o T-Virus está em nível crítico
+        'Room_Temperature':   [21.5],  # O resto está normal
+        'Humidity':           [48.0],
+        'Gas_Leak_Level':     [0.0],
+        'Security_Clearance': [2],
+        'AI_Override_Attempts':[0],
+        'Proximity_To_Core':  [20.0],
+        'Anomaly':            [1]      # E isso é uma anomalia
+    }
+    # Mantém os tipos das colunas do dataset original (ex.: float32/int8 do esquema tipado)
+    df_novas_anomalias = pd.DataFrame(novas_anomalias).astype(df_original.dtypes.to_dict())
+    df_novas_anomalias_reforcado = pd.concat([df_novas_anomalias] * 10, ignore_index=True)
+    return pd.concat([df_original, df_novas_anomalias_reforcado], ignore_index=True)
+
+
+def compute_data_hash(df, temporal_window=None):
+    """Calcula um hash estável (SHA-256) do conteúdo do DataFrame de treino (e da janela temporal, se usada)."""
+    digest = hashlib.sha256()
+    digest.update(f"v{ARTIFACT_VERSION}".encode())
+    if temporal_window:
+        digest.update(f"janela{temporal_window}".encode())
+    digest.update(",".join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+# TREINAMENTO
+def fit_model(df, temporal_window=None):
+    """
+    Treina o modelo XGBoost com balanceamento (via scale_pos_weight).
+    Com temporal_window, treina também com as features de janela deslizante (temporal_features.py),
+    calculadas na ordem das linhas de df: df precisa estar em ordem temporal (o dataset sintético não está).
+    Retorna o modelo treinado e o scale_pos_weight usado.
+    """
+    from xgboost import XGBClassifier    # Algoritmo de aprendizado supervisionado baseado em árvores
+    from sklearn.model_selection import train_test_split  # Separação de dados para treino/teste
+    if temporal_window:
+        from temporal_features import add_temporal_features  # Importado aqui: temporal_features importa este módulo
+        df = add_temporal_features(df, temporal_window)
+    X = df.drop(TARGET_COLUMN, axis=1)
+    y = df[TARGET_COLUMN]
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+
+    if 1 not in y_train.value_counts():
+        ratio = 1
+    else:
+        ratio = y_train.value_counts()[0] / y_train.value_counts()[1]
+
+    model = XGBClassifier(scale_pos_weight=ratio, use_label_encoder=False, eval_metric='logloss', random_state=42)
+    model.fit(X_train, y_train)
+    return model, float(ratio)
+
+
+# PERSISTÊNCIA
+def artifact_path(data_hash, model_dir=MODEL_DIR):
+    """Pasta do artefato correspondente a um hash de dados."""
+    return os.path.join(model_dir, data_hash[:16])
+
+
+def save_artifact(model, data_hash, scale_pos_weight, model_dir=MODEL_DIR, extra=None):
+    """
+    Grava o booster (XGBClassifier ou xgboost.Booster) e seus metadados em disco.
+    'extra' acrescenta campos aos metadados. Retorna a pasta do artefato.
+    """
+    path = artifact_path(data_hash, model_dir)
+    os.makedirs(path, exist_ok=True)
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+
+    # Grava em arquivos temporários e renomeia, para que outra réplica nunca leia um artefato pela metade
+    model_tmp = os.path.join(path, "tmp_" + MODEL_FILE)
+    model.save_model(model_tmp)
+    os.replace(model_tmp, os.path.join(path, MODEL_FILE))
+    compiled_tmp = os.path.join(path, "tmp_" + COMPILED_FILE)
+    compile_booster(booster).save(compiled_tmp)
+    os.replace(compiled_tmp, os.path.join(path, COMPILED_FILE))
+
+    metadata = {
+        'artifact_version': ARTIFACT_VERSION,
+        'data_hash': data_hash,
+        'feature_names': list(booster.feature_names),
+        'scale_pos_weight': scale_pos_weight,
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    metadata.update(extra or {})
+    metadata_tmp = os.path.join(path, METADATA_FILE + ".tmp")
+    with open(metadata_tmp, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(metadata_tmp, os.path.join(path, METADATA_FILE))
+
+    # Aponta o "último" artefato para consumidores que não têm os dados de treino
+    with open(os.path.join(model_dir, "latest.json"), "w", encoding="utf-8") as f:
+        json.dump({'data_hash': data_hash}, f)
+    return path
+
+
+def update_metadata(path, campos):
+    """Acrescenta (ou substitui) campos nos metadados de um artefato, com gravação atômica."""
+    with open(os.path.join(path, METADATA_FILE), encoding="utf-8") as f:
+        metadata = json.load(f)
+    metadata.update(campos)
+    metadata_tmp = os.path.join(path, METADATA_FILE + ".tmp")
+    with open(metadata_tmp, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(metadata_tmp, os.path.join(path, METADATA_FILE))
+    return metadata
+
+
+def load_artifact(path, compiled=False):
+    """
+    Carrega um artefato gravado por save_artifact. Retorna (modelo, metadados).
+    Com compiled=True, retorna o CompiledModel (sem importar xgboost); artefatos
+    antigos, sem o arquivo compilado, são compilados e atualizados na primeira carga.
+    O limiar calibrado (calibration.py), se houver, vai em modelo.threshold_decisao.
+    """
+    with open(os.path.join(path, METADATA_FILE), encoding="utf-8") as f:
+        metadata = json.load(f)
+    if metadata.get('artifact_version') != ARTIFACT_VERSION:
+        raise ValueError(f"Versão de artefato incompatível em {path}: {metadata.get('artifact_version')}")
+
+    if compiled:
+        compiled_path = os.path.join(path, COMPILED_FILE)
+        if not os.path.exists(compiled_path):
+            booster, _ = load_artifact(path)
+            compiled_tmp = os.path.join(path, "tmp_" + COMPILED_FILE)
+            compile_booster(booster).save(compiled_tmp)
+            os.replace(compiled_tmp, compiled_path)
+        model = CompiledModel.load(compiled_path)
+    else:
+        from xgboost import XGBClassifier
+        model = XGBClassifier()
+        model.load_model(os.path.join(path, MODEL_FILE))
+    if 'decision_threshold' in metadata:
+        model.threshold_decisao = float(metadata['decision_threshold'])
+    return model, metadata
+
+
+def load_latest_artifact(model_dir=MODEL_DIR, compiled=False):
+    """Carrega o último artefato gravado (útil para quem não tem os dados de treino)."""
+    with open(os.path.join(model_dir, "latest.json"), encoding="utf-8") as f:
+        data_hash = json.load(f)['data_hash']
+    return load_artifact(artifact_path(data_hash, model_dir), compiled)
+
+
+def promote_artifact(data_hash, model_dir=MODEL_DIR):
+    """Promove o artefato de data_hash: o painel passa a usá-lo (ao notar a mudança, recarrega o modelo)."""
+    _, metadata = load_artifact(artifact_path(data_hash, model_dir), compiled=True)  # Falha aqui, e não no painel, se inválido
+    promoted_tmp = os.path.join(model_dir, PROMOTED_FILE + ".tmp")
+    with open(promoted_tmp, "w", encoding="utf-8") as f:
+        json.dump({'data_hash': metadata['data_hash'], 'promoted_at': time.strftime("%Y-%m-%dT%H:%M:%S")}, f)
+    os.replace(promoted_tmp, os.path.join(model_dir, PROMOTED_FILE))
+
+
+def promoted_hash(model_dir=MODEL_DIR):
+    """Hash do artefato promovido, ou None se nenhum foi promovido."""
+    try:
+        with open(os.path.join(model_dir, PROMOTED_FILE), encoding="utf-8") as f:
+            return json.load(f)['data_hash']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_serving_artifact(model_dir=MODEL_DIR, compiled=False):
+    """Artefato que está servindo: o promovido, se houver, senão o último gravado."""
+    data_hash = promoted_hash(model_dir)
+    if data_hash is None:
+        return load_latest_artifact(model_dir, compiled)
+    return load_artifact(artifact_path(data_hash, model_dir), compiled)
+
+
+def load_or_train(df, model_dir=MODEL_DIR, compiled=False, temporal_window=None):
+    """
+    Carrega o artefato correspondente ao hash de df ou, se não existir
+    (ou estiver corrompido), treina um novo modelo e o grava.
+    Retorna (modelo, metadados).
+    """
+    data_hash = compute_data_hash(df, temporal_window)
+    path = artifact_path(data_hash, model_dir)
+    try:
+        model, metadata = load_artifact(path, compiled)
+        if metadata['data_hash'] == data_hash:
+            return model, metadata
+    except (OSError, ValueError, KeyError):
+        pass  # Artefato ausente ou inválido: retreina
+
+    model, ratio = fit_model(df, temporal_window)
+    save_artifact(model, data_hash, ratio, model_dir,
+                  extra={'temporal_window': temporal_window} if temporal_window else None)
+    return load_artifact(path, compiled)
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO (pré-treino, ex.: no deploy)
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Treina e grava o artefato do modelo Red Queen.")
+    parser.add_argument("--data", default="Red_Queen_Synthetic_Dataset.csv", help="CSV de treino")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="Pasta dos artefatos")
+    parser.add_argument("--janela-temporal", type=int, default=0,
+                        help="Treina com features de janela deslizante (0: só as leituras)")
+    args = parser.parse_args()
+
+    df_enriquecido = enrich_dataset(pd.read_csv(args.data, encoding='utf-8'))
+    _, meta = load_or_train(df_enriquecido, args.model_dir, temporal_window=args.janela_temporal or None)
+    print(f"Artefato pronto: {artifact_path(meta['data_hash'], args.model_dir)}")
@@ -0,0 +1,208 @@
+# MONITORAMENTO DE VÁRIAS SALAS (MULTI-STREAM) DA RED QUEEN
+# N fluxos de sensores (um por instalação/sala) compartilham um único modelo
+# carregado e uma única matriz de leituras somente leitura. O estado das salas
+# (cursor, histórico, último alerta e contadores) fica em vetores com uma linha
+# por sala, e cada tick pontua todas as salas com uma única chamada a
+# predict_proba e grava o histórico de todas de uma vez: 100 salas custam uma
+# previsão em lote e algumas operações vetorizadas, não 100 iterações. Os
+# alertas de cada sala são agrupados em incidentes (alerting.IncidentTracker).
+#
+#   python multi_stream.py --salas 100 --ticks 500   (compara lote vs. uma chamada por sala)
+
+import numpy as np                       # Cursores e leituras vetorizados
+import pandas as pd                      # Tabela de status das salas
+
+from model_store import EXPECTED_COLUMNS  # Esquema das leituras dos sensores
+from batch_scoring import decision_threshold  # Limiar calibrado do artefato (ou o padrão)
+from ring_buffer import MultiSensorHistory  # Histórico de todas as salas em um único buffer circular
+from instrumentation import METRICS      # Latência do tick, linhas pontuadas e alertas
+from temporal_features import FeatureAssembler  # Features temporais incrementais, vetorizadas entre salas
+from alerting import IncidentTracker     # Incidentes com histerese, vetorizados entre salas
+
+# PARÂMETROS DO MONITORAMENTO
+ROOM_WINDOW = 60                         # Leituras no histórico de cada sala (memória constante por sala)
+
+
+class StreamState:
+    """Visão de uma sala sobre os vetores do monitor: nome, histórico, último alerta e contadores."""
+
+    __slots__ = ('monitor', 'i')
+
+    def __init__(self, monitor, i):
+        self.monitor = monitor
+        self.i = i
+
+    @property
+    def nome(self):
+        return self.monitor.names[self.i]
+
+    @property
+    def last_alert(self):
+        """(índice da leitura, confiança em %) do último alerta, ou None."""
+        indice = int(self.monitor.last_alert_index[self.i])
+        return None if indice < 0 else (indice, float(self.monitor.last_alert_conf[self.i]))
+
+    @property
+    def alertas(self):
+        return int(self.monitor.alertas[self.i])
+
+    @property
+    def incidentes(self):
+        return int(self.monitor.incidentes[self.i])
+
+    @property
+    def ultima_proba(self):
+        return float(self.monitor.ultima_proba[self.i])
+
+    def series(self, column):
+        """Histórico recente de um sensor da sala (pronto para st.line_chart)."""
+        return self.monitor.history.series(self.i, column)
+
+
+class MultiStreamMonitor:
+    """
+    Monitora várias salas sobre uma matriz compartilhada (n x EXPECTED_COLUMNS).
+    Cada sala percorre a faixa [inicio, fim) da matriz em loop, a partir de um deslocamento.
+    """
+
+    def __init__(self, model, data, window=ROOM_WINDOW, threshold=None):
+        self.model = model
+        self.data = data                 # Somente leitura; compartilhada entre sessões
+        self.window = window
+        self.threshold = decision_threshold(model) if threshold is None else threshold
+        self.streams = []
+        self.names = []
+        self.cursors = np.zeros(0, dtype=np.int64)
+        self.last_indices = np.zeros(0, dtype=np.int64)  # Última leitura pontuada de cada sala
+        self.inicios = np.zeros(0, dtype=np.int64)
+        self.fins = np.zeros(0, dtype=np.int64)
+        self.ticks = 0
+
+        # Entrada na ordem de features do modelo; o estado temporal (se usado) tem uma linha por sala
+        self.features = FeatureAssembler(model.get_booster().feature_names)
+        self._temporal = None
+        self.incidents = IncidentTracker(threshold=self.threshold)
+        self.closed = []                 # Incidentes fechados ainda não consumidos (pop_closed)
+
+        # Estado por sala em vetores (uma linha por sala), atualizado uma vez por tick
+        self.history = MultiSensorHistory(EXPECTED_COLUMNS, window)
+        self.alertas = np.zeros(0, dtype=np.int64)
+        self.incidentes = np.zeros(0, dtype=np.int64)  # Incidentes abertos desde o início
+        self.ultima_proba = np.zeros(0)
+        self.last_alert_index = np.zeros(0, dtype=np.int64)  # -1: sala ainda sem alerta
+        self.last_alert_conf = np.zeros(0)                   # Confiança (%) no último alerta
+        # Entrada do modelo no último alerta de cada sala (para explicar a causa raiz)
+        self.last_alert_inputs = np.zeros((0, len(self.features.feature_names)))
+
+    def add_stream(self, nome, inicio=0, fim=None, deslocamento=0):
+        fim = len(self.data) if fim is None else fim
+        self.streams.append(StreamState(self, len(self.streams)))
+        self.names.append(nome)
+        self.cursors = np.append(self.cursors, inicio + deslocamento % (fim - inicio))
+        self.last_indices = np.append(self.last_indices, self.cursors[-1])
+        self.inicios = np.append(self.inicios, inicio)
+        self.fins = np.append(self.fins, fim)
+        self.history.add_stream()
+        self.alertas = np.append(self.alertas, 0)
+        self.incidentes = np.append(self.incidentes, 0)
+        self.ultima_proba = np.append(self.ultima_proba, 0.0)
+        self.last_alert_index = np.append(self.last_alert_index, -1)
+        self.last_alert_conf = np.append(self.last_alert_conf, 0.0)
+        self.last_alert_inputs = np.vstack([self.last_alert_inputs, np.zeros(self.last_alert_inputs.shape[1])])
+        self.incidents.add_stream(nome)
+        self._temporal = self.features.new_state(len(self.streams))  # Recomeça as janelas de todas as salas
+        return self
+
+    def tick(self):
+        """Avança todas as salas uma leitura e as pontua juntas. Retorna as probabilidades de anomalia."""
+        leituras = self.data[self.cursors]
+        with METRICS.timed('predict_multi_salas'):
+            entrada = self.features.matrix(leituras, self._temporal, one_per_stream=True)
+            proba = self.model.predict_proba(entrada)[:, 1]
+        alertas = proba > self.threshold
+        METRICS.record_scores(len(proba), int(alertas.sum()))
+        self.last_indices = self.cursors.copy()
+        self.closed += self.incidents.update(proba, self.last_indices, entrada)
+
+        # Todas as salas de uma vez: histórico, contadores e último alerta
+        self.history.append(leituras, self.cursors)
+        self.ultima_proba = proba.astype(np.float64)
+        self.alertas += alertas
+        self.incidentes += alertas & self.incidents.opened
+        self.last_alert_index[alertas] = self.cursors[alertas]
+        self.last_alert_conf[alertas] = self.ultima_proba[alertas] * 100
+        self.last_alert_inputs[alertas] = entrada[alertas]
+        # Volta ao início da faixa da sala ao chegar no fim
+        proximo = self.cursors + 1
+        self.cursors = np.where(proximo >= self.fins, self.inicios, proximo)
+        self.ticks += 1
+        return proba
+
+    def pop_closed(self):
+        """Incidentes fechados desde a última chamada (com a entrada do modelo no pico, em 'entrada')."""
+        fechados, self.closed = self.closed, []
+        return fechados
+
+    def alert_input(self, sala):
+        """Entrada do modelo no último alerta da sala, como DataFrame de uma linha (para explicar)."""
+        return pd.DataFrame(self.last_alert_inputs[[sala.i]], columns=self.features.feature_names,
+                            index=[sala.last_alert[0]])
+
+    def table(self):
+        """Status de todas as salas (uma linha por sala), com os alertas primeiro."""
+        ultimos = self.data[self.last_indices]
+        tabela = pd.DataFrame({
+            'Sala': self.names,
+            'Leitura': self.last_indices,
+            'T_Virus_Level': ultimos[:, EXPECTED_COLUMNS.index('T_Virus_Level')],
+            'Confianca': self.ultima_proba * 100,
+            'Status': np.where(self.ultima_proba > self.threshold, '🚨 ALERTA', '✅ Seguro'),
+            'Alertas': self.alertas,
+            'Incidentes': self.incidentes,
+            'Incidente_Aberto': self.incidents.aberto.copy(),
+            'Ultimo_Alerta': np.where(self.last_alert_index >= 0, self.last_alert_index, np.nan),
+        })
+        return tabela.sort_values(['Alertas', 'Confianca'], ascending=False, kind='stable')
+
+
+def staggered_rooms(model, data, n_salas, window=ROOM_WINDOW):
+    """Cria n_salas que reproduzem a mesma matriz com deslocamentos espaçados (simula várias instalações)."""
+    monitor = MultiStreamMonitor(model, data, window)
+    for i in range(n_salas):
+        monitor.add_stream(f"Sala {i + 1:03d}", deslocamento=i * len(data) // n_salas)
+    return monitor
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    import time
+    from dataset_io import read_dataset
+    from model_store import load_serving_artifact
+    parser = argparse.ArgumentParser(description="Monitoramento de várias salas com um único modelo.")
+    parser.add_argument("--data", default="Red_Queen_Synthetic_Dataset.csv")
+    parser.add_argument("--salas", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--xgboost", action="store_true", help="Usa o booster do xgboost em vez do motor compilado")
+    args = parser.parse_args()
+
+    model, _ = load_serving_artifact(compiled=not args.xgboost)
+    matriz = read_dataset(args.data, columns=EXPECTED_COLUMNS)[EXPECTED_COLUMNS].to_numpy(dtype=np.float64)
+    monitor = staggered_rooms(model, matriz, args.salas)
+
+    inicio = time.perf_counter()
+    for _ in range(args.ticks):
+        monitor.tick()
+    lote = (time.perf_counter() - inicio) / args.ticks
+
+    # Referência: uma chamada por sala a cada tick (mesma entrada, só muda o número de chamadas)
+    entrada = monitor.features.matrix(matriz[monitor.cursors], monitor._temporal, one_per_stream=True)
+    inicio = time.perf_counter()
+    for _ in range(max(1, args.ticks // 10)):
+        for i in range(len(monitor.streams)):
+            model.predict_proba(entrada[i:i + 1])
+    por_sala = (time.perf_counter() - inicio) / max(1, args.ticks // 10)
+
+    print(f"{args.salas} salas, {args.ticks} ticks: {lote * 1000:.2f} ms/tick em lote "
+          f"vs. {por_sala * 1000:.2f} ms/tick com uma chamada por sala ({por_sala / lote:.1f}x)")
+    print(monitor.table().head(10).to_string(index=False))
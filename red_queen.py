@@ -2,97 +2,355 @@
 
 # IMPORTAÇÕES NECESSÁRIAS
 import streamlit as st                   # Biblioteca principal para a interface web
+from startup import REPORT, BackgroundTask  # Importações sob demanda, aquecimento em segundo plano e tempos de inicialização
 import pandas as pd                      # Manipulação de dados
+import os                                # Porta do endpoint de métricas
 import time                              # Pausas temporais na simulação
-import shap                              # Explicabilidade do modelo de ML
-from matplotlib import pyplot as plt     # Visualizações com gráficos
-from xgboost import XGBClassifier        # Algoritmo de aprendizado supervisionado baseado em árvores
-from sklearn.model_selection import train_test_split     # Separação de dados para treino/teste
+import numpy as np                       # Índices das leituras ao vivo
+from model_store import enrich_dataset, load_or_train, load_artifact, artifact_path, promoted_hash, EXPECTED_COLUMNS  # Artefato versionado do modelo (treina só se os dados mudarem)
+from dataset_io import read_dataset                                       # Leitura tipada (CSV/Parquet/Arrow), só das colunas usadas
+from batch_scoring import score_dataframe, summarize_scores, decision_threshold  # Pontuação vetorizada em blocos
+from ring_buffer import SensorHistory, DEFAULT_WINDOW                     # Histórico de tamanho fixo (buffer circular)
+from streaming import StreamIngestor                                      # Ingestão contínua (socket/arquivo) em micro-lotes
+from multi_stream import staggered_rooms                                  # Várias salas com um único modelo e pontuação em lote por tick
+from temporal_features import prepare_frame                               # Features de janela deslizante (se o modelo as usa)
+from unsupervised_detector import EnsembleDetector, from_normal_profile   # Segundo motor: perfil normal aprendido sem rótulos
+from alerting import AlertStore, IncidentTracker, find_incidents, ALERT_DB  # Incidentes com histerese e registro em SQLite
+from simulation_clock import SimulationClock, DEFAULT_RATE, MAX_RATE       # Posição da simulação pelo relógio (sem sleep + rerun)
+from drift_monitor import DriftBaseline, DriftMonitor, request_retraining, pending_retraining, clear_retraining  # Deriva por sensor (histogramas)
+from explanations import ExplanationCache, explain_rows, top_factor, waterfall_frame  # Causa raiz em lote, com cache LRU
+from instrumentation import METRICS, SessionProfiler, start_metrics_server, METRICS_PORT, METRICS_HOST  # Cronômetros, contadores e /metrics
+# shap, xgboost e altair (os mais lentos de importar) só são carregados quando usados
+REPORT.mark("importacoes")
 
 # CONFIGURAÇÃO DA PÁGINA
 # Define o layout, título da aba e a barra lateral expandida por padrão
 st.set_page_config(layout="wide",page_title="Red Queen Threat Control",initial_sidebar_state="expanded")
 
+# Perfil opcional desta sessão (ligado pela barra lateral): cobre a execução inteira do script
+if st.session_state.get('profiler') is not None and st.session_state.get('profiling', False):
+    st.session_state.profiler.enable()
+
+# Dataset de treino (também reproduzido pelas salas do modo multi-salas)
+TRAINING_DATA = "Red_Queen_Synthetic_Dataset.csv"
+# Janela das features temporais do modelo (0: o modelo vê só a leitura atual)
+TEMPORAL_WINDOW = int(os.environ.get("RED_QUEEN_TEMPORAL_WINDOW", 0)) or None
+# Intervalo (s) entre quadros do painel ao vivo (só o fragmento do painel é redesenhado)
+LIVE_MIN_REFRESH = 0.1
+# Ticks das salas processados por quadro no máximo (o restante do atraso é descartado)
+MULTI_MAX_CATCHUP = 20
+# Quantas linhas anômalas à frente são explicadas de uma vez na simulação
+EXPLAIN_BLOCK = 256
+# Modos de explicação disponíveis (rótulo na interface -> modo em explanations.py)
+EXPLAIN_MODE_LABELS = {"SHAP (TreeExplainer)": 'shap',
+                       "Rápido (pred_contribs)": 'contribs',
+                       "Aproximado (Saabas)": 'aproximado'}
+# Períodos do histórico de incidentes (rótulo -> segundos; None = tudo)
+INCIDENT_PERIODS = {"Última hora": 3600, "Últimas 24 horas": 86_400, "Últimos 7 dias": 7 * 86_400, "Tudo": None}
+# Motores de detecção (rótulo na interface -> motor)
+ENGINE_LABELS = {"Supervisionado (XGBoost)": 'supervisionado',
+                 "Não supervisionado (Mahalanobis)": 'nao_supervisionado',
+                 "Conjunto (alerta se qualquer um alertar)": 'conjunto'}
+
 # FUNÇÕES
-@st.cache_data
-def load_data(path):
-    """Carrega o dataset a partir de um caminho especificado."""
-    return pd.read_csv(path, encoding='utf-8')
+@st.cache_resource
+def load_training_data(path):
+    """
+    Carrega o dataset (CSV, Parquet ou Arrow) com o esquema tipado e junta a anomalia
+    silenciosa (somente o T-Virus elevado), replicada 10 vezes para reforçar no treinamento.
+    Uma única cópia, somente leitura, compartilhada por todas as sessões.
+    """
+    return enrich_dataset(read_dataset(path))
 
 
 @st.cache_resource
-def train_model(df):
+def training_matrix(path):
+    """Leituras do dataset de treino como matriz (ordem de EXPECTED_COLUMNS), compartilhada pelas salas."""
+    return load_training_data(path)[EXPECTED_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def warm_up(tarefa, df):
     """
-    Treina o modelo XGBoost com balanceamento (via scale_pos_weight)
-    Retorna o modelo treinado.
+    Aquecimento em segundo plano, nesta ordem:
+    - 'scorer': motor compilado (NumPy puro) usado em toda pontuação: o artefato
+      promovido após um retreino, se houver; senão o do hash dos dados de treino
+      (treina com balanceamento, via scale_pos_weight, e grava se o hash mudou)
+    - 'model': booster do XGBoost do mesmo artefato (modos rápidos de explicação)
+    - 'explainer': explicador SHAP do modelo
     """
-    X = df.drop('Anomaly', axis=1)
-    y = df['Anomaly']
-    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+    promovido = promoted_hash()
+    tarefa.publish('promoted', promovido)
+    with REPORT.measure("modelo_compilado"):
+        scorer = metadata = None
+        if promovido is not None:
+            try:
+                scorer, metadata = load_artifact(artifact_path(promovido), compiled=True)
+            except (OSError, ValueError, KeyError):
+                pass  # Promovido ausente ou inválido: usa o artefato dos dados de treino
+        if scorer is None:
+            scorer, metadata = load_or_train(df, compiled=True, temporal_window=TEMPORAL_WINDOW)
+        tarefa.publish('metadata', metadata)
+        tarefa.publish('scorer', scorer)
+    REPORT.lazy_import('xgboost')
+    with REPORT.measure("booster_xgboost"):
+        tarefa.publish('model', load_artifact(artifact_path(metadata['data_hash']))[0])
+    shap = REPORT.lazy_import('shap')
+    with REPORT.measure("explicador_shap"):
+        tarefa.publish('explainer', shap.TreeExplainer(tarefa.get('model')))
 
-    if 1 not in y_train.value_counts():
-        ratio = 1
-    else:
-        ratio = y_train.value_counts()[0] / y_train.value_counts()[1]
 
-    model = XGBClassifier(scale_pos_weight=ratio, use_label_encoder=False, eval_metric='logloss', random_state=42)
-    model.fit(X_train, y_train)
-    return model
+@st.cache_resource
+def start_warmup(df):
+    """Dispara o aquecimento uma única vez por processo; a interface não espera por ele."""
+    return BackgroundTask(warm_up, df).start()
 
 
 @st.cache_resource
-def create_explainer(_model):
-    """Cria e retorna um objeto explainer do SHAP para o modelo."""
-    if _model:
-        return shap.TreeExplainer(_model)
-    return None
+def unsupervised_model():
+    """Detector não supervisionado, ajustado ao perfil normal do gerador (uma vez por processo)."""
+    with REPORT.measure("detector_nao_supervisionado"):
+        return from_normal_profile()
 
 
-# PREPARAÇÃO DE DADOS E TREINAMENTO
-# Carrega o dataset original
-df_original = load_data("Red_Queen_Synthetic_Dataset.csv")
-
-# Simula uma anomalia silenciosa (somente o T-Virus elevado)
-novas_anomalias = {
-    'T_Virus_Level':      [95.0],  # Apenas o T-Virus está em nível crítico
-    'Room_Temperature':   [21.5],  # O resto está normal
-    'Humidity':           [48.0],
-    'Gas_Leak_Level':     [0.0],
-    'Security_Clearance': [2],
-    'AI_Override_Attempts':[0],
-    'Proximity_To_Core':  [20.0],
-    'Anomaly':            [1]      # E isso é uma anomalia
-}
-
-# Replica a anomalia 10 vezes para reforçar no treinamento
-df_novas_anomalias = pd.DataFrame(novas_anomalias)
-df_novas_anomalias_reforcado = pd.concat([df_novas_anomalias] * 10, ignore_index=True)
-
-# Junta os dados originais com os dados reforçados
-df_enriquecido = pd.concat([df_original, df_novas_anomalias_reforcado], ignore_index=True)
-
-# Treina o modelo especialista e cria o explicador SHAP
-model = train_model(df_enriquecido)
-explainer = create_explainer(model)
+def detection_model(motor):
+    """Modelo que pontua com o motor escolhido (mesma interface do motor compilado)."""
+    if motor == 'nao_supervisionado':
+        return unsupervised_model()
+    if motor == 'conjunto':
+        return EnsembleDetector(scorer, unsupervised_model())
+    return scorer
+
+
+@st.cache_resource
+def score_data(_model, path, motor='supervisionado', versao=None):
+    """
+    Pontua o dataset de treino inteiro de uma vez (vetorizado), para a simulação apenas ler os resultados.
+    versao (hash do artefato e limiar de decisão) entra na chave: retreino ou recalibração pontuam de novo.
+    """
+    return score_dataframe(_model, load_training_data(path))
+
+
+def training_scores():
+    """Pontuações do dataset de treino com o motor e o modelo ativos."""
+    return score_data(detector, TRAINING_DATA, engine, scoring_version)
+
+
+def active_input():
+    """
+    Entrada do modelo para o dataset ativo (features na ordem do motor, com as
+    temporais se ele as usa), montada uma vez por dataset e motor e guardada
+    ao lado de active_scores; quem explica só fatia as linhas.
+    """
+    if st.session_state.active_input is None:
+        with METRICS.timed('reordenar_features'):
+            entrada = prepare_frame(st.session_state.active_df, detector.feature_names)[detector.feature_names]
+        st.session_state.active_input = entrada
+    return st.session_state.active_input
+
+
+@st.cache_resource
+def metrics_server():
+    """
+    Sobe o endpoint /metrics (Prometheus) uma única vez por processo. Retorna a porta ou None.
+    Escuta só na máquina local; RED_QUEEN_METRICS_EXPOSE=1 expõe em todas as interfaces (ex.: coleta remota).
+    """
+    porta = int(os.environ.get("RED_QUEEN_METRICS_PORT", METRICS_PORT))
+    host = "0.0.0.0" if os.environ.get("RED_QUEEN_METRICS_EXPOSE") == "1" else METRICS_HOST
+    try:
+        start_metrics_server(porta, host)
+        return porta
+    except OSError:
+        return None  # Porta ocupada (ex.: outra réplica na mesma máquina)
+
+
+@st.cache_resource
+def alert_store():
+    """Registro de incidentes (SQLite) compartilhado por todas as sessões do processo."""
+    return AlertStore(os.environ.get("RED_QUEEN_ALERT_DB", ALERT_DB))
+
+
+@st.cache_resource
+def drift_baseline(path):
+    """Histogramas de referência (treino) do monitor de deriva, uma vez por processo."""
+    return DriftBaseline.from_frame(load_training_data(path))
+
+
+def drift_monitor(origem):
+    """Monitor de deriva da sessão para uma origem; a deriva registra uma solicitação de retreino."""
+    monitores = st.session_state.drift_monitors
+    if origem not in monitores:
+        monitores[origem] = DriftMonitor(drift_baseline(TRAINING_DATA),
+                                         on_drift=lambda relatorio: request_retraining(relatorio, origem))
+    return monitores[origem]
+
+
+def consume_live(ingestor):
+    """
+    Consome os micro-lotes já pontuados pelo ingestor: histórico, deriva e último
+    alerta. Roda a cada execução do painel, em qualquer visualização, para que a
+    fila do ingestor não encha e descarte micro-lotes fora da visualização Ao Vivo.
+    """
+    for seq, X, proba in ingestor.drain():
+        st.session_state.live_history.extend(X, np.arange(seq, seq + len(X)))
+        drift_monitor("Ao Vivo").update(X)
+        alertas = np.flatnonzero(proba > ingestor.threshold)
+        if len(alertas):
+            st.session_state.live_last_alert = (seq + alertas[-1], proba[alertas[-1]] * 100)
+
+
+@st.cache_resource
+def get_explanation_cache():
+    """Cache LRU de explicações compartilhado entre todas as sessões."""
+    return ExplanationCache()
+
+
+def explain(X):
+    """Explica as linhas de X (ordem das features do modelo) no modo escolhido, usando o cache."""
+    if engine == 'nao_supervisionado':
+        # Sem modelo de árvores: contribuição de cada sensor para a distância ao perfil normal
+        return detector.explain(X)
+    modo = EXPLAIN_MODE_LABELS[st.session_state.explain_mode]
+    # O SHAP precisa do explicador; os modos rápidos só do booster
+    necessario = 'explainer' if modo == 'shap' else 'model'
+    if warmup.get(necessario) is None:
+        with st.spinner("🔥 Carregando o explicador (xgboost/shap)..."):
+            warmup.wait(necessario)
+    return explain_rows(warmup.get('model'), X, get_explanation_cache(), modo, warmup.get('explainer'))
+
+
+def record_incidents(fechados, entrada, origem):
+    """
+    Grava os incidentes fechados com o fator principal da explicação do pico.
+    entrada: DataFrame com a entrada do modelo na leitura de pico de cada incidente (mesma ordem).
+    """
+    if not fechados:
+        return
+    fatores = [top_factor(e) for e in explain(entrada)]
+    alert_store().add([{**inc, 'fator_principal': fator} for inc, fator in zip(fechados, fatores)],
+                      origem=origem, motor=engine)
+
+
+def record_simulation_incidents(fechados):
+    """Incidentes da simulação: a entrada do pico vem do dataset ativo (pelo índice da leitura)."""
+    if fechados:
+        record_incidents(fechados, active_input().iloc[[inc['leitura_pico'] for inc in fechados]], "Simulação")
+
+
+def restart_incidents():
+    """Encerra (e grava) o incidente em andamento da simulação, antes de trocar ou reiniciar o dataset."""
+    record_simulation_incidents(st.session_state.incident_tracker.close_all())
+    st.session_state.tracked_index = None
+
+
+def waterfall_chart(explicacao):
+    """Gráfico de cascata nativo (Altair) das contribuições de cada sensor para o alerta."""
+    alt = REPORT.lazy_import('altair')
+    dados = waterfall_frame(explicacao)
+    escala = 'distância²' if engine == 'nao_supervisionado' else 'log-odds'
+    return alt.Chart(dados).mark_bar().encode(
+        y=alt.Y('Sensor:N', sort=None, title=None),
+        x=alt.X('Início:Q', title=f'Contribuição acumulada ({escala})', scale=alt.Scale(zero=False)),
+        x2='Fim:Q',
+        color=alt.Color('Direção:N', scale=alt.Scale(domain=['Aumenta o risco', 'Reduz o risco'],
+                                                     range=['#d62728', '#1f77b4'])),
+        tooltip=['Sensor', alt.Tooltip('Contribuição:Q', format='+.3f')],
+    )
+
 
 # LÓGICA DA INTERFACE E APLICAÇÃO
 
-# Título e introdução do painel
+# Título e introdução do painel (desenhados antes de qualquer carga pesada)
 st.title("🚨 Red Queen: Painel de Controle de Ameaças Biológicas")
 st.markdown("Use os controles na barra lateral para rodar a simulação ou envie um novo dataset para análise.")
+REPORT.mark("primeira_pintura")
+
+# PREPARAÇÃO DE DADOS E TREINAMENTO
+# Carrega o dataset original já enriquecido com a anomalia silenciosa (compartilhado entre sessões)
+with REPORT.measure("load_data"):
+    df_enriquecido = load_training_data(TRAINING_DATA)
+
+# Carrega (ou treina) o modelo especialista e o explicador SHAP em segundo plano;
+# só o motor compilado é necessário para começar a pontuar
+warmup = start_warmup(df_enriquecido)
+# Outro artefato foi promovido (retreino após deriva): aquece de novo e descarta
+# as pontuações e explicações do modelo anterior
+if promoted_hash() != warmup.wait('promoted'):
+    with st.spinner("🔁 Novo modelo promovido: recarregando..."):
+        try:
+            warmup.wait('explainer')  # Termina o aquecimento anterior: importar o shap em duas threads falha
+        except Exception:
+            pass  # Um erro no aquecimento anterior não impede o recarregamento
+    start_warmup.clear()
+    score_data.clear()
+    get_explanation_cache.clear()
+    warmup = start_warmup(df_enriquecido)
+scorer = warmup.get('scorer')
+if scorer is None:
+    with st.spinner("🔥 Aquecendo a Red Queen: carregando o modelo..."):
+        scorer = warmup.wait('scorer')
+
+# Endpoint de métricas do processo
+metrics_port = metrics_server()
 
 # Inicialização do estado da sessão
 
 # Índice atual da linha sendo analisada
 if 'current_index' not in st.session_state: st.session_state.current_index = 0
-# Histórico dos dados analisados
-if 'data_history' not in st.session_state: st.session_state.data_history = pd.DataFrame()
+# Histórico dos dados analisados (buffer circular com as últimas leituras de cada sensor)
+if 'data_history' not in st.session_state:
+    st.session_state.data_history = SensorHistory(EXPECTED_COLUMNS, DEFAULT_WINDOW)
 # Estado da simulação (ativa ou pausada)
 if 'running' not in st.session_state: st.session_state.running = False
 
 # Dataset ativo (default = enriquecido com anomalia reforçada)
 if 'active_df' not in st.session_state:
     st.session_state.active_df = df_enriquecido
+# Entrada do modelo para o dataset ativo (montada sob demanda por active_input)
+if 'active_input' not in st.session_state: st.session_state.active_input = None
+# Motor de detecção: supervisionado, não supervisionado ou os dois em conjunto
+if 'engine' not in st.session_state: st.session_state.engine = "Supervisionado (XGBoost)"
+engine = ENGINE_LABELS[st.session_state.engine]
+detector = detection_model(engine)
+# Versão do modelo que pontua: artefato e limiar de decisão (mudam com retreino ou recalibração)
+scoring_version = (warmup.get('metadata', {}).get('data_hash'), decision_threshold(scorer))
+# Pontuações pré-calculadas do dataset ativo (lidas pela simulação e pela análise em lote),
+# refeitas quando o motor ou a versão do modelo mudam
+if st.session_state.get('scored_engine') != (engine, scoring_version):
+    if st.session_state.active_df is df_enriquecido:
+        st.session_state.active_scores = training_scores()
+    else:
+        st.session_state.active_scores = score_dataframe(detector, st.session_state.active_df)
+    st.session_state.active_input = None
+    st.session_state.scored_engine = (engine, scoring_version)
+# Incidentes da simulação (leituras em alerta consecutivas agrupadas, com histerese)
+if 'incident_tracker' not in st.session_state:
+    st.session_state.incident_tracker = IncidentTracker(["Simulação"])
+# Limiar do motor ativo (o calibrado no artefato, se houver); a liberação acompanha
+st.session_state.incident_tracker.threshold = decision_threshold(detector)
+# Última leitura já contada no incidente (reruns da mesma leitura não contam de novo)
+if 'tracked_index' not in st.session_state: st.session_state.tracked_index = None
+# Relógio da simulação e taxa de atualização dos painéis ao vivo (leituras/ticks por segundo)
+if 'tick_rate' not in st.session_state: st.session_state.tick_rate = DEFAULT_RATE
+if 'sim_clock' not in st.session_state: st.session_state.sim_clock = SimulationClock(st.session_state.tick_rate)
+# Modo de explicação da causa raiz
+if 'explain_mode' not in st.session_state: st.session_state.explain_mode = "SHAP (TreeExplainer)"
+# Visualização ativa: simulação linha a linha, análise em lote ou fonte ao vivo
+if 'view' not in st.session_state: st.session_state.view = "Simulação"
+# Fonte ao vivo conectada (ingestor em threads), seu histórico e o último alerta recebido
+if 'live_ingestor' not in st.session_state: st.session_state.live_ingestor = None
+if 'live_history' not in st.session_state:
+    st.session_state.live_history = SensorHistory(EXPECTED_COLUMNS, DEFAULT_WINDOW)
+if 'live_last_alert' not in st.session_state: st.session_state.live_last_alert = None
+# Monitores de deriva por origem (Simulação, Ao Vivo): só histogramas, nenhuma leitura bruta
+if 'drift_monitors' not in st.session_state: st.session_state.drift_monitors = {}
+# Monitoramento de várias salas (estado compacto por sala; dados e modelo compartilhados)
+if 'multi_monitor' not in st.session_state: st.session_state.multi_monitor = None
+if 'multi_running' not in st.session_state: st.session_state.multi_running = False
+if 'multi_clock' not in st.session_state: st.session_state.multi_clock = SimulationClock(st.session_state.tick_rate)
+
+# Fonte ao vivo conectada: consome o que já foi pontuado, qualquer que seja a visualização
+if st.session_state.live_ingestor is not None:
+    consume_live(st.session_state.live_ingestor)
 
 # SIDEBAR: Upload, Sobre, e Controles da Simulação
 
@@ -107,28 +365,40 @@ with st.sidebar:
         **Funcionalidades:**
         - **Simulação Ativa:** Acompanhe os dados de exemplo sendo analisados em tempo real.
         - **Análise de Novos Datasets:** Envie seu próprio arquivo CSV para que a Red Queen o analise.
+        - **Análise em Lote:** Pontua o arquivo inteiro de uma vez e lista apenas as leituras anômalas.
+        - **Fonte ao Vivo:** Conecta a um socket TCP/UNIX ou acompanha um arquivo e pontua as leituras em micro-lotes.
+        - **Motor Não Supervisionado:** Um segundo detector aprende só o perfil normal dos sensores e pode rodar sozinho ou em conjunto com o XGBoost.
+        - **Incidentes:** Leituras em alerta consecutivas viram um único incidente (com histerese), gravado com o fator principal em um histórico consultável.
         - **Análise de Causa Raiz:** Quando uma anomalia é detectada, um modelo SHAP explica os fatores que levaram ao alerta.
         """)
 
 # Upload de novos dados CSV para análise
 with st.sidebar:
     st.header("Analisar Novo Dataset")
-    uploaded_file = st.file_uploader("Escolha um arquivo CSV para simulação", type="csv")
+    uploaded_file = st.file_uploader("Escolha um arquivo CSV ou Parquet para simulação",
+                                     type=["csv", "parquet", "arrow", "feather"])
 
-    # Botão para simular com novo arquivo enviado
-    if st.button("Simulação com Novo Dataset", type="primary"):
+    # Botões para simular ou analisar em lote o novo arquivo enviado
+    simular_novo = st.button("Simulação com Novo Dataset", type="primary")
+    analisar_lote = st.button("Análise em Lote 📊")
+    if simular_novo or analisar_lote:
         if uploaded_file is not None:
             try:
-                new_df = pd.read_csv(uploaded_file)
+                new_df = read_dataset(uploaded_file)
                 # Verificação se o arquivo possui as colunas esperadas
-                expected_columns = ['T_Virus_Level', 'Room_Temperature', 'Humidity', 'Gas_Leak_Level',
-                                    'Security_Clearance', 'AI_Override_Attempts', 'Proximity_To_Core']
-                if all(col in new_df.columns for col in expected_columns):
+                if all(col in new_df.columns for col in EXPECTED_COLUMNS):
+                    # Pontua o arquivo inteiro uma única vez (em blocos), com barra de progresso
+                    barra = st.progress(0.0, text="Pontuando o dataset...")
+                    scores_novos = score_dataframe(detector, new_df, progress=barra.progress)
+                    restart_incidents()
+                    st.session_state.active_scores = scores_novos
+                    st.session_state.active_input = None
                     # Troca o dataset ativo e reinicia simulação
                     st.session_state.active_df = new_df
                     st.session_state.current_index = 0
-                    st.session_state.data_history = pd.DataFrame()
-                    st.session_state.running = True
+                    st.session_state.data_history.clear()
+                    st.session_state.running = simular_novo
+                    st.session_state.view = "Simulação" if simular_novo else "Análise em Lote"
                     st.rerun()
                 else:
                     st.error("O arquivo enviado não contém as colunas esperadas.")
@@ -141,108 +411,460 @@ with st.sidebar:
     st.divider()
     st.header("Controles da Simulação Ativa")
     if st.button("Inicia Dataset de Treino ⏯️"):
+        restart_incidents()
         st.session_state.active_df = df_enriquecido
+        st.session_state.active_scores = training_scores()
+        st.session_state.active_input = None
+        st.session_state.view = "Simulação"
         st.session_state.running = True
         st.rerun()
+    # Tamanho da janela do histórico (memória por sessão fica constante)
+    history_window = st.number_input("Janela do histórico (leituras)", min_value=10, max_value=10_000,
+                                     value=DEFAULT_WINDOW, step=10)
+    if history_window != st.session_state.data_history.capacity:
+        st.session_state.data_history = st.session_state.data_history.resized(history_window)
+    # Leituras por segundo na simulação (e ticks por segundo nas salas); os quadros são limitados a 20 por segundo
+    st.slider("Velocidade (leituras/s)", min_value=1.0, max_value=MAX_RATE, step=1.0, key="tick_rate")
+    if st.session_state.sim_clock.rate != st.session_state.tick_rate:
+        st.session_state.sim_clock.set_rate(st.session_state.tick_rate)
+        st.session_state.multi_clock.set_rate(st.session_state.tick_rate)
+    # Só a abertura de um incidente pausa a simulação (as leituras seguintes do mesmo incidente, não)
+    st.toggle("Pausar a cada novo incidente", value=True, key="pause_on_incident")
     if st.button("Pausar Simulação ⏸️"):
         st.session_state.running = False
         st.rerun()
     if st.button("Resetar Simulação 🔄"):
+        restart_incidents()
         st.session_state.active_df = df_enriquecido
+        st.session_state.active_scores = training_scores()
+        st.session_state.active_input = None
         st.session_state.current_index = 0
-        st.session_state.data_history = pd.DataFrame()
+        st.session_state.data_history.clear()
         st.session_state.running = False
         st.rerun()
 
+    # Fonte ao vivo: socket TCP/UNIX ou arquivo acompanhado (tail -f)
+    st.divider()
+    st.header("Fonte ao Vivo")
+    live_uri = st.text_input("Endereço da fonte", value="tcp://127.0.0.1:9999",
+                             help="tcp://host:porta, unix:///caminho ou caminho de um arquivo. "
+                                  "Para testar: python streaming.py replay --rate 20")
+    if st.button("Conectar 📡"):
+        if st.session_state.live_ingestor is not None:
+            st.session_state.live_ingestor.stop()
+        st.session_state.live_ingestor = StreamIngestor(detector, live_uri).start()
+        st.session_state.live_history.clear()
+        st.session_state.live_last_alert = None
+        st.session_state.running = False
+        st.session_state.view = "Ao Vivo"
+        st.rerun()
+    if st.button("Desconectar"):
+        if st.session_state.live_ingestor is not None:
+            st.session_state.live_ingestor.stop()
+        st.session_state.live_ingestor = None
+        st.rerun()
+    if st.session_state.live_ingestor is not None and st.session_state.live_ingestor.stats['lotes_perdidos']:
+        st.caption(f"⚠️ {st.session_state.live_ingestor.stats['perdidas']:,} leituras ao vivo não chegaram ao painel")
+
+    # Várias salas/instalações: um único modelo, uma previsão em lote por tick para todas as salas
+    st.divider()
+    st.header("Várias Salas")
+    n_salas = st.number_input("Salas monitoradas", min_value=1, max_value=1000, value=12, step=1)
+    if st.button("Monitorar Salas 🏢"):
+        st.session_state.multi_monitor = staggered_rooms(detector, training_matrix(TRAINING_DATA), n_salas)
+        st.session_state.multi_running = True
+        st.session_state.running = False
+        st.session_state.view = "Multi-Salas"
+        st.rerun()
+    if st.button("Pausar Salas ⏸️"):
+        st.session_state.multi_running = False
+        st.rerun()
+
+    # Motor de detecção (vale para a simulação, o lote, a fonte ao vivo e as salas iniciadas depois da troca)
+    st.divider()
+    st.radio("Motor de detecção", list(ENGINE_LABELS), key="engine",
+             help="O não supervisionado aprende só o perfil normal dos sensores, sem rótulos de anomalia.")
+    if TEMPORAL_WINDOW:
+        st.caption(f"Features temporais (janela de {TEMPORAL_WINDOW} leituras). O dataset sintético de treino tem "
+                   "as linhas embaralhadas, então no treino essas features não carregam ordem no tempo.")
+    # Calibrado só se o artefato tiver o limiar gravado por calibration.py (o conjunto usa o do supervisionado)
+    calibrado = engine != 'nao_supervisionado' and 'decision_threshold' in warmup.get('metadata', {})
+    st.caption(f"Limiar de decisão: {decision_threshold(detector):.3f}" + (" (calibrado)" if calibrado else ""))
+
+    # Modo de atribuição da causa raiz (os modos rápidos evitam o SHAP em taxas altas de alerta)
+    st.radio("Modo de explicação", list(EXPLAIN_MODE_LABELS), key="explain_mode",
+             disabled=engine == 'nao_supervisionado')
+
+    # Métricas do caminho crítico (mesmos dados do endpoint /metrics)
+    st.divider()
+    with st.expander("📈 Métricas de Desempenho"):
+        if metrics_port:
+            st.caption(f"Prometheus: http://localhost:{metrics_port}/metrics")
+        met_linhas, met_alertas = st.columns(2)
+        met_linhas.metric("Linhas pontuadas", f"{METRICS.counters.get('linhas_pontuadas', 0):,}")
+        met_alertas.metric("Taxa de alerta", f"{METRICS.alert_rate() * 100:.2f}%")
+        st.dataframe(pd.DataFrame(METRICS.summary()), hide_index=True, use_container_width=True)
+
+        # Perfil cProfile desta sessão; para amostragem sem overhead, use py-spy no PID do processo
+        if 'profiler' not in st.session_state: st.session_state.profiler = None
+        if st.toggle("Perfilar esta sessão (cProfile)", key="profiling"):
+            if st.session_state.profiler is None:
+                st.session_state.profiler = SessionProfiler()
+                st.session_state.profiler.enable()
+            st.caption(f"Amostragem externa: py-spy record --pid {os.getpid()}")
+            if st.button("Gerar relatório do perfil"):
+                st.session_state.profiler.disable()
+                st.code(st.session_state.profiler.report())
+                st.download_button("Baixar perfil (.prof)", st.session_state.profiler.dump(),
+                                   file_name="red_queen.prof")
+        elif st.session_state.profiler is not None:
+            st.session_state.profiler.disable()
+
+    # Tempos de inicialização do processo (importações, modelo, explicador e primeira pintura)
+    with st.expander("⏱️ Inicialização"):
+        st.caption("Explicador: " + ("pronto ✅" if warmup.get('explainer') is not None else "aquecendo 🔥"))
+        st.dataframe(pd.DataFrame(REPORT.rows()), hide_index=True, use_container_width=True)
+
+    # Alterna entre a simulação, a análise em lote (ambas leem as pontuações pré-calculadas) e a fonte ao vivo
+    st.divider()
+    st.radio("Visualização", ["Simulação", "Análise em Lote", "Ao Vivo", "Multi-Salas", "Incidentes", "Deriva"],
+             key="view")
+
+
+# --- ANÁLISE EM LOTE ---
+if st.session_state.view == "Análise em Lote":
+    st.header("Resultado da Análise em Lote")
+    scores = st.session_state.active_scores
+    resumo = summarize_scores(scores)
+
+    # Leituras em alerta consecutivas agrupadas em incidentes (mesma histerese da simulação)
+    incidentes = find_incidents(scores['Confidence'].to_numpy() / 100, decision_threshold(detector))
+
+    met1, met2, met3, met4 = st.columns(4)
+    met1.metric("Leituras analisadas", f"{resumo['total']:,}")
+    met2.metric("Anomalias detectadas", f"{resumo['anomalias']:,}")
+    met3.metric("Taxa de anomalias", f"{resumo['taxa']:.2f}%")
+    met4.metric("Incidentes", f"{len(incidentes):,}")
+
+    # Tabela filtrada somente com as leituras anômalas, da maior para a menor confiança
+    anomalias = scores['Prediction'] == 1
+    tabela = st.session_state.active_df[anomalias].assign(Confianca=scores.loc[anomalias, 'Confidence'])
+    # Explica todas as leituras anômalas em uma única chamada vetorizada
+    if len(tabela):
+        explicacoes = explain(active_input()[anomalias])
+        tabela['Fator_Principal'] = [top_factor(e) for e in explicacoes]
+    st.subheader("Leituras Anômalas")
+    st.dataframe(tabela.sort_values('Confianca', ascending=False), use_container_width=True)
+    st.subheader("Incidentes")
+    st.dataframe(incidentes.sort_values('pico_confianca', ascending=False), hide_index=True, use_container_width=True)
+    st.stop()
+
+
+# --- MONITORAMENTO AO VIVO ---
+if st.session_state.view == "Ao Vivo":
+    st.header("Monitoramento Ao Vivo")
+    ingestor = st.session_state.live_ingestor
+    if ingestor is None:
+        st.info("Conecte uma fonte ao vivo na barra lateral.")
+        st.stop()
+
+    # Enquanto a fonte estiver conectada, só o painel é redesenhado a cada LIVE_MIN_REFRESH,
+    # com os micro-lotes que chegaram desde o último quadro
+    polling = ingestor.running
+
+    @st.fragment(run_every=LIVE_MIN_REFRESH if polling else None)
+    def live_panel():
+        if polling and not ingestor.running:
+            # A fonte encerrou: redesenha o app inteiro para parar o relógio do fragmento
+            st.rerun()
+        # Consome os micro-lotes já pontuados pelo ingestor
+        consume_live(ingestor)
+        live_history = st.session_state.live_history
+
+        live_col1, live_col2 = st.columns([3, 1])
+        with live_col2:
+            st.subheader("Status da Fonte")
+            if ingestor.error:
+                st.error(f"Erro na fonte: {ingestor.error}")
+            elif ingestor.running:
+                st.success(f"📡 Conectado a {ingestor.uri}")
+            else:
+                st.warning("Fonte encerrada.")
+            if st.session_state.live_last_alert is not None:
+                indice_alerta, confianca_alerta = st.session_state.live_last_alert
+                st.error(f"🚨 Último alerta: leitura {indice_alerta}\n\nConfiança: {confianca_alerta:.2f}%")
+            st.metric("Leituras pontuadas", f"{ingestor.stats['pontuadas']:,}")
+            st.metric("Anomalias", f"{ingestor.stats['anomalias']:,}")
+            st.metric("Micro-lotes", f"{ingestor.stats['micro_lotes']:,}")
+            st.metric("Descartadas / erros", f"{ingestor.stats['descartadas']} / {ingestor.stats['erros_de_parse']}")
+            if ingestor.stats['lotes_perdidos']:
+                st.warning(f"⚠️ {ingestor.stats['perdidas']:,} leituras pontuadas não chegaram ao painel "
+                           f"({ingestor.stats['lotes_perdidos']:,} micro-lotes, "
+                           f"{ingestor.stats['anomalias_perdidas']:,} anomalias)")
+
+        with live_col1:
+            st.subheader("Histórico de Sensores Críticos")
+            live_chart1, live_chart2 = st.columns(2)
+            with live_chart1:
+                st.subheader("Nível do T-Virus")
+                st.line_chart(live_history.series('T_Virus_Level'))
+                st.subheader("Umidade")
+                st.line_chart(live_history.series('Humidity'))
+            with live_chart2:
+                st.subheader("Temperatura da Sala")
+                st.line_chart(live_history.series('Room_Temperature'))
+                st.subheader("Nível de Vazamento de Gás")
+                st.line_chart(live_history.series('Gas_Leak_Level'))
+
+    live_panel()
+    st.stop()
+
+
+# --- MONITORAMENTO DE VÁRIAS SALAS ---
+if st.session_state.view == "Multi-Salas":
+    st.header("Monitoramento de Várias Salas")
+    monitor = st.session_state.multi_monitor
+    if monitor is None:
+        st.info("Inicie o monitoramento de várias salas na barra lateral.")
+        st.stop()
+
+    # As salas avançam 'Velocidade' ticks por segundo; só o painel das salas é redesenhado
+    multi_clock = st.session_state.multi_clock
+    if st.session_state.multi_running and not multi_clock.running:
+        multi_clock.start()
+    elif not st.session_state.multi_running:
+        multi_clock.stop()
+
+    @st.fragment(run_every=multi_clock.refresh_interval() if st.session_state.multi_running else None)
+    def multi_panel():
+        # Uma única previsão em lote para todas as salas por tick (os ticks que o relógio liberou)
+        for _ in range(multi_clock.take(limit=MULTI_MAX_CATCHUP)):
+            monitor.tick()
+        fechados = monitor.pop_closed()
+        if fechados:
+            entrada = pd.DataFrame([inc['entrada'] for inc in fechados], columns=monitor.features.feature_names)
+            record_incidents(fechados, entrada, "Multi-Salas")
+        tabela = monitor.table()
+
+        met1, met2, met3 = st.columns(3)
+        met1.metric("Salas monitoradas", f"{len(monitor.streams):,}")
+        met2.metric("Salas com incidente aberto", f"{int(tabela['Incidente_Aberto'].sum()):,}")
+        met3.metric("Incidentes desde o início", f"{int(tabela['Incidentes'].sum()):,}")
+        st.dataframe(tabela, hide_index=True, use_container_width=True)
+
+        # Detalhes de uma sala: histórico próprio e causa raiz do último alerta
+        sala = monitor.streams[monitor.names.index(st.selectbox("Detalhes da sala", tabela['Sala']))]
+        sala_col1, sala_col2 = st.columns(2)
+        with sala_col1:
+            st.subheader("Nível do T-Virus")
+            st.line_chart(sala.series('T_Virus_Level'))
+        with sala_col2:
+            st.subheader("Temperatura da Sala")
+            st.line_chart(sala.series('Room_Temperature'))
+        if sala.last_alert is not None:
+            indice_alerta, confianca_alerta = sala.last_alert
+            st.error(f"🚨 Último alerta em {sala.nome}: leitura {indice_alerta}\n\nConfiança: {confianca_alerta:.2f}%")
+            explicacao = explain(monitor.alert_input(sala))[0]
+            st.altair_chart(waterfall_chart(explicacao), use_container_width=True)
+
+    multi_panel()
+    st.stop()
+
+
+# --- HISTÓRICO DE INCIDENTES ---
+if st.session_state.view == "Incidentes":
+    st.header("Histórico de Incidentes")
+    store = alert_store()
+    # Filtros pelos campos indexados (horário, instalação e fator principal)
+    filtro1, filtro2, filtro3 = st.columns(3)
+    periodo = filtro1.selectbox("Período", list(INCIDENT_PERIODS))
+    instalacao = filtro2.selectbox("Instalação", ["Todas"] + store.distinct('instalacao'))
+    fator = filtro3.selectbox("Fator principal", ["Todos"] + store.distinct('fator_principal'))
+    filtros = {
+        'instalacao': None if instalacao == "Todas" else instalacao,
+        'fator': None if fator == "Todos" else fator,
+        'desde': None if INCIDENT_PERIODS[periodo] is None else time.time() - INCIDENT_PERIODS[periodo],
+    }
+
+    por_fator = store.count_by('fator_principal', **filtros)
+    st.metric("Incidentes no período", f"{int(por_fator['incidentes'].sum()):,}")
+    if len(por_fator):
+        st.subheader("Incidentes por fator principal")
+        st.bar_chart(por_fator.set_index('fator_principal'))
+    st.subheader("Incidentes mais recentes")
+    st.dataframe(store.query(**filtros), hide_index=True, use_container_width=True)
+    st.stop()
+
+
+# --- DERIVA DOS SENSORES ---
+if st.session_state.view == "Deriva":
+    st.header("Deriva dos Sensores")
+    st.caption("Distribuição de cada sensor na janela recente comparada à do dataset de treino (PSI e KS por "
+               "histograma de decis do treino; nenhuma leitura bruta é guardada).")
+    modelo_em_uso = warmup.get('metadata', {}).get('data_hash', '')[:16]
+    st.caption(f"Modelo em uso: `{modelo_em_uso}`" +
+               (" (promovido após retreino)" if warmup.get('promoted') else " (dados de treino)"))
+    origem = st.selectbox("Origem das leituras", ["Simulação", "Ao Vivo"])
+    monitor = drift_monitor(origem)
+
+    pedido = pending_retraining()
+    if pedido is not None:
+        quando = time.strftime('%d/%m %H:%M:%S', time.localtime(pedido['solicitado_em']))
+        st.warning(f"🔁 Retreino solicitado em {quando} ({pedido['origem']}): deriva em "
+                   f"{', '.join(pedido['sensores'])}. Com dados rotulados recentes: "
+                   f"`python incremental_training.py continuar novos_rotulados.csv --promover` "
+                   f"(o painel recarrega o modelo promovido sozinho)")
+        if st.button("Descartar solicitação"):
+            clear_retraining()
+            st.rerun()
+
+    drift1, drift2, drift3 = st.columns(3)
+    drift1.metric("Leituras na janela", f"{monitor.window.n:,}")
+    drift2.metric("Sensores em deriva", int((monitor.status == 2).sum()))
+    drift3.metric("Disparos de retreino", monitor.triggers)
+    if monitor.window.n < monitor.min_readings:
+        st.info(f"Aguardando {monitor.min_readings:,} leituras na janela para pontuar a deriva.")
+    else:
+        st.dataframe(monitor.report(), hide_index=True, use_container_width=True,
+                     column_config={'PSI': st.column_config.NumberColumn(format="%.4f"),
+                                    'KS': st.column_config.NumberColumn(format="%.4f")})
+        sensor = st.selectbox("Sensor", monitor.baseline.columns)
+        st.bar_chart(monitor.distributions(sensor), stack=False)
+    st.stop()
+
 
 # --- PAINEL PRINCIPAL ---
 st.header("Resultado da Simulação")
-col1, col2 = st.columns([3, 1])
 
 # Pega o dataset ativo (pode ser o original ou o enviado)
 active_dataframe = st.session_state.active_df
+feature_names = detector.feature_names
 
 # Se passar do fim do dataset, volta ao início
 if st.session_state.current_index >= len(active_dataframe):
     st.session_state.current_index = 0
 
-# Captura a linha atual
-current_data_row = active_dataframe.iloc[[st.session_state.current_index]]
-X_current = current_data_row.drop('Anomaly', axis=1, errors='ignore')
-
-# Realiza a previsão da IA
-if model:
-    feature_names = model.get_booster().feature_names
-    X_current = X_current[feature_names]
-    prediction = model.predict(X_current)[0]
-else:
-    prediction = 0
-
-# Armazena a linha no histórico
-st.session_state.data_history = pd.concat([st.session_state.data_history, current_data_row])
-
-# COLUNA 2: STATUS DA SIMULAÇÃO
-with col2:
-    st.subheader("Status da Simulação")
-    status_placeholder = st.empty()
-    if prediction == 0:
-        status_placeholder.success(f"✅ SEGURO (Índice: {st.session_state.current_index})")
-    else:
-        # Em caso de anomalia, pausa a simulação
+# O relógio segue os controles da barra lateral (iniciar, pausar, continuar)
+clock = st.session_state.sim_clock
+if st.session_state.running and not clock.running:
+    clock.start()
+elif not st.session_state.running and clock.running:
+    clock.stop()
+
+
+def advance_simulation():
+    """
+    Processa as leituras que passaram desde o último quadro (histórico e
+    incidentes), uma vez por leitura. Se um incidente abrir, para nessa leitura.
+    Retorna True se a simulação pausou.
+    """
+    n = len(active_dataframe)
+    indice = st.session_state.current_index
+    # A leitura atual ainda não contada (início, reset ou continuar) e as que o relógio liberou
+    indices = [indice] if st.session_state.tracked_index != indice else []
+    indices += [(indice + k) % n for k in range(1, clock.take() + 1)]
+    if not indices:
+        return False
+
+    tracker = st.session_state.incident_tracker
+    proba = st.session_state.active_scores['Confidence'].to_numpy()
+    fechados, processadas, pausou = [], [], False
+    for i in indices:
+        fechados += tracker.update([proba[i] / 100], [i])
+        processadas.append(i)
+        if tracker.opened[0] and st.session_state.pause_on_incident:
+            pausou = True
+            break
+    record_simulation_incidents(fechados)
+
+    # Histórico: ao dar a volta no dataset, recomeça (só as leituras depois da volta entram)
+    voltas = [j for j, i in enumerate(processadas) if i == 0 and (j > 0 or indice != 0)]
+    if voltas:
+        st.session_state.data_history.clear()
+        processadas = processadas[voltas[-1]:]
+    with METRICS.timed('iloc'):
+        valores = active_dataframe[EXPECTED_COLUMNS].iloc[processadas].to_numpy(dtype=np.float64)
+    st.session_state.data_history.extend(valores, active_dataframe.index[processadas])
+    drift_monitor("Simulação").update(valores)
+
+    st.session_state.current_index = st.session_state.tracked_index = processadas[-1]
+    if pausou:
         st.session_state.running = False
-        prediction_proba = model.predict_proba(X_current)[0]
-        probability_of_anomaly = prediction_proba[1] * 100
-        status_placeholder.error(
-            f"🚨 ALERTA DE ANOMALIA! (Índice: {st.session_state.current_index})\n\nConfiança: {probability_of_anomaly:.2f}%")
-        # Botão para seguir após alerta
-        if st.button("Continuar Simulação ➡️"):
-            st.session_state.current_index += 1
-            st.session_state.running = True
-            st.rerun()
+        clock.stop()
+    return pausou
 
-# COLUNA 1: DADOS E HISTÓRICO DOS SENSORES
-with col1:
-    st.subheader("Leituras Atuais dos Sensores")
-    st.dataframe(current_data_row, use_container_width=True)
-    st.header("Histórico de Sensores Críticos")
-    chart_col1, chart_col2 = st.columns(2)
-
-    # Gráficos de linha com últimos valores
-    with chart_col1:
-        st.subheader("Nível do T-Virus")
-        st.line_chart(st.session_state.data_history['T_Virus_Level'].tail(100))
-        st.subheader("Umidade")
-        st.line_chart(st.session_state.data_history['Humidity'].tail(100))
-    with chart_col2:
-        st.subheader("Temperatura da Sala")
-        st.line_chart(st.session_state.data_history['Room_Temperature'].tail(100))
-        st.subheader("Nível de Vazamento de Gás")
-        st.line_chart(st.session_state.data_history['Gas_Leak_Level'].tail(100))
-
-    # Se for anomalia, mostra explicação com SHAP
-    if prediction == 1 and explainer is not None:
-        st.header("Análise da Causa Raiz (SHAP)")
-
-        # O waterfall_plot é mais fácil de ler para uma única previsão
-        shap_values_obj = explainer(X_current)
-
-        # Precisamos criar uma figura Matplotlib para exibir no Streamlit
-        plt.figure(figsize=(10, 6))
-        shap.waterfall_plot(shap_values_obj[0], show=False)
-        st.pyplot(plt.gcf())
-        plt.clf()  # Limpa a figura para a próxima execução
-
-# CONTROLE DO LOOP AUTOMÁTICO
-if st.session_state.running:
-
-    # Avança para a próxima linha a cada segundo
-    st.session_state.current_index = (st.session_state.current_index + 1) % len(active_dataframe)
-
-    # Zera o histórico ao reiniciar
-    if st.session_state.current_index == 0:
-        st.session_state.data_history = pd.DataFrame()
-
-    # Espera 1 segundo e reinicia a interface
-    time.sleep(1)
-    st.rerun()
 
+# Só este trecho é redesenhado a cada quadro (status, leitura atual e gráficos), na taxa
+# configurada; a barra lateral e o restante do script não rodam de novo
+@st.fragment(run_every=clock.refresh_interval() if st.session_state.running else None)
+def simulation_panel():
+    METRICS.inc('ticks')
+    if advance_simulation():
+        # Um incidente abriu: redesenha o app inteiro para parar o relógio do fragmento
+        st.rerun()
+    indice = st.session_state.current_index
+    current_data_row = active_dataframe.iloc[[indice]]
+
+    # Lê a previsão da IA já calculada em lote para o dataset ativo
+    with METRICS.timed('predicao'):
+        prediction = st.session_state.active_scores['Prediction'].iat[indice]
+    tracker = st.session_state.incident_tracker
+    incidente = tracker.open_incident()
+    col1, col2 = st.columns([3, 1])
+
+    # COLUNA 2: STATUS DA SIMULAÇÃO
+    with col2:
+        st.subheader("Status da Simulação")
+        if prediction == 0:
+            st.success(f"✅ SEGURO (Índice: {indice})")
+        else:
+            probability_of_anomaly = st.session_state.active_scores['Confidence'].iat[indice]
+            st.error(f"🚨 ALERTA DE ANOMALIA! (Índice: {indice})\n\nConfiança: {probability_of_anomaly:.2f}%")
+        if incidente is not None:
+            st.warning(f"Incidente em andamento desde a leitura {incidente['leitura_inicio']}: "
+                       f"{incidente['alertas']} leituras em alerta, pico de {incidente['pico_confianca']:.2f}%. "
+                       f"Encerra após {tracker.cooldown} leituras calmas seguidas.")
+            # Botão para seguir após a pausa na abertura do incidente
+            if not st.session_state.running and st.button("Continuar Simulação ➡️"):
+                st.session_state.current_index = (indice + 1) % len(active_dataframe)
+                st.session_state.running = True
+                st.rerun()
+
+    # COLUNA 1: DADOS E HISTÓRICO DOS SENSORES
+    with col1:
+        st.subheader("Leituras Atuais dos Sensores")
+        st.dataframe(current_data_row, use_container_width=True)
+        st.header("Histórico de Sensores Críticos")
+        chart_col1, chart_col2 = st.columns(2)
+
+        # Gráficos de linha com últimos valores (visões sem cópia do buffer circular)
+        with METRICS.timed('graficos'):
+            with chart_col1:
+                st.subheader("Nível do T-Virus")
+                st.line_chart(st.session_state.data_history.series('T_Virus_Level'))
+                st.subheader("Umidade")
+                st.line_chart(st.session_state.data_history.series('Humidity'))
+            with chart_col2:
+                st.subheader("Temperatura da Sala")
+                st.line_chart(st.session_state.data_history.series('Room_Temperature'))
+                st.subheader("Nível de Vazamento de Gás")
+                st.line_chart(st.session_state.data_history.series('Gas_Leak_Level'))
+
+        # Se for anomalia, mostra explicação com SHAP
+        if prediction == 1:
+            st.header("Análise da Causa Raiz" + (" (Mahalanobis)" if engine == 'nao_supervisionado' else " (SHAP)"))
+
+            # Explica de uma vez as próximas linhas anômalas do dataset ativo (uma chamada vetorizada);
+            # os próximos alertas e os quadros desta mesma linha saem direto do cache
+            sinalizadas = np.flatnonzero(st.session_state.active_scores['Prediction'].to_numpy() == 1)
+            bloco = sinalizadas[sinalizadas >= indice][:EXPLAIN_BLOCK]
+            # Entrada do modelo já montada para o dataset ativo (com as features temporais, se o modelo as usa)
+            entrada = active_input()
+            explain(entrada.iloc[bloco])
+
+            # O gráfico de cascata é mais fácil de ler para uma única previsão
+            explicacao = explain(entrada.iloc[[indice]])[0]
+            st.altair_chart(waterfall_chart(explicacao), use_container_width=True)
+
+
+simulation_panel()
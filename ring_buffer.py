@@ -0,0 +1,151 @@
+# HISTÓRICO DE SENSORES EM BUFFER CIRCULAR
+# Substitui o pd.concat a cada tick (que copia todo o histórico) por um buffer
+# NumPy pré-alocado de capacidade fixa: append em O(1) e memória constante por sessão.
+# Para várias salas que avançam juntas, um único buffer (salas x colunas x janela)
+# recebe o tick inteiro de uma vez.
+
+import numpy as np                       # Buffers pré-alocados
+import pandas as pd                      # Séries para os gráficos
+
+# Tamanho padrão da janela (os gráficos mostram as últimas 100 leituras)
+DEFAULT_WINDOW = 100
+
+
+class SensorHistory:
+    """
+    Buffer circular com uma linha pré-alocada por coluna de sensor.
+
+    Cada leitura é gravada duas vezes (posição p e p + capacidade), de modo que
+    a janela das últimas leituras é sempre uma fatia contígua do buffer:
+    view() e series() devolvem visões sem cópia, na ordem cronológica.
+    """
+
+    def __init__(self, columns, capacity=DEFAULT_WINDOW):
+        self.columns = list(columns)
+        self.capacity = int(capacity)
+        self._col_idx = {col: i for i, col in enumerate(self.columns)}
+        self._values = np.full((len(self.columns), 2 * self.capacity), np.nan, dtype=np.float64)
+        self._index = np.zeros(2 * self.capacity, dtype=np.int64)   # Índice da linha de origem (eixo X dos gráficos)
+        self._pos = 0    # Próxima posição de escrita (0 .. capacidade - 1)
+        self._size = 0   # Quantidade de leituras válidas na janela
+
+    def __len__(self):
+        return self._size
+
+    def append(self, values, index=0):
+        """Adiciona uma leitura (valores na ordem de self.columns) em O(1)."""
+        p = self._pos
+        self._values[:, p] = values
+        self._values[:, p + self.capacity] = values
+        self._index[p] = index
+        self._index[p + self.capacity] = index
+        self._pos = (p + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, values, indices):
+        """Adiciona várias leituras (matriz n x colunas); apenas as últimas 'capacidade' são gravadas."""
+        for linha, idx in zip(values[-self.capacity:], indices[-self.capacity:]):
+            self.append(linha, idx)
+
+    def append_row(self, row_df):
+        """Adiciona a primeira linha de um DataFrame (ex.: active_df.iloc[[i]])."""
+        self.append(row_df[self.columns].to_numpy(dtype=np.float64)[0], index=row_df.index[0])
+
+    def clear(self):
+        """Esvazia o histórico sem realocar o buffer."""
+        self._pos = 0
+        self._size = 0
+
+    def _window(self):
+        fim = self._pos + self.capacity
+        return slice(fim - self._size, fim)
+
+    def view(self, column):
+        """Visão somente leitura (sem cópia) das últimas leituras de uma coluna."""
+        valores = self._values[self._col_idx[column], self._window()]
+        valores.flags.writeable = False
+        return valores
+
+    def index_view(self):
+        """Visão somente leitura (sem cópia) dos índices de origem das últimas leituras."""
+        indices = self._index[self._window()]
+        indices.flags.writeable = False
+        return indices
+
+    def series(self, column):
+        """Série pandas (sem cópia) de uma coluna, indexada pela linha de origem, pronta para st.line_chart."""
+        return pd.Series(self.view(column), index=self.index_view(), name=column, copy=False)
+
+    def resized(self, capacity):
+        """Retorna um novo histórico com outra capacidade, preservando as leituras mais recentes."""
+        novo = SensorHistory(self.columns, capacity)
+        n = min(self._size, novo.capacity)
+        if n:
+            janela = self._window()
+            valores = self._values[:, janela][:, -n:]
+            indices = self._index[janela][-n:]
+            novo._values[:, :n] = valores
+            novo._values[:, novo.capacity:novo.capacity + n] = valores
+            novo._index[:n] = indices
+            novo._index[novo.capacity:novo.capacity + n] = indices
+            novo._pos = n % novo.capacity
+            novo._size = n
+        return novo
+
+
+class MultiSensorHistory:
+    """
+    Buffers circulares de várias salas que avançam juntas, em um único array
+    (salas x colunas x 2·capacidade), com a mesma gravação dupla de SensorHistory:
+    append() grava uma leitura de cada sala em uma operação vetorizada, e a
+    janela de cada sala continua sendo uma fatia contígua (visões sem cópia).
+    """
+
+    def __init__(self, columns, capacity=DEFAULT_WINDOW):
+        self.columns = list(columns)
+        self.capacity = int(capacity)
+        self._col_idx = {col: i for i, col in enumerate(self.columns)}
+        self._values = np.full((0, len(self.columns), 2 * self.capacity), np.nan, dtype=np.float64)
+        self._index = np.zeros((0, 2 * self.capacity), dtype=np.int64)
+        self._sizes = np.zeros(0, dtype=np.int64)   # Leituras válidas na janela de cada sala
+        self._pos = 0                               # Próxima posição de escrita (comum a todas as salas)
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def add_stream(self):
+        """Acrescenta uma sala com histórico vazio."""
+        self._values = np.concatenate([self._values, np.full((1,) + self._values.shape[1:], np.nan)])
+        self._index = np.concatenate([self._index, np.zeros((1, 2 * self.capacity), dtype=np.int64)])
+        self._sizes = np.append(self._sizes, 0)
+        return len(self._sizes) - 1
+
+    def append(self, values, indices):
+        """Uma leitura por sala (matriz salas x colunas) e seus índices de origem, em O(salas) vetorizado."""
+        p = self._pos
+        self._values[:, :, p] = values
+        self._values[:, :, p + self.capacity] = values
+        self._index[:, p] = indices
+        self._index[:, p + self.capacity] = indices
+        self._pos = (p + 1) % self.capacity
+        np.minimum(self._sizes + 1, self.capacity, out=self._sizes)
+
+    def _window(self, sala):
+        fim = self._pos + self.capacity
+        return slice(fim - self._sizes[sala], fim)
+
+    def view(self, sala, column):
+        """Visão somente leitura (sem cópia) das últimas leituras de uma coluna de uma sala."""
+        valores = self._values[sala, self._col_idx[column], self._window(sala)]
+        valores.flags.writeable = False
+        return valores
+
+    def index_view(self, sala):
+        """Visão somente leitura (sem cópia) dos índices de origem das últimas leituras de uma sala."""
+        indices = self._index[sala, self._window(sala)]
+        indices.flags.writeable = False
+        return indices
+
+    def series(self, sala, column):
+        """Série pandas (sem cópia) de uma coluna de uma sala, pronta para st.line_chart."""
+        return pd.Series(self.view(sala, column), index=self.index_view(sala), name=column, copy=False)
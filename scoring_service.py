@@ -0,0 +1,320 @@
+# SERVIÇO DE PONTUAÇÃO HEADLESS DA RED QUEEN
+# Servidor HTTP assíncrono (asyncio, sem dependências extras) que carrega o
+# mesmo modelo do painel (por padrão no motor compilado, sem importar o
+# xgboost), agrupa as requisições concorrentes em micro-lotes dentro de um
+# orçamento de latência e faz um único predict_proba por micro-lote. Não
+# importa o Streamlit nem executa o código da interface.
+#
+#   python scoring_service.py --port 8500
+#   curl -X POST localhost:8500/score -d '{"readings": [{"T_Virus_Level": 95, ...}]}'
+#   curl -X POST localhost:8500/score -d '{"stream": "sala-07", "readings": [...]}'   (janelas temporais por fluxo)
+#   curl localhost:8500/stats
+#   curl localhost:8500/metrics   (formato Prometheus)
+
+import asyncio                           # Servidor e micro-lotes assíncronos
+import collections                       # Janela de latências recentes e estados por fluxo (LRU)
+import copy                              # Estado temporal candidato (confirmado só após a pontuação)
+import json                              # Corpo das requisições e respostas
+import time                              # Medição de latência e vazão
+import numpy as np                       # Micro-lotes vetorizados
+
+from model_store import EXPECTED_COLUMNS  # Esquema das leituras dos sensores
+from batch_scoring import decision_threshold  # Limiar calibrado do artefato (ou o padrão)
+from instrumentation import METRICS      # Histogramas/contadores expostos em GET /metrics
+from temporal_features import FeatureAssembler  # Entrada do modelo (com features temporais por fluxo, se usadas)
+
+# PARÂMETROS DO SERVIÇO
+MAX_BATCH = 1024                         # Máximo de leituras por chamada a predict_proba
+MAX_LATENCY = 0.005                      # Orçamento (s) de espera para completar um micro-lote
+LATENCY_WINDOW = 10_000                  # Latências recentes usadas nos percentis de /stats
+MAX_BODY = 16 * 1024 * 1024              # Tamanho máximo do corpo de uma requisição
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                500: "Internal Server Error"}
+DEFAULT_STREAM = "default"               # Fluxo das requisições sem o campo "stream"
+MAX_STREAMS = 10_000                     # Fluxos com estado temporal guardado (sai o usado há mais tempo)
+
+
+class MicroBatchScorer:
+    """
+    Agrupa leituras de requisições concorrentes em micro-lotes.
+    Cada requisição entra na fila com seu Future; o laço de lotes espera no
+    máximo max_latency após a primeira requisição (ou até max_batch leituras),
+    pontua tudo com um predict_proba e devolve a fatia de cada requisição.
+    """
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_latency=MAX_LATENCY, threshold=None,
+                 max_streams=MAX_STREAMS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.max_streams = max_streams
+        self.threshold = decision_threshold(model) if threshold is None else threshold
+
+        # Entrada na ordem de features do modelo; um estado temporal por fluxo (se o modelo o usa),
+        # limitado a max_streams fluxos (LRU): um cliente não faz o dicionário crescer sem limite
+        self._features = FeatureAssembler(model.get_booster().feature_names)
+        self._temporal = collections.OrderedDict()
+
+        self._queue = None
+        self._inicio = time.monotonic()
+        self._latencias = collections.deque(maxlen=LATENCY_WINDOW)
+        self.stats = {'requisicoes': 0, 'leituras': 0, 'micro_lotes': 0, 'erros': 0, 'tempo_predict': 0.0}
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        return asyncio.create_task(self._batch_loop())
+
+    async def score(self, X, stream=DEFAULT_STREAM):
+        """
+        Pontua uma matriz (n x EXPECTED_COLUMNS) de leituras sucessivas de um fluxo.
+        Retorna as probabilidades de anomalia.
+        """
+        if not self._features.window:
+            return await self._submit(self._features.matrix(X))
+
+        fluxo = self._temporal.get(stream)
+        if fluxo is None:
+            fluxo = self._temporal[stream] = {'estado': self._features.new_state(), 'lock': asyncio.Lock()}
+            if len(self._temporal) > self.max_streams:
+                self._temporal.popitem(last=False)
+        self._temporal.move_to_end(stream)
+        # Uma requisição por vez em cada fluxo (ordem de chegada); as features temporais são montadas
+        # sobre uma cópia do estado, que só é confirmada se a pontuação der certo
+        async with fluxo['lock']:
+            estado = copy.deepcopy(fluxo['estado'])
+            proba = await self._submit(self._features.matrix(X, estado))
+            fluxo['estado'] = estado
+        return proba
+
+    async def _submit(self, entrada):
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((entrada, fut))
+        return await fut
+
+    def _predict(self, X):
+        with METRICS.timed('predict_servico'):
+            proba = self.model.predict_proba(X)[:, 1]
+        METRICS.record_scores(len(X), int((proba > self.threshold).sum()))
+        return proba
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            itens = [await self._queue.get()]
+            n = len(itens[0][0])
+            prazo = loop.time() + self.max_latency
+            while n < self.max_batch:
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                itens.append(item)
+                n += len(item[0])
+
+            X = np.vstack([x for x, _ in itens])
+            t0 = time.perf_counter()
+            try:
+                # Pontua fora do laço de eventos para continuar aceitando conexões
+                proba = await loop.run_in_executor(None, self._predict, X)
+            except Exception as e:
+                for _, fut in itens:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.stats['tempo_predict'] += time.perf_counter() - t0
+            self.stats['micro_lotes'] += 1
+            self.stats['leituras'] += len(X)
+
+            inicio = 0
+            for x, fut in itens:
+                if not fut.done():
+                    fut.set_result(proba[inicio:inicio + len(x)])
+                inicio += len(x)
+
+    def record_latency(self, segundos):
+        self.stats['requisicoes'] += 1
+        self._latencias.append(segundos)
+
+    def snapshot(self):
+        """Estatísticas de vazão e latência para dimensionar réplicas."""
+        decorrido = time.monotonic() - self._inicio
+        lotes = self.stats['micro_lotes']
+        latencias = np.fromiter(self._latencias, dtype=np.float64) * 1000
+        resumo = dict(self.stats)
+        resumo.update({
+            'uptime_s': round(decorrido, 3),
+            'leituras_por_s': round(self.stats['leituras'] / decorrido, 1) if decorrido else 0.0,
+            'media_leituras_por_lote': round(self.stats['leituras'] / lotes, 2) if lotes else 0.0,
+            'latencia_ms': {
+                'p50': round(float(np.percentile(latencias, 50)), 3) if len(latencias) else None,
+                'p90': round(float(np.percentile(latencias, 90)), 3) if len(latencias) else None,
+                'p99': round(float(np.percentile(latencias, 99)), 3) if len(latencias) else None,
+            },
+            'fluxos': len(self._temporal),
+            'max_batch': self.max_batch,
+            'max_latency_ms': self.max_latency * 1000,
+        })
+        return resumo
+
+
+def parse_readings(payload):
+    """
+    Converte o corpo JSON em matriz na ordem de EXPECTED_COLUMNS. Aceita uma leitura
+    (objeto), {"readings": [...]} com objetos ou listas já na ordem do esquema.
+    """
+    leituras = payload.get('readings', [payload]) if isinstance(payload, dict) else payload
+    if not leituras:
+        raise ValueError("Nenhuma leitura enviada.")
+    if isinstance(leituras[0], dict):
+        return np.array([[r[col] for col in EXPECTED_COLUMNS] for r in leituras], dtype=np.float64)
+    X = np.asarray(leituras, dtype=np.float64)
+    if X.ndim != 2 or X.shape[1] != len(EXPECTED_COLUMNS):
+        raise ValueError(f"Cada leitura deve ter {len(EXPECTED_COLUMNS)} valores: {EXPECTED_COLUMNS}")
+    return X
+
+
+# SERVIDOR HTTP
+class ScoringServer:
+    """Servidor HTTP/1.1 mínimo (keep-alive) com as rotas POST /score, GET /stats, GET /metrics e GET /health."""
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+
+    async def route(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {'status': 'ok'}
+        if method == "GET" and path == "/stats":
+            return 200, self.scorer.snapshot()
+        if method == "GET" and path == "/metrics":
+            return 200, METRICS.render_prometheus()
+        if method == "POST" and path == "/score":
+            try:
+                payload = json.loads(body or b"{}")
+                X = parse_readings(payload)
+            except (ValueError, KeyError, TypeError) as e:
+                self.scorer.stats['erros'] += 1
+                return 400, {'erro': str(e)}
+            stream = payload.get('stream', DEFAULT_STREAM) if isinstance(payload, dict) else DEFAULT_STREAM
+            try:
+                proba = await self.scorer.score(X, str(stream))
+            except Exception as e:
+                # Falha do modelo (repassada pelo micro-lote): o cliente recebe o erro, a conexão segue
+                self.scorer.stats['erros'] += 1
+                return 500, {'erro': f"Erro ao pontuar: {e}"}
+            return 200, {'results': [{'probability': float(p), 'label': int(p > self.scorer.threshold)}
+                                     for p in proba]}
+        return 404, {'erro': f"Rota não encontrada: {method} {path}"}
+
+    async def respond(self, writer, status, resposta, fechar=False):
+        if isinstance(resposta, str):
+            # Texto de exposição do Prometheus
+            dados, tipo = resposta.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            dados, tipo = json.dumps(resposta).encode("utf-8"), "application/json"
+        cabecalho = (f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: {tipo}\r\n"
+                     f"Content-Length: {len(dados)}\r\n")
+        if fechar:
+            cabecalho += "Connection: close\r\n"
+        writer.write((cabecalho + "\r\n").encode("latin-1") + dados)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                method, path, _ = linha.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    linha = await reader.readline()
+                    if linha in (b"\r\n", b"\n", b""):
+                        break
+                    chave, valor = linha.decode("latin-1").split(":", 1)
+                    headers[chave.strip().lower()] = valor.strip()
+                tamanho = int(headers.get("content-length", 0))
+                if tamanho > MAX_BODY:
+                    # O corpo não é lido: responde e fecha a conexão
+                    await self.respond(writer, 413, {'erro': f"Corpo maior que {MAX_BODY} bytes"}, fechar=True)
+                    break
+                body = await reader.readexactly(tamanho) if tamanho else b""
+
+                t0 = time.perf_counter()
+                status, resposta = await self.route(method, path, body)
+                if path == "/score":
+                    self.scorer.record_latency(time.perf_counter() - t0)
+
+                await self.respond(writer, status, resposta)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # Cliente desconectou ou enviou uma requisição malformada
+        finally:
+            writer.close()
+
+
+async def serve(model, host="127.0.0.1", port=8500, max_batch=MAX_BATCH, max_latency=MAX_LATENCY):
+    scorer = MicroBatchScorer(model, max_batch, max_latency)
+    await scorer.start()
+    server = await asyncio.start_server(ScoringServer(scorer).handle, host, port)
+    print(f"Serviço de pontuação em http://{host}:{port} (lote máx. {max_batch}, latência máx. {max_latency * 1000:.1f} ms)")
+    async with server:
+        await server.serve_forever()
+
+
+# CLIENTE (para o painel ou outros serviços usarem o serviço como backend)
+class ScoringClient:
+    """Cliente HTTP síncrono com conexão persistente."""
+
+    def __init__(self, url="http://127.0.0.1:8500", timeout=10.0):
+        import http.client               # Só necessário no lado do cliente
+        from urllib.parse import urlparse
+        destino = urlparse(url)
+        self._conn = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=timeout)
+
+    def _request(self, method, path, payload=None):
+        corpo = json.dumps(payload).encode("utf-8") if payload is not None else None
+        self._conn.request(method, path, body=corpo, headers={"Content-Type": "application/json"})
+        resposta = self._conn.getresponse()
+        dados = json.loads(resposta.read())
+        if resposta.status != 200:
+            raise ValueError(dados.get('erro', resposta.reason))
+        return dados
+
+    def score(self, readings, stream=None):
+        """
+        Pontua uma lista de leituras (dicts ou listas). 'stream' identifica o fluxo
+        (sala) para as features temporais. Retorna [{'probability', 'label'}, ...].
+        """
+        payload = {'readings': readings} if stream is None else {'stream': stream, 'readings': readings}
+        return self._request("POST", "/score", payload)['results']
+
+    def stats(self):
+        return self._request("GET", "/stats")
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    from model_store import load_serving_artifact, MODEL_DIR
+    parser = argparse.ArgumentParser(description="Serviço de pontuação headless da Red Queen.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8500)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Máximo de leituras por micro-lote")
+    parser.add_argument("--max-latency-ms", type=float, default=MAX_LATENCY * 1000,
+                        help="Orçamento de espera para completar um micro-lote")
+    parser.add_argument("--model-dir", default=MODEL_DIR,
+                        help="Pasta dos artefatos: serve o artefato promovido, senão o último gravado "
+                             "(ex.: modelos/cv para o melhor modelo da validação cruzada)")
+    parser.add_argument("--xgboost", action="store_true",
+                        help="Usa o booster do xgboost em vez do motor compilado (NumPy puro)")
+    args = parser.parse_args()
+
+    model, _ = load_serving_artifact(args.model_dir, compiled=not args.xgboost)
+    try:
+        asyncio.run(serve(model, args.host, args.port, args.max_batch, args.max_latency_ms / 1000))
+    except KeyboardInterrupt:
+        pass
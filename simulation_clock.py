@@ -0,0 +1,56 @@
+# RELÓGIO DA SIMULAÇÃO DA RED QUEEN
+# A posição da simulação é calculada a partir do relógio de parede (tempo
+# decorrido × taxa), em vez de um sleep + rerun por leitura: quem desenha o
+# painel, na frequência que quiser, só pergunta quantas leituras passaram
+# desde o último quadro. Não há thread por sessão, então o custo no servidor
+# depende só da taxa de quadros (limitada), não da taxa de leituras.
+
+import time                              # Relógio monotônico
+
+# PARÂMETROS DO RELÓGIO
+DEFAULT_RATE = 1.0                       # Leituras por segundo (a simulação original avançava 1 por segundo)
+MAX_RATE = 50.0                          # Taxa máxima oferecida no painel
+MAX_REFRESH_HZ = 20.0                    # Quadros por segundo no máximo (acima disso, várias leituras por quadro)
+MAX_CATCHUP = 10_000                     # Leituras entregues por quadro no máximo (ex.: aba em segundo plano)
+
+
+class SimulationClock:
+    """
+    Conta as leituras que passaram desde start(), a 'rate' leituras por segundo.
+    take() devolve quantas ainda não foram entregues e as marca como entregues.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE):
+        self.rate = float(rate)
+        self._inicio = None              # Instante do start() (None: parado)
+        self._entregues = 0
+
+    @property
+    def running(self):
+        return self._inicio is not None
+
+    def start(self, now=None):
+        self._inicio = time.monotonic() if now is None else now
+        self._entregues = 0
+
+    def stop(self):
+        self._inicio = None
+
+    def set_rate(self, rate, now=None):
+        """Muda a taxa sem saltar: a contagem recomeça agora, com a nova taxa."""
+        self.rate = float(rate)
+        if self.running:
+            self.start(now)
+
+    def take(self, now=None, limit=MAX_CATCHUP):
+        """Leituras que passaram desde a última chamada (no máximo 'limit'); 0 se parado."""
+        if not self.running:
+            return 0
+        vencidas = int(((time.monotonic() if now is None else now) - self._inicio) * self.rate)
+        novas = vencidas - self._entregues
+        self._entregues = vencidas       # Atrasos além do limite são descartados, não acumulados
+        return min(novas, limit)
+
+    def refresh_interval(self):
+        """Intervalo (s) entre quadros: uma leitura por quadro, até MAX_REFRESH_HZ."""
+        return max(1.0 / self.rate, 1.0 / MAX_REFRESH_HZ)
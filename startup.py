@@ -0,0 +1,147 @@
+# INICIALIZAÇÃO RÁPIDA DO PAINEL DA RED QUEEN
+# Importações pesadas sob demanda (shap, xgboost, altair), aquecimento do
+# modelo em uma thread de fundo e um relatório com os tempos de cada etapa
+# da inicialização (importações, carga do modelo e primeira pintura).
+#
+#   python startup.py          (importação a frio de cada módulo + primeira execução do painel)
+
+import contextlib                        # Cronômetro como gerenciador de contexto
+import importlib                         # Importação sob demanda
+import subprocess                        # Importações a frio em interpretadores limpos
+import sys                               # Módulos já carregados
+import threading                         # Aquecimento em segundo plano
+import time                              # Cronômetro
+
+# Instante de referência: primeira importação deste módulo no processo
+PROCESS_START = time.perf_counter()
+# Módulos medidos pela linha de comando (do mais leve ao mais pesado, aproximadamente)
+HEAVY_MODULES = ('numpy', 'pyarrow', 'streamlit', 'pandas', 'altair', 'matplotlib.pyplot',
+                 'sklearn.model_selection', 'xgboost', 'shap')
+
+
+class StartupReport:
+    """
+    Tempos de inicialização do processo. Cada etapa é registrada só na primeira
+    vez, com a duração e o instante (desde PROCESS_START) em que terminou.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.etapas = {}
+
+    def _record(self, etapa, duracao):
+        with self._lock:
+            if etapa not in self.etapas:
+                self.etapas[etapa] = {
+                    'etapa': etapa,
+                    'duracao_s': duracao,
+                    'concluida_em_s': time.perf_counter() - PROCESS_START,
+                    'thread': threading.current_thread().name,
+                }
+
+    @contextlib.contextmanager
+    def measure(self, etapa):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(etapa, time.perf_counter() - inicio)
+
+    def mark(self, etapa):
+        """Registra um marco (ex.: primeira pintura) sem duração própria."""
+        self._record(etapa, None)
+
+    def lazy_import(self, nome):
+        """Importa o módulo na primeira vez que é usado, registrando o tempo de importação."""
+        if nome in sys.modules:
+            return sys.modules[nome]
+        with self.measure(f"import {nome}"):
+            return importlib.import_module(nome)
+
+    def rows(self):
+        with self._lock:
+            return sorted(self.etapas.values(), key=lambda e: e['concluida_em_s'])
+
+
+# Relatório único do processo (compartilhado por todas as sessões do painel)
+REPORT = StartupReport()
+
+
+class BackgroundTask:
+    """
+    Executa fn(tarefa, *args) em uma thread daemon. fn publica resultados
+    parciais com publish(chave, valor); quem consome lê com get() (sem bloquear)
+    ou espera com wait(chave). Um erro em fn é repassado a quem espera.
+    """
+
+    def __init__(self, fn, *args, name="aquecimento"):
+        self._fn = fn
+        self._args = args
+        self._cond = threading.Condition()
+        self._resultados = {}
+        self.done = False
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self._fn(self, *self._args)
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def publish(self, chave, valor):
+        with self._cond:
+            self._resultados[chave] = valor
+            self._cond.notify_all()
+
+    def get(self, chave, default=None):
+        return self._resultados.get(chave, default)
+
+    def wait(self, chave, timeout=None):
+        """Espera até 'chave' ser publicada (ou a tarefa terminar). Retorna o valor ou None no timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: chave in self._resultados or self.done, timeout)
+        if chave not in self._resultados and self.error is not None:
+            raise self.error
+        return self._resultados.get(chave)
+
+
+def cold_import_time(nome):
+    """Tempo (s) para importar um módulo em um interpretador novo (sem nada em cache na memória)."""
+    codigo = f"import time; t = time.perf_counter(); import {nome}; print(time.perf_counter() - t)"
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True)
+    return float(saida.stdout.strip()) if saida.returncode == 0 else None
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Relatório de tempos de inicialização do painel da Red Queen.")
+    parser.add_argument("--app", default="red_queen.py", help="Script do painel executado uma vez, sem navegador")
+    parser.add_argument("--sem-app", action="store_true", help="Mede só as importações a frio")
+    args = parser.parse_args()
+
+    print("Importação a frio (interpretador novo)")
+    for nome in HEAVY_MODULES:
+        duracao = cold_import_time(nome)
+        print(f"  {nome:<26} {'indisponível' if duracao is None else f'{duracao * 1000:>8.0f} ms'}")
+
+    if not args.sem_app:
+        from streamlit.testing.v1 import AppTest
+        inicio = time.perf_counter()
+        AppTest.from_file(args.app, default_timeout=120).run()
+        print(f"\nPrimeira execução de '{args.app}': {time.perf_counter() - inicio:.2f} s")
+        # O painel importa este arquivo como 'startup' (aqui ele é __main__): o relatório preenchido é o de lá
+        import startup
+        print(f"  {'etapa':<28} {'duração (ms)':>13} {'concluída em (s)':>17}  thread")
+        for e in startup.REPORT.rows():
+            duracao = '' if e['duracao_s'] is None else f"{e['duracao_s'] * 1000:.0f}"
+            print(f"  {e['etapa']:<28} {duracao:>13} {e['concluida_em_s']:>17.2f}  {e['thread']}")
@@ -0,0 +1,360 @@
+# INGESTÃO CONTÍNUA DE SENSORES (STREAMING) PARA A RED QUEEN
+# Lê leituras em CSV ou JSON (uma por linha) de um socket TCP/UNIX ou de um
+# arquivo acompanhado em tempo real (tail -f), agrupa as leituras em
+# micro-lotes e pontua cada micro-lote com uma única chamada a predict_proba.
+#
+# Também inclui um servidor de replay local que transmite o
+# Red_Queen_Synthetic_Dataset.csv a uma taxa configurável, para testes:
+#   python streaming.py replay --rate 20 --port 9999
+#   python streaming.py listen tcp://127.0.0.1:9999
+
+import collections                       # Fila de resultados limitada (deque)
+import json                              # Leituras em JSON
+import os                                # Acompanhamento de arquivos
+import queue                             # Fila limitada entre leitura e pontuação (backpressure)
+import socket                            # Fontes TCP/UNIX
+import threading                         # Threads de leitura e pontuação
+import time                              # Controle de latência e taxa
+import numpy as np                       # Micro-lotes vetorizados
+
+from model_store import EXPECTED_COLUMNS  # Esquema das leituras dos sensores
+from batch_scoring import decision_threshold  # Limiar calibrado do artefato (ou o padrão)
+from instrumentation import METRICS      # Latência dos micro-lotes, linhas pontuadas e alertas
+from temporal_features import FeatureAssembler  # Entrada do modelo (com features temporais incrementais, se usadas)
+
+# PARÂMETROS DA INGESTÃO
+QUEUE_SIZE = 10_000                      # Leituras aguardando pontuação (limite da backpressure)
+BATCH_SIZE = 512                         # Máximo de leituras por chamada a predict_proba
+MAX_LATENCY = 0.05                       # Tempo máximo (s) que uma leitura espera o micro-lote encher
+RESULTS_SIZE = 1_000                     # Micro-lotes pontuados guardados até o painel consumi-los
+RECV_SIZE = 65536                        # Bytes por leitura do socket
+
+
+# INTERPRETAÇÃO DAS LINHAS
+class LineParser:
+    """
+    Converte linhas CSV ou JSON em vetores na ordem de EXPECTED_COLUMNS.
+    Para CSV, um cabeçalho (ex.: a primeira linha do dataset) redefine a ordem
+    das colunas; sem cabeçalho, assume a ordem de EXPECTED_COLUMNS.
+    """
+
+    def __init__(self, columns=EXPECTED_COLUMNS):
+        self.columns = list(columns)
+        self._csv_pos = list(range(len(self.columns)))  # Posição de cada coluna esperada na linha CSV
+
+    def parse(self, line):
+        """Retorna o vetor float64 da leitura ou None (linha vazia ou cabeçalho)."""
+        line = line.strip()
+        if not line:
+            return None
+        if line.startswith('{'):
+            registro = json.loads(line)
+            return np.array([registro[col] for col in self.columns], dtype=np.float64)
+
+        campos = line.split(',')
+        try:
+            return np.array([campos[i] for i in self._csv_pos], dtype=np.float64)
+        except ValueError:
+            # Não numérico: trata como cabeçalho se contiver todas as colunas esperadas
+            nomes = [c.strip() for c in campos]
+            if all(col in nomes for col in self.columns):
+                self._csv_pos = [nomes.index(col) for col in self.columns]
+                return None
+            raise
+
+
+# FONTES DE LINHAS
+def iter_socket_lines(address, stop_event):
+    """Gera as linhas recebidas de um socket ('tcp://host:porta' ou 'unix:///caminho')."""
+    if address.startswith("unix://"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address[len("unix://"):])
+    else:
+        host, port = address[len("tcp://"):].rsplit(':', 1)
+        sock = socket.create_connection((host, int(port)))
+    sock.settimeout(0.5)  # Permite verificar stop_event periodicamente
+
+    pendente = b""
+    try:
+        while not stop_event.is_set():
+            try:
+                dados = sock.recv(RECV_SIZE)
+            except socket.timeout:
+                continue
+            if not dados:
+                break  # Conexão encerrada pelo emissor
+            pendente += dados
+            *linhas, pendente = pendente.split(b"\n")
+            for linha in linhas:
+                # Bytes inválidos viram U+FFFD: a linha falha no parse e conta em erros_de_parse
+                yield linha.decode("utf-8", errors="replace")
+    finally:
+        sock.close()
+
+
+def iter_file_lines(path, stop_event, from_start=True, poll_interval=0.1):
+    """Acompanha um arquivo como 'tail -f', gerando cada nova linha completa."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        pendente = ""
+        while not stop_event.is_set():
+            trecho = f.readline()
+            if not trecho:
+                time.sleep(poll_interval)  # Sem dados novos: aguarda o arquivo crescer
+                continue
+            pendente += trecho
+            if pendente.endswith("\n"):
+                yield pendente
+                pendente = ""
+
+
+def open_source(uri, stop_event):
+    """Escolhe a fonte pela URI: tcp://, unix:// ou caminho de arquivo (file:// opcional)."""
+    if uri.startswith(("tcp://", "unix://")):
+        return iter_socket_lines(uri, stop_event)
+    if uri.startswith("file://"):
+        uri = uri[len("file://"):]
+    return iter_file_lines(uri, stop_event)
+
+
+# MOTOR DE INGESTÃO
+class StreamIngestor:
+    """
+    Lê uma fonte em uma thread e pontua micro-lotes em outra.
+
+    - Backpressure: a fila entre leitura e pontuação é limitada. Com
+      overflow='block' a leitura para quando a fila enche (o TCP propaga a
+      pressão até o emissor); com overflow='drop' a leitura nova é descartada.
+    - Micro-lotes: até batch_size leituras ou max_latency segundos, o que vier
+      primeiro, e uma única chamada a predict_proba por micro-lote.
+    - Resultados: micro-lotes (seq, X, proba) em uma fila limitada consumida
+      pelo painel com drain()/wait(). Se ninguém consumir, os mais antigos são
+      descartados e contados em stats (lotes_perdidos, perdidas, anomalias_perdidas).
+    """
+
+    def __init__(self, model, uri, batch_size=BATCH_SIZE, max_latency=MAX_LATENCY,
+                 queue_size=QUEUE_SIZE, overflow='block', threshold=None):
+        self.model = model
+        self.uri = uri
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.overflow = overflow
+        self.threshold = decision_threshold(model) if threshold is None else threshold
+        self.error = None
+
+        # Entrada na ordem de features do modelo; o estado temporal acompanha a fonte leitura a leitura
+        self._features = FeatureAssembler(model.get_booster().feature_names)
+        self._temporal = self._features.new_state()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._results = collections.deque(maxlen=RESULTS_SIZE)
+        self._ready = threading.Condition()
+        self._stop = threading.Event()
+        self._reader_done = threading.Event()
+        self._seq = 0
+        self.stats = {'lidas': 0, 'pontuadas': 0, 'micro_lotes': 0, 'descartadas': 0,
+                      'erros_de_parse': 0, 'anomalias': 0,
+                      'lotes_perdidos': 0, 'perdidas': 0, 'anomalias_perdidas': 0}
+
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._scorer = threading.Thread(target=self._score_loop, daemon=True)
+
+    def start(self):
+        self._reader.start()
+        self._scorer.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+
+    @property
+    def running(self):
+        return self._scorer.is_alive() and not self._stop.is_set()
+
+    def _read_loop(self):
+        parser = LineParser()
+        try:
+            for linha in open_source(self.uri, self._stop):
+                try:
+                    leitura = parser.parse(linha)
+                except (ValueError, KeyError, IndexError):
+                    self.stats['erros_de_parse'] += 1
+                    continue
+                if leitura is None:
+                    continue
+                self.stats['lidas'] += 1
+                if self.overflow == 'drop':
+                    try:
+                        self._queue.put_nowait(leitura)
+                    except queue.Full:
+                        self.stats['descartadas'] += 1
+                else:
+                    while not self._stop.is_set():
+                        try:
+                            self._queue.put(leitura, timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self._reader_done.set()
+
+    def _next_batch(self):
+        """Bloqueia até a primeira leitura e completa o micro-lote até batch_size ou max_latency."""
+        try:
+            lote = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return None
+        prazo = time.monotonic() + self.max_latency
+        while len(lote) < self.batch_size:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._queue.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _score_loop(self):
+        while not self._stop.is_set():
+            lote = self._next_batch()
+            if lote is None:
+                if self._reader_done.is_set() and self._queue.empty():
+                    break  # Fonte encerrada e fila vazia
+                continue
+
+            try:
+                X = np.vstack(lote)
+                with METRICS.timed('predict_ao_vivo'):
+                    proba = self.model.predict_proba(self._features.matrix(X, self._temporal))[:, 1]
+            except Exception as e:
+                # Falha do modelo ou da montagem da entrada: encerra a fonte e expõe o erro (o painel mostra)
+                self.error = f"Erro ao pontuar: {e}"
+                self._stop.set()
+                break
+            seq = self._seq
+            self._seq += len(lote)
+
+            anomalias = int((proba > self.threshold).sum())
+            METRICS.record_scores(len(lote), anomalias)
+            self.stats['pontuadas'] += len(lote)
+            self.stats['micro_lotes'] += 1
+            self.stats['anomalias'] += anomalias
+            with self._ready:
+                if len(self._results) == self._results.maxlen:
+                    # Fila cheia sem consumo: o micro-lote mais antigo sai, e a perda fica contada
+                    _, X_perdido, proba_perdida = self._results[0]
+                    self.stats['lotes_perdidos'] += 1
+                    self.stats['perdidas'] += len(X_perdido)
+                    self.stats['anomalias_perdidas'] += int((proba_perdida > self.threshold).sum())
+                self._results.append((seq, X, proba))
+                self._ready.notify_all()
+
+        with self._ready:
+            self._ready.notify_all()
+
+    def wait(self, timeout=None):
+        """Aguarda até existir ao menos um micro-lote pontuado (ou timeout). Retorna True se houver."""
+        with self._ready:
+            return self._ready.wait_for(lambda: self._results or not self.running, timeout=timeout) \
+                and bool(self._results)
+
+    def drain(self):
+        """Retira e retorna todos os micro-lotes pontuados até agora: lista de (seq, X, proba)."""
+        with self._ready:
+            lotes = list(self._results)
+            self._results.clear()
+        return lotes
+
+
+# SERVIDOR DE REPLAY (PARA TESTES)
+def serve_replay(path="Red_Queen_Synthetic_Dataset.csv", host="127.0.0.1", port=9999,
+                 rate=10.0, fmt="csv", loop=True, unix_path=None):
+    """
+    Transmite as linhas de um CSV para cada cliente conectado, a 'rate' linhas
+    por segundo (rate <= 0 envia o mais rápido possível), em CSV ou JSON.
+    """
+    import socketserver                  # Servidor TCP/UNIX com uma thread por cliente
+    import pandas as pd                  # Leitura do dataset de replay
+
+    df = pd.read_csv(path, encoding='utf-8')
+    if fmt == "json":
+        linhas = [json.dumps(r) + "\n" for r in df.to_dict(orient="records")]
+    else:
+        linhas = [",".join(df.columns) + "\n"] + \
+                 [l + "\n" for l in df.to_csv(index=False, header=False).splitlines()]
+    dados = [l.encode("utf-8") for l in linhas]
+
+    class ReplayHandler(socketserver.BaseRequestHandler):
+        def handle(self):
+            inicio = time.monotonic()
+            enviadas = 0
+            try:
+                while True:
+                    for linha in dados:
+                        self.request.sendall(linha)  # Bloqueia se o cliente não consumir (backpressure)
+                        enviadas += 1
+                        if rate > 0:
+                            atraso = inicio + enviadas / rate - time.monotonic()
+                            if atraso > 0:
+                                time.sleep(atraso)
+                    if not loop:
+                        break
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Cliente desconectou
+
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        server = socketserver.ThreadingUnixStreamServer(unix_path, ReplayHandler)
+        endereco = f"unix://{unix_path}"
+    else:
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer((host, port), ReplayHandler)
+        endereco = f"tcp://{host}:{port}"
+    server.daemon_threads = True
+    print(f"Replay de '{path}' em {endereco} a {rate} linhas/s ({fmt}). Ctrl+C para encerrar.")
+    with server:
+        server.serve_forever()
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingestão contínua de sensores da Red Queen.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_replay = sub.add_parser("replay", help="Servidor local que transmite um CSV a uma taxa fixa")
+    p_replay.add_argument("--data", default="Red_Queen_Synthetic_Dataset.csv")
+    p_replay.add_argument("--host", default="127.0.0.1")
+    p_replay.add_argument("--port", type=int, default=9999)
+    p_replay.add_argument("--unix", default=None, help="Caminho de socket UNIX (em vez de TCP)")
+    p_replay.add_argument("--rate", type=float, default=10.0, help="Linhas por segundo (<= 0: sem limite)")
+    p_replay.add_argument("--format", choices=["csv", "json"], default="csv")
+    p_replay.add_argument("--once", action="store_true", help="Transmite o arquivo uma única vez")
+
+    p_listen = sub.add_parser("listen", help="Consome uma fonte e imprime as anomalias detectadas")
+    p_listen.add_argument("uri", help="tcp://host:porta, unix:///caminho ou caminho de arquivo")
+    p_listen.add_argument("--xgboost", action="store_true", help="Usa o booster do xgboost em vez do motor compilado")
+
+    args = parser.parse_args()
+    if args.comando == "replay":
+        serve_replay(args.data, args.host, args.port, args.rate, args.format, not args.once, args.unix)
+    else:
+        from model_store import load_serving_artifact
+        model, _ = load_serving_artifact(compiled=not args.xgboost)
+        ingestor = StreamIngestor(model, args.uri).start()
+        try:
+            while ingestor.running:
+                ingestor.wait(timeout=1.0)
+                for seq, X, proba in ingestor.drain():
+                    for i in np.flatnonzero(proba > ingestor.threshold):
+                        print(f"🚨 Anomalia na leitura {seq + i}: confiança {proba[i] * 100:.2f}%")
+        except KeyboardInterrupt:
+            ingestor.stop()
+        print(f"Estatísticas: {ingestor.stats}")
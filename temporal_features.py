@@ -0,0 +1,211 @@
+# FEATURES TEMPORAIS (JANELA DESLIZANTE) DA RED QUEEN
+# Média móvel, inclinação, EWMA e z-score de cada sensor contínuo em uma
+# janela configurável, para que um T-Virus subindo devagar (a anomalia
+# silenciosa) apareça antes de cruzar um limiar absoluto. Duas
+# implementações com as mesmas definições:
+# - add_temporal_features: vetorizada (pandas rolling/ewm), para treino e lote
+# - TemporalState: incremental em O(1) por leitura, para fluxos ao vivo,
+#   vetorizada entre fluxos (uma linha por sala no modo multi-salas)
+# O modelo treinado com essas features carrega a janela nos nomes das colunas
+# (ex.: 'T_Virus_Level_media_w30'), então quem pontua reconstrói as mesmas
+# features a partir de feature_names, sem configuração separada.
+# Atenção: o gerador sintético (gerar_bloco) embaralha as linhas, então
+# treinar com Red_Queen_Synthetic_Dataset.csv não ensina nada sobre a ordem
+# no tempo; as features só têm sentido com um histórico em ordem temporal.
+#
+#   python temporal_features.py --janela 30   (confere lote vs. incremental e mede o custo)
+
+import re                                # Janela a partir dos nomes das features
+import numpy as np                       # Estado incremental vetorizado
+import pandas as pd                      # Janelas deslizantes em lote
+
+from model_store import EXPECTED_COLUMNS
+
+# PARÂMETROS DAS FEATURES
+TEMPORAL_WINDOW = 30                     # Leituras na janela deslizante
+TEMPORAL_SENSORS = ['T_Virus_Level', 'Room_Temperature', 'Humidity', 'Gas_Leak_Level', 'Proximity_To_Core']
+TEMPORAL_STATS = ('media', 'inclinacao', 'ewma', 'zscore')
+MIN_STD = 1e-9                           # Desvio abaixo disso conta como zero (z-score = 0)
+
+_WINDOW_PATTERN = re.compile(r"_media_w(\d+)$")
+
+
+def temporal_columns(window=TEMPORAL_WINDOW):
+    """Nomes das features temporais, na ordem produzida pelas duas implementações."""
+    return [f"{sensor}_{stat}_w{window}" for sensor in TEMPORAL_SENSORS for stat in TEMPORAL_STATS]
+
+
+def feature_columns(window=None):
+    """Colunas de entrada do modelo: as leituras e, se houver janela, as features temporais."""
+    return EXPECTED_COLUMNS + (temporal_columns(window) if window else [])
+
+
+def temporal_window(feature_names):
+    """Janela usada no treino do modelo (lida dos nomes das features) ou None."""
+    for nome in feature_names:
+        encontrado = _WINDOW_PATTERN.search(nome)
+        if encontrado:
+            return int(encontrado.group(1))
+    return None
+
+
+def ewma_alpha(window):
+    """Mesmo alfa do pandas com span=window."""
+    return 2.0 / (window + 1.0)
+
+
+# VERSÃO VETORIZADA (TREINO E LOTE)
+def add_temporal_features(df, window=TEMPORAL_WINDOW):
+    """
+    Retorna uma cópia de df com as features temporais, tratando as linhas como
+    uma única sequência no tempo. As primeiras linhas usam a janela parcial disponível.
+    """
+    novas = {}
+    t = pd.Series(np.arange(len(df), dtype=np.float64), index=df.index)
+    var_t = t.rolling(window, min_periods=1).var(ddof=0)
+    for sensor in TEMPORAL_SENSORS:
+        x = df[sensor].astype(np.float64)
+        janela = x.rolling(window, min_periods=1)
+        media = janela.mean()
+        desvio = janela.std(ddof=0).fillna(0.0)
+        # Inclinação da regressão linear na janela: cov(t, x) / var(t)
+        inclinacao = (janela.cov(t, ddof=0) / var_t).where(var_t > 0, 0.0)
+        desvio_valido = desvio.where(desvio > MIN_STD)
+        novas[f"{sensor}_media_w{window}"] = media
+        novas[f"{sensor}_inclinacao_w{window}"] = inclinacao
+        novas[f"{sensor}_ewma_w{window}"] = x.ewm(alpha=ewma_alpha(window), adjust=False).mean()
+        novas[f"{sensor}_zscore_w{window}"] = ((x - media) / desvio_valido).fillna(0.0)
+    return pd.concat([df, pd.DataFrame(novas, index=df.index)[temporal_columns(window)]], axis=1)
+
+
+def prepare_frame(df, feature_names):
+    """Acrescenta a df as features temporais que o modelo espera e que ainda não existem."""
+    window = temporal_window(feature_names)
+    if window is None or all(col in df.columns for col in temporal_columns(window)):
+        return df
+    return add_temporal_features(df, window)
+
+
+# VERSÃO INCREMENTAL (FLUXOS AO VIVO)
+class TemporalState:
+    """
+    Estado incremental de n_streams fluxos que avançam juntos (uma leitura de
+    cada por atualização). Guarda só a janela de cada sensor e as somas
+    deslizantes (x, x², posição·x): cada leitura custa O(1), e as somas são
+    recalculadas a partir da janela a cada volta para não acumular erro.
+    """
+
+    def __init__(self, window=TEMPORAL_WINDOW, n_streams=1):
+        self.window = int(window)
+        self.n_streams = n_streams
+        self.alpha = ewma_alpha(self.window)
+        self._idx = [EXPECTED_COLUMNS.index(s) for s in TEMPORAL_SENSORS]
+        forma = (n_streams, len(TEMPORAL_SENSORS))
+        self._janela = np.zeros((self.window,) + forma)
+        self._soma = np.zeros(forma)
+        self._soma_quad = np.zeros(forma)
+        self._soma_pos = np.zeros(forma)  # Σ posição·x, posições 0..k-1 da mais antiga à mais nova
+        self._ewma = np.zeros(forma)
+        self._pos = 0                    # Próxima posição de escrita na janela circular
+        self.count = 0
+
+    def update(self, X):
+        """
+        Uma leitura por fluxo (matriz n_streams x EXPECTED_COLUMNS).
+        Retorna as features temporais (n_streams x len(temporal_columns)).
+        """
+        x = np.asarray(X, dtype=np.float64)[:, self._idx]
+        w = self.window
+        if self.count < w:
+            self._soma_pos += self.count * x
+            self._soma += x
+            self._soma_quad += x * x
+        else:
+            antiga = self._janela[self._pos]
+            restante = self._soma - antiga
+            # Remove a mais antiga (posição 0), desloca as demais uma posição e põe a nova no fim
+            self._soma_pos += (w - 1) * x - restante
+            self._soma = restante + x
+            self._soma_quad += x * x - antiga * antiga
+        self._janela[self._pos] = x
+        self._ewma = x if self.count == 0 else self.alpha * x + (1.0 - self.alpha) * self._ewma
+        self._pos = (self._pos + 1) % w
+        self.count += 1
+        if self._pos == 0:
+            self._recompute()
+
+        k = min(self.count, w)
+        media = self._soma / k
+        desvio = np.sqrt(np.maximum(self._soma_quad / k - media * media, 0.0))
+        soma_t, soma_t2 = k * (k - 1) / 2.0, (k - 1) * k * (2 * k - 1) / 6.0
+        denominador = k * soma_t2 - soma_t * soma_t
+        inclinacao = (k * self._soma_pos - soma_t * self._soma) / denominador if denominador > 0 else np.zeros_like(x)
+        zscore = np.divide(x - media, desvio, out=np.zeros_like(x), where=desvio > MIN_STD)
+        # Intercala por sensor, na ordem de temporal_columns: media, inclinacao, ewma, zscore
+        return np.stack([media, inclinacao, self._ewma, zscore], axis=2).reshape(self.n_streams, -1)
+
+    def transform(self, X):
+        """Leituras sucessivas de um único fluxo (n x EXPECTED_COLUMNS). Retorna n x len(temporal_columns)."""
+        X = np.asarray(X, dtype=np.float64)
+        return np.vstack([self.update(X[i:i + 1]) for i in range(len(X))]) if len(X) else \
+            np.empty((0, len(TEMPORAL_SENSORS) * len(TEMPORAL_STATS)))
+
+    def _recompute(self):
+        # Janela cheia e alinhada (a mais antiga na posição 0): somas exatas a partir dos valores
+        posicoes = np.arange(self.window, dtype=np.float64)[:, None, None]
+        self._soma = self._janela.sum(axis=0)
+        self._soma_quad = (self._janela * self._janela).sum(axis=0)
+        self._soma_pos = (posicoes * self._janela).sum(axis=0)
+
+
+class FeatureAssembler:
+    """
+    Monta a matriz de entrada na ordem de feature_names a partir de leituras na
+    ordem de EXPECTED_COLUMNS, acrescentando as features temporais se o modelo as usa.
+    """
+
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+        self.window = temporal_window(self.feature_names)
+        colunas = feature_columns(self.window)
+        self._perm = [colunas.index(col) for col in self.feature_names]
+
+    def new_state(self, n_streams=1):
+        """Estado incremental para n_streams fluxos (None se o modelo não usa features temporais)."""
+        return TemporalState(self.window, n_streams) if self.window else None
+
+    def matrix(self, X, state=None, one_per_stream=False):
+        """
+        X: leituras sucessivas de um fluxo (ou, com one_per_stream, uma leitura por fluxo do estado).
+        Retorna a matriz na ordem de feature_names.
+        """
+        if self.window:
+            temporais = state.update(X) if one_per_stream else state.transform(X)
+            X = np.hstack([X, temporais])
+        return X[:, self._perm]
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    import time
+    from dataset_io import read_dataset
+    parser = argparse.ArgumentParser(description="Confere as features temporais (lote vs. incremental).")
+    parser.add_argument("--data", default="Red_Queen_Synthetic_Dataset.csv")
+    parser.add_argument("--janela", type=int, default=TEMPORAL_WINDOW)
+    args = parser.parse_args()
+
+    df = read_dataset(args.data)
+    inicio = time.perf_counter()
+    lote = add_temporal_features(df, args.janela)[temporal_columns(args.janela)].to_numpy()
+    tempo_lote = time.perf_counter() - inicio
+
+    estado = TemporalState(args.janela)
+    X = df[EXPECTED_COLUMNS].to_numpy(dtype=np.float64)
+    inicio = time.perf_counter()
+    incremental = estado.transform(X)
+    tempo_incremental = time.perf_counter() - inicio
+
+    print(f"{len(df):,} linhas, janela {args.janela}: lote {tempo_lote * 1000:.1f} ms, "
+          f"incremental {tempo_incremental / len(df) * 1e6:.1f} µs/leitura")
+    print(f"Diferença máxima lote vs. incremental: {np.abs(lote - incremental).max():.2e}")
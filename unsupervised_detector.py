@@ -0,0 +1,193 @@
+# DETECTOR NÃO SUPERVISIONADO (SEGUNDO MOTOR) DA RED QUEEN
+# Aprende o perfil de operação normal definido em gerador_de_dataset.py, sem
+# rótulos, e mede o quão longe cada leitura está dele pela distância de
+# Mahalanobis. Média e covariância são atualizadas em fluxo (Welford/Chan),
+# com memória constante (7 médias + matriz 7x7), e o corte é o quantil da
+# distância nas leituras normais. Pode rodar sozinho ou em conjunto com o
+# XGBoost (EnsembleDetector), com a mesma interface dos outros modelos.
+#
+#   python unsupervised_detector.py   (detecção no dataset rotulado e custo por leitura)
+
+import numpy as np                       # Estatísticas em fluxo e distância vetorizada
+
+from model_store import EXPECTED_COLUMNS
+
+# PARÂMETROS DO DETECTOR
+PROFILE_SAMPLES = 100_000                # Leituras normais sorteadas do gerador para o perfil inicial
+FALSE_ALARM_RATE = 0.001                 # Fração de leituras normais acima do corte
+RIDGE = 1e-6                             # Regularização relativa da covariância (sensores quase constantes)
+ENSEMBLE_MODES = ('max', 'media')        # 'max': alerta se qualquer motor alertar; 'media': média dos dois
+
+
+class OnlineMahalanobis:
+    """
+    Distância de Mahalanobis em relação ao perfil normal, aprendido em fluxo.
+    predict_proba devolve um escore d² / (d² + corte) em [0, 1): passa de 0.5
+    exatamente quando a distância passa do corte, então funciona com o mesmo
+    limiar de decisão do modelo supervisionado.
+    """
+
+    def __init__(self, columns=EXPECTED_COLUMNS, ridge=RIDGE):
+        self.feature_names = list(columns)
+        self.ridge = ridge
+        d = len(self.feature_names)
+        self.n = 0
+        self.mean = np.zeros(d)
+        self._m2 = np.zeros((d, d))      # Soma dos produtos cruzados centrados (co-momento)
+        self._precisao = None            # Inversa da covariância (recalculada só após atualizar)
+        self.cutoff = None               # d² acima do qual a leitura é anômala
+
+    def get_booster(self):
+        """Compatibilidade com o XGBClassifier (o projeto lê get_booster().feature_names)."""
+        return self
+
+    def _matrix(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.feature_names].to_numpy(dtype=np.float64)
+        return np.asarray(X, dtype=np.float64).reshape(-1, len(self.feature_names))
+
+    # APRENDIZADO EM FLUXO
+    def partial_fit(self, X):
+        """Incorpora leituras normais à média e à covariância (fusão de Chan, O(d²) por leitura)."""
+        X = self._matrix(X)
+        if not len(X):
+            return self
+        n_lote = len(X)
+        media_lote = X.mean(axis=0)
+        centrado = X - media_lote
+        delta = media_lote - self.mean
+        total = self.n + n_lote
+        self.mean = self.mean + delta * (n_lote / total)
+        self._m2 += centrado.T @ centrado + np.outer(delta, delta) * (self.n * n_lote / total)
+        self.n = total
+        self._precisao = None
+        return self
+
+    def covariance(self):
+        cov = self._m2 / max(self.n - 1, 1)
+        return cov + np.eye(len(cov)) * self.ridge * max(np.trace(cov) / len(cov), 1.0)
+
+    def distance2(self, X):
+        """Distância de Mahalanobis ao quadrado de cada leitura."""
+        if self._precisao is None:
+            self._precisao = np.linalg.inv(self.covariance())
+        centrado = self._matrix(X) - self.mean
+        return np.einsum('ij,jk,ik->i', centrado, self._precisao, centrado)
+
+    def calibrate(self, X, false_alarm_rate=FALSE_ALARM_RATE):
+        """Define o corte como o quantil (1 - false_alarm_rate) da distância em leituras normais."""
+        self.cutoff = float(np.quantile(self.distance2(X), 1.0 - false_alarm_rate))
+        return self
+
+    def learn_normal(self, X, threshold=0.5):
+        """Atualiza o perfil só com as leituras que o próprio detector considera normais (evita contaminação)."""
+        X = self._matrix(X)
+        return self.partial_fit(X[self.predict_proba(X)[:, 1] <= threshold])
+
+    # PONTUAÇÃO
+    def predict_proba(self, X):
+        d2 = self.distance2(X)
+        escore = d2 / (d2 + self.cutoff)
+        return np.column_stack([1.0 - escore, escore])
+
+    def predict(self, X, threshold=0.5):
+        return (self.predict_proba(X)[:, 1] > threshold).astype(np.int8)
+
+    def explain(self, X):
+        """
+        Contribuição de cada sensor para d² (somam d²), no mesmo formato das
+        explicações do SHAP em explanations.py, para o gráfico de cascata.
+        """
+        X = self._matrix(X)
+        self.distance2(X[:1])            # Garante a precisão calculada
+        centrado = X - self.mean
+        contribuicoes = centrado * (centrado @ self._precisao)
+        return [{'features': self.feature_names, 'values': X[i], 'contributions': contribuicoes[i],
+                 'base_value': 0.0} for i in range(len(X))]
+
+
+def from_normal_profile(n=PROFILE_SAMPLES, semente=0, false_alarm_rate=FALSE_ALARM_RATE):
+    """Ajusta e calibra o detector com leituras normais sorteadas do gerador do projeto (sem rótulos)."""
+    from gerador_de_dataset import gerar_dados_normais
+    rng = np.random.default_rng(semente)
+    dados = gerar_dados_normais(n, rng)
+    X = np.column_stack([np.asarray(dados[col], dtype=np.float64) for col in EXPECTED_COLUMNS])
+    metade = n // 2
+    # Ajusta em uma metade e calibra o corte na outra (o corte não fica otimista)
+    return OnlineMahalanobis().partial_fit(X[:metade]).calibrate(X[metade:], false_alarm_rate)
+
+
+class EnsembleDetector:
+    """
+    Combina o modelo supervisionado com o detector não supervisionado.
+    Recebe a entrada do supervisionado (que pode ter features temporais) e
+    repassa ao não supervisionado só as colunas das leituras. A probabilidade
+    do supervisionado é reescalada para que o seu limiar calibrado caia em
+    0.5, o limiar do conjunto.
+    """
+
+    def __init__(self, supervised, unsupervised, mode='max'):
+        if mode not in ENSEMBLE_MODES:
+            raise ValueError(f"Modo de conjunto inválido: {mode}")
+        self.supervised = supervised
+        self.unsupervised = unsupervised
+        self.mode = mode
+        self.feature_names = list(supervised.get_booster().feature_names)
+        self._idx = [self.feature_names.index(col) for col in unsupervised.feature_names]
+        self._limiar_sup = float(getattr(supervised, 'threshold_decisao', 0.5))
+
+    def get_booster(self):
+        return self
+
+    def predict_proba(self, X):
+        p_sup = self.supervised.predict_proba(X)[:, 1]
+        t = self._limiar_sup
+        if t != 0.5:
+            # Linear por partes: [0, t] -> [0, 0.5] e [t, 1] -> [0.5, 1]
+            p_sup = np.where(p_sup <= t, p_sup * (0.5 / t), 0.5 + (p_sup - t) * (0.5 / (1.0 - t)))
+        X_nao_sup = X if hasattr(X, 'columns') else np.asarray(X)[:, self._idx]
+        p_nao_sup = self.unsupervised.predict_proba(X_nao_sup)[:, 1]
+        proba = np.maximum(p_sup, p_nao_sup) if self.mode == 'max' else (p_sup + p_nao_sup) / 2.0
+        return np.column_stack([1.0 - proba, proba])
+
+    def predict(self, X, threshold=0.5):
+        return (self.predict_proba(X)[:, 1] > threshold).astype(np.int8)
+
+
+# EXECUÇÃO VIA LINHA DE COMANDO
+if __name__ == "__main__":
+    import argparse
+    import time
+    from dataset_io import read_dataset
+    from model_store import TARGET_COLUMN, load_serving_artifact
+    parser = argparse.ArgumentParser(description="Avalia o detector não supervisionado em um dataset rotulado.")
+    parser.add_argument("--data", default="Red_Queen_Synthetic_Dataset.csv")
+    parser.add_argument("--taxa-alarme", type=float, default=FALSE_ALARM_RATE,
+                        help="Fração de leituras normais acima do corte")
+    args = parser.parse_args()
+
+    df = read_dataset(args.data)
+    y = df[TARGET_COLUMN].to_numpy()
+    detector = from_normal_profile(false_alarm_rate=args.taxa_alarme)
+    supervisionado, _ = load_serving_artifact(compiled=True)
+    motores = {
+        'não supervisionado': detector,
+        'supervisionado': supervisionado,
+        'conjunto (max)': EnsembleDetector(supervisionado, detector, 'max'),
+    }
+    for nome, motor in motores.items():
+        alerta = motor.predict(df)
+        vp = int(((alerta == 1) & (y == 1)).sum())
+        print(f"{nome:<20} recall {vp / max(y.sum(), 1):6.1%}  precisão {vp / max(alerta.sum(), 1):6.1%}  "
+              f"alertas {int(alerta.sum()):,}")
+
+    # Custo por leitura: pontuação de uma linha, em lote e atualização do perfil
+    X = df[EXPECTED_COLUMNS].to_numpy(dtype=np.float64)
+    for nome, fn, repeticoes, linhas in (
+            ("pontuar 1 leitura", lambda i: detector.predict_proba(X[i % len(X)]), 5_000, 1),
+            ("pontuar em lote", lambda i: detector.predict_proba(X), 20, len(X)),
+            ("aprender 1 leitura", lambda i: detector.partial_fit(X[i % len(X)]), 5_000, 1)):
+        inicio = time.perf_counter()
+        for i in range(repeticoes):
+            fn(i)
+        print(f"{nome:<20} {(time.perf_counter() - inicio) / (repeticoes * linhas) * 1e6:8.2f} µs/leitura")